@@ -0,0 +1,84 @@
+"""Compares list based and fused `clean_and_titlecase` implementations.
+
+Run with: python -m benchmarks.clean_and_titlecase
+"""
+
+import random
+import string
+from timeit import timeit
+
+import polars as pl
+from polars import LazyFrame, testing
+
+from src.transformation.common import TransformationApp
+
+ROWS = 200_000
+REPEAT = 5
+
+
+def list_clean_and_titlecase(data: LazyFrame, column_name: str) -> LazyFrame:
+    """Previous implementation, kept as a reference."""
+    return data.with_columns(
+        pl.col(column_name)
+        .str.strip_chars()
+        .str.split(" ")
+        .list.eval(pl.element().str.strip_chars())
+        .list.eval(pl.element().filter(pl.element() != ""))
+        .list.eval(pl.element().str.to_lowercase())
+        .list.eval(pl.element().str.to_titlecase())
+        .list.join(" ")
+        .alias(column_name)
+    )
+
+
+class BenchmarkApp(TransformationApp):
+    """Transformation app exposing the cleaning methods only."""
+
+    def run(self) -> None:
+        pass
+
+    def transform(self, data: LazyFrame) -> LazyFrame:
+        return data
+
+    def set_schema(self, data: LazyFrame) -> LazyFrame:
+        return data
+
+
+def random_value() -> str | None:
+    if random.random() < 0.05:
+        return None
+
+    words = [
+        "".join(random.choices(string.ascii_letters + "'&-", k=random.randint(1, 9)))
+        for _ in range(random.randint(1, 5))
+    ]
+    separators = [random.choice([" ", "  ", " \t", "\t"]) for _ in words]
+
+    return " " + "".join(word + separator for word, separator in zip(words, separators))
+
+
+def main() -> None:
+    random.seed(42)
+    data = pl.DataFrame({"name": [random_value() for _ in range(ROWS)]}).lazy()
+
+    app = BenchmarkApp(None, None, None)
+
+    expected = list_clean_and_titlecase(data, "name").collect()
+    actual = app.clean_and_titlecase(data, "name").collect()
+    testing.assert_frame_equal(actual, expected)
+
+    list_time = timeit(
+        lambda: list_clean_and_titlecase(data, "name").collect(), number=REPEAT
+    )
+    fused_time = timeit(
+        lambda: app.clean_and_titlecase(data, "name").collect(), number=REPEAT
+    )
+
+    print(f"rows: {ROWS}, repeat: {REPEAT}")
+    print(f"list based: {list_time / REPEAT:.3f}s")
+    print(f"fused:      {fused_time / REPEAT:.3f}s")
+    print(f"speedup:    {list_time / fused_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
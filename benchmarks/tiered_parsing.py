@@ -0,0 +1,63 @@
+"""Compares regex-only and tiered date parsing on checkout-like dates.
+
+Run with: python -m benchmarks.tiered_parsing
+"""
+
+import random
+from datetime import date, timedelta
+from timeit import timeit
+
+import polars as pl
+from polars import testing
+
+from src.transformation.common import clean_dates
+
+ROWS = 2_000_000
+REPEAT = 5
+# share of values which need regex cleaning
+DIRTY_SHARE = 0.03
+
+
+def regex_clean_dates(column: pl.Expr) -> pl.Expr:
+    """Previous implementation, kept as a reference."""
+    return (
+        column.str.strip_chars()
+        .str.replace_all("[^0-9 -]", "")
+        .str.to_date(format="%Y-%m-%d", strict=False)
+    )
+
+
+def random_value() -> str | None:
+    if random.random() < 0.05:
+        return None
+
+    value = (date(2018, 1, 1) + timedelta(days=random.randint(0, 700))).isoformat()
+    if random.random() < DIRTY_SHARE:
+        return f" {value}%"
+
+    return value
+
+
+def main() -> None:
+    random.seed(42)
+    data = pl.DataFrame({"date_checkout": [random_value() for _ in range(ROWS)]})
+
+    expected = data.select(regex_clean_dates(pl.col("date_checkout")))
+    actual = data.select(clean_dates(pl.col("date_checkout")))
+    testing.assert_frame_equal(actual, expected)
+
+    regex_time = timeit(
+        lambda: data.select(regex_clean_dates(pl.col("date_checkout"))), number=REPEAT
+    )
+    tiered_time = timeit(
+        lambda: data.select(clean_dates(pl.col("date_checkout"))), number=REPEAT
+    )
+
+    print(f"rows: {ROWS}, dirty share: {DIRTY_SHARE}, repeat: {REPEAT}")
+    print(f"regex:   {regex_time / REPEAT:.3f}s")
+    print(f"tiered:  {tiered_time / REPEAT:.3f}s")
+    print(f"speedup: {regex_time / tiered_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
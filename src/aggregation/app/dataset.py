@@ -1,52 +1,82 @@
 # type: ignore
 
 import logging
-from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+from tempfile import TemporaryDirectory
 
 import polars as pl
-from polars import LazyFrame
-
-from src.aggregation.common import AggregationApp
+from polars import DataFrame, LazyFrame
+
+from src.aggregation.common import (
+    BOOK_FEATURES,
+    CUSTOMER_FEATURES,
+    AggregationApp,
+    DatasetState,
+    FeatureEncoder,
+    FeatureTable,
+    add_age_category,
+)
+from src.common import ChangeLog, load_sketches
 
 logger = logging.getLogger(__name__)
 
 RETURN_LIMIT = 28
 
+# checkout keys in the silver table and in the dataset
+CHECKOUT_KEYS = {
+    "id": "book_id",
+    "patron_id": "customer_id",
+    "library_id": "library_id",
+}
+
 
 class DatasetApp(AggregationApp):
+    """Joins silver tables into the dataset, encoded with the `FeatureEncoder`
+    saved at `encoder_path`. With `buckets` configured, customers and
+    checkouts are read bucketed on the customer id and joined one bucket at
+    a time, `bucket_workers` buckets at once.
+
+    In `incremental` mode state is kept next to the dataset and only
+    checkouts changed since the last build, read from the `ChangeLog` of the
+    checkouts input, are joined and upserted by their key. Rows of returned
+    checkouts are updated, so their labels don't stay open. The dataset is
+    rebuilt when statistics drift past `drift_threshold`, when checkouts were
+    rewritten as a whole or with the `full` argument.
+
+    With `approximate_medians`, nulls are filled with medians of the quantile
+    sketches saved with the silver inputs at `sketch_path`.
+
+    Customer and book features are also written to the `features` tables
+    keyed by their ids, `predict` looks them up instead of scanning the
+    dataset.
+    """
+
     def run(self) -> None:
         logger.info("Reading data from silver layer.")
 
-        books_df = self.read(self.config.input.book)
-        customers_df = self.read(self.config.input.customer)
-        checkouts_df = self.read(self.config.input.checkout)
+        encoder = FeatureEncoder(self.config.encoder_path)
+        incremental = self.config.get("incremental")
+        state = None
 
-        logger.info("All tables loaded.")
+        built = False
 
-        customers_df = self._add_age_category(customers_df)
+        if incremental and incremental.enabled:
+            state = DatasetState(incremental.state_path)
+            full = (self.arguments or {}).get("full")
 
-        # preparing data for aggregation
-        books_df = self.fill_nulls(books_df, "price", pl.col("price").median(), "price")
-        customers_df = self.fill_nulls(
-            customers_df, "age", pl.col("age").median(), "age"
-        )
+            if state.exists() and not full:
+                built = self._run_incremental(
+                    state, encoder, incremental.drift_threshold
+                )
+                if not built:
+                    logger.info("Statistics drifted, rebuilding the whole dataset.")
 
-        # only applicable to checkouts table
-        checkouts_df = self._add_label(checkouts_df)
+        if not built:
+            self._build(encoder, state)
 
-        # join data
-        customer_checkout_df = customers_df.rename({"id": "patron_id"}).join(
-            checkouts_df, on="patron_id"
-        )
-        library_df = customer_checkout_df.join(books_df, on="id", how="left")
-
-        dataset = self.aggregate(library_df)
-        dataset = self.set_schema(dataset)
-
-        logger.info(f"Writing dataset to path: '{self.config.output.path}'")
-
-        dataset_to_write = dataset.collect()
-        self.write(dataset_to_write, self.config.output)
+        self._write_features(encoder)
 
     def aggregate(self, data: LazyFrame) -> LazyFrame:
         data = self._rename_dataset(data)
@@ -56,24 +86,13 @@ class DatasetApp(AggregationApp):
         # Filter out invalid labels
         data = data.filter(pl.col("label") != -1)
 
-        # change to categorical to physical representation
-        data = self._transform_categorical_columns(data, "gender", "gender")
-        data = self._transform_categorical_columns(data, "occupation", "occupation")
-        data = self._transform_categorical_columns(data, "education", "education")
-        data = self._transform_categorical_columns(data, "age_category", "age_category")
-
-        # standardize price column around mean
-        data = self._standardize_data(data, "price", "price_standardized")
-
-        # standardize pages column around mean
-        data = self._standardize_data(data, "pages", "pages_standardized")
-
         return data
 
     def set_schema(self, data: LazyFrame) -> LazyFrame:
         dataset_schema = {
             "customer_id": pl.String,
             "book_id": pl.String,
+            "library_id": pl.String,
             "name": pl.String,
             "gender": pl.UInt32,
             "education": pl.UInt32,
@@ -90,33 +109,262 @@ class DatasetApp(AggregationApp):
 
     # private methods
 
-    def _add_age_category(self, data: LazyFrame) -> LazyFrame:
-        data = data.with_columns(
-            (
-                (
-                    datetime.now(timezone.utc).date() - pl.col("birth_date")
-                ).dt.total_days()
-                / 365
+    def _build(self, encoder: FeatureEncoder, state: DatasetState | None) -> None:
+        """Join tables to temporary files, bucket by bucket if `buckets` is set,
+        fit the encoder on all of them and write the encoded dataset. Medians
+        are computed before the joins, so results don't depend on buckets.
+        Encoder and state are saved once the dataset is written.
+        """
+        buckets = self.config.get("buckets")
+
+        books_df = self.read(self.config.input.book)
+        customers_df = self.read(self.config.input.customer)
+
+        medians = self._medians(books_df, customers_df)
+        # changes logged while reading are upserted again by the next run
+        changes = self._changes()
+        latest = changes.latest() if changes else None
+
+        output = Path(self.config.output.path)
+        output.parent.mkdir(parents=True, exist_ok=True)
+
+        with TemporaryDirectory(prefix="_buckets-", dir=output.parent) as directory:
+
+            def join_bucket(bucket: int | None) -> str:
+                data = self._join(
+                    books_df,
+                    self.read(self.config.input.customer, bucket=bucket),
+                    self.read(self.config.input.checkout, bucket=bucket),
+                    medians,
+                )
+                path = f"{directory}/{bucket or 0:05}.parquet"
+                self.aggregate(data).collect().write_parquet(path)
+
+                if bucket is not None:
+                    logger.info(f"Bucket {bucket + 1} of {buckets} joined.")
+
+                return path
+
+            with ThreadPoolExecutor(self.config.get("bucket_workers", 1)) as executor:
+                paths = list(
+                    executor.map(join_bucket, range(buckets) if buckets else [None])
+                )
+
+            data = pl.scan_parquet(paths)
+            encoder.fit(data, medians)
+
+            dataset = self.set_schema(encoder.encode(data))
+
+            logger.info(f"Writing dataset to path: '{self.config.output.path}'")
+
+            self.write(dataset, self.config.output)
+
+            if state is not None:
+                state.reset(data, latest)
+
+        encoder.save()
+        logger.info(f"Encoder version {encoder.version} saved.")
+
+        if state is not None:
+            state.save()
+
+        if changes:
+            changes.prune(latest)
+
+    def _run_incremental(
+        self, state: DatasetState, encoder: FeatureEncoder, drift_threshold: float
+    ) -> bool:
+        """Join checkouts changed since the last processed change and upsert
+        them into the dataset by their key. Checkouts which no longer make a
+        valid row are deleted from it.
+
+        Returns:
+            bool: False if the dataset has to be rebuilt: statistics drifted,
+            checkouts were rewritten or changes of checkouts aren't logged.
+        """
+        changes = self._changes()
+        if changes is None or state.changes is None:
+            logger.info("Changes of checkouts aren't logged.")
+            return False
+
+        if changes.rewritten(state.changes):
+            logger.info("Checkouts were rewritten.")
+            return False
+
+        books_df = self.read(self.config.input.book)
+        customers_df = self.read(self.config.input.customer)
+        checkouts_df = self.read(self.config.input.checkout)
+
+        # medians change with new books and customers, rows written before
+        # were filled with the encoder ones
+        for column, median in self._medians(books_df, customers_df).items():
+            encoded = encoder.medians.get(column)
+            if median is None or encoded is None:
+                continue
+            if abs(median - encoded) > drift_threshold * abs(encoded):
+                return False
+
+        latest = changes.latest()
+        keys = changes.read(state.changes)
+        if keys is None:
+            logger.info(f"No checkouts changed after change: {state.changes}")
+            state.changes = latest
+            state.save()
+            changes.prune(latest)
+            return True
+
+        keys = keys.collect()
+        checkouts_df = checkouts_df.join(
+            keys.lazy(), on=list(CHECKOUT_KEYS), how="semi"
+        )
+        data = self.aggregate(
+            self._join(books_df, customers_df, checkouts_df, encoder.medians)
+        ).collect()
+
+        # rows of the keys are replaced, their statistics with them
+        keys = keys.rename(CHECKOUT_KEYS)
+        state.remove(encoder.destandardize(self._rows(keys).lazy()).collect())
+        state.update(data, latest)
+
+        if state.drift(encoder.standardization) > drift_threshold:
+            return False
+
+        encoder.extend(data)
+        dataset = self.set_schema(encoder.encode(data.lazy())).collect()
+
+        logger.info(
+            f"Upserting {len(dataset)} rows of {len(keys)} changed checkouts to: "
+            f"'{self.config.output.path}'"
+        )
+
+        self.merge(dataset, self.config.output, keys=keys)
+
+        encoder.save()
+        state.save()
+        changes.prune(latest)
+
+        return True
+
+    def _rows(self, keys: DataFrame) -> DataFrame:
+        """Dataset rows of checkout keys, looked up in the key index of the
+        dataset if it's indexed instead of scanning it.
+        """
+        output = self.config.output
+        if output.get("index_by"):
+            index_keys = keys.select(output.index_by).unique().iter_rows()
+            rows = self.reader.lookup(output, list(index_keys))
+        else:
+            rows = self.read(output)
+
+        return (
+            rows.lazy()
+            .join(keys.lazy(), on=list(CHECKOUT_KEYS.values()), how="semi")
+            .collect()
+        )
+
+    def _changes(self) -> ChangeLog | None:
+        """Change log of the checkouts input, None if it isn't configured."""
+        if path := self.config.input.checkout.get("changes_path"):
+            return ChangeLog(path)
+
+        return None
+
+    def _write_features(self, encoder: FeatureEncoder) -> None:
+        """Write customer and book features, encoded like the dataset, to the
+        `features` tables keyed by their ids. All customers and books are
+        written, not only the ones with checkouts.
+        """
+        features = self.config.get("features")
+        if not features:
+            return
+
+        customers = add_age_category(self.read(self.config.input.customer))
+        books = self.fill_nulls(
+            self.read(self.config.input.book),
+            "price",
+            encoder.medians["price"],
+            "price",
+        )
+
+        for table, data, columns in (
+            (features.customer, customers, CUSTOMER_FEATURES),
+            (features.book, books, BOOK_FEATURES),
+        ):
+            logger.info(f"Writing features to: '{table.path}'")
+
+            FeatureTable(table.path).write(encoder.encode(data).select("id", *columns))
+
+    def _medians(
+        self, books_df: LazyFrame, customers_df: LazyFrame
+    ) -> dict[str, float | None]:
+        if self.config.get("approximate_medians"):
+            if medians := self._approximate_medians():
+                return medians
+
+            logger.info("Quantile sketches not found, computing exact medians.")
+
+        return {
+            "price": books_df.select(pl.col("price").median()).collect().item(),
+            "age": add_age_category(customers_df)
+            .select(pl.col("age").median())
+            .collect()
+            .item(),
+        }
+
+    def _approximate_medians(self) -> dict[str, float | None] | None:
+        """Medians from the sketches saved with the silver inputs. Age is
+        monotone in birth date, so the median age is the age of the median
+        birth date.
+        """
+        price = load_sketches(self.config.input.book.sketch_path).get("price")
+        birth_date = load_sketches(self.config.input.customer.sketch_path).get(
+            "birth_date"
+        )
+        if price is None or birth_date is None:
+            return None
+
+        median_birth_date = birth_date.quantile(0.5)
+        if median_birth_date is not None:
+            median_birth_date = date(1970, 1, 1) + timedelta(
+                days=round(median_birth_date)
             )
-            .floor()
-            .cast(pl.Int32)
-            .alias("age")
+
+        age = (
+            add_age_category(
+                pl.LazyFrame(
+                    {"birth_date": [median_birth_date]}, {"birth_date": pl.Date}
+                )
+            )
+            .select("age")
+            .collect()
+            .item()
         )
 
-        data = data.with_columns(
-            pl.when((pl.col("age") >= 3) & (pl.col("age") <= 19))
-            .then(pl.lit("Young"))
-            .when((pl.col("age") >= 20) & (pl.col("age") <= 39))
-            .then(pl.lit("Adult"))
-            .when((pl.col("age") >= 40) & (pl.col("age") <= 59))
-            .then(pl.lit("Middle-Age"))
-            .when((pl.col("age") >= 60) & (pl.col("age") <= 99))
-            .then(pl.lit("Old"))
-            .otherwise(pl.lit("Undefined"))
-            .alias("age_category")
+        return {"price": price.quantile(0.5), "age": age}
+
+    def _join(
+        self,
+        books_df: LazyFrame,
+        customers_df: LazyFrame,
+        checkouts_df: LazyFrame,
+        medians: dict[str, float | None],
+    ) -> LazyFrame:
+        customers_df = add_age_category(customers_df)
+
+        # preparing data for aggregation
+        books_df = self.fill_nulls(books_df, "price", medians["price"], "price")
+        customers_df = self.fill_nulls(customers_df, "age", medians["age"], "age")
+
+        # only applicable to checkouts table
+        checkouts_df = self._add_label(checkouts_df)
+
+        # join data
+        customer_checkout_df = customers_df.rename({"id": "patron_id"}).join(
+            checkouts_df, on="patron_id"
         )
+        library_df = customer_checkout_df.join(books_df, on="id", how="left")
 
-        return data
+        return library_df
 
     def _add_label(self, data: LazyFrame) -> LazyFrame:
         data = data.with_columns(
@@ -149,6 +397,7 @@ class DatasetApp(AggregationApp):
             [
                 "patron_id",
                 "id",
+                "library_id",
                 "name",
                 "gender",
                 "education",
@@ -163,24 +412,3 @@ class DatasetApp(AggregationApp):
         )
 
         return data
-
-    def _transform_categorical_columns(
-        self, data: LazyFrame, column_name: str, alias: str
-    ) -> LazyFrame:
-        data = data.with_columns(
-            pl.col(column_name).cast(pl.Categorical).to_physical().alias(alias)
-        )
-
-        return data
-
-    def _standardize_data(
-        self, data: LazyFrame, column_name: str, alias: str
-    ) -> LazyFrame:
-        data = data.with_columns(
-            (
-                (pl.col(column_name) - pl.col(column_name).mean())
-                / pl.col(column_name).std()
-            ).alias(alias)
-        )
-
-        return data
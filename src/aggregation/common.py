@@ -1,10 +1,341 @@
+from __future__ import annotations
+
+import json
+import math
 from abc import abstractmethod
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
 
 import polars as pl
-from polars import Expr, LazyFrame
+from polars import DataFrame, Expr, LazyFrame
 
 from src.common import App
 
+CATEGORICAL_COLUMNS = ("gender", "occupation", "education", "age_category")
+STANDARDIZED_COLUMNS = ("price", "pages")
+
+# model features in the order the model was trained with
+CUSTOMER_FEATURES = ("gender", "education", "occupation", "age_category")
+BOOK_FEATURES = ("price_standardized", "pages_standardized")
+
+
+def add_age_category(data: LazyFrame) -> LazyFrame:
+    data = data.with_columns(
+        (
+            (datetime.now(timezone.utc).date() - pl.col("birth_date")).dt.total_days()
+            / 365
+        )
+        .floor()
+        .cast(pl.Int32)
+        .alias("age")
+    )
+
+    data = data.with_columns(
+        pl.when((pl.col("age") >= 3) & (pl.col("age") <= 19))
+        .then(pl.lit("Young"))
+        .when((pl.col("age") >= 20) & (pl.col("age") <= 39))
+        .then(pl.lit("Adult"))
+        .when((pl.col("age") >= 40) & (pl.col("age") <= 59))
+        .then(pl.lit("Middle-Age"))
+        .when((pl.col("age") >= 60) & (pl.col("age") <= 99))
+        .then(pl.lit("Old"))
+        .otherwise(pl.lit("Undefined"))
+        .alias("age_category")
+    )
+
+    return data
+
+
+class FeatureEncoder:
+    """Preprocessing artifact shared by the dataset build and `predict`: medians
+    nulls are filled with, category dictionaries and mean and std of the
+    standardized columns. Categories are encoded with their position in the
+    dictionary and new values are only appended, so codes stay stable
+    between builds. Every saved change gets a new version, which is kept
+    next to the latest one.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self.version = 0
+        self.medians: dict[str, float | None] = {}
+        self.categories: dict[str, list[str]] = {}
+        self.standardization: dict[str, list[float]] = {}
+
+        if self.path.exists():
+            encoder = json.loads(self.path.read_text())
+            self.version = encoder["version"]
+            self.medians = encoder["medians"]
+            self.categories = encoder["categories"]
+            self.standardization = encoder["standardization"]
+
+    def fit(self, data: LazyFrame, medians: dict[str, float | None]) -> None:
+        """Add unseen categories of the data and compute mean and std."""
+        self.medians = medians
+        self.extend(data)
+
+        moments = data.select(
+            expression
+            for column in STANDARDIZED_COLUMNS
+            for expression in (
+                pl.col(column).mean().alias(f"{column}_mean"),
+                pl.col(column).std().alias(f"{column}_std"),
+            )
+        ).collect()
+
+        self.standardization = {
+            column: [moments[f"{column}_mean"].item(), moments[f"{column}_std"].item()]
+            for column in STANDARDIZED_COLUMNS
+        }
+
+    def extend(self, data: DataFrame | LazyFrame) -> None:
+        for column in CATEGORICAL_COLUMNS:
+            categories = self.categories.setdefault(column, [])
+            known = set(categories)
+
+            values = (
+                data.lazy()
+                .select(pl.col(column).drop_nulls().unique().sort())
+                .collect()
+                .to_series()
+            )
+            categories.extend(value for value in values if value not in known)
+
+    def encode(self, data: LazyFrame) -> LazyFrame:
+        """Replace categories with their codes and add standardized columns.
+        Values missing from a dictionary are encoded as null, columns missing
+        from the data are skipped.
+        """
+        columns = data.collect_schema().names()
+
+        return data.with_columns(
+            *(
+                pl.col(column).replace_strict(
+                    categories,
+                    range(len(categories)),
+                    default=None,
+                    return_dtype=pl.UInt32,
+                )
+                for column, categories in self.categories.items()
+                if column in columns
+            ),
+            *(
+                ((pl.col(column) - mean) / std).alias(f"{column}_standardized")
+                for column, (mean, std) in self.standardization.items()
+                if column in columns
+            ),
+        )
+
+    def destandardize(self, data: LazyFrame) -> LazyFrame:
+        """Values of the standardized columns of encoded data, e.g. to take
+        encoded rows out of statistics of the original ones.
+        """
+        return data.select(
+            (pl.col(f"{column}_standardized") * (std or 0.0) + mean).alias(column)
+            for column, (mean, std) in self.standardization.items()
+        )
+
+    def load_version(self, version: int) -> FeatureEncoder | None:
+        """Version of the encoder kept next to the latest one, None if it isn't."""
+        path = self._version_path(version)
+        if not path.exists():
+            return None
+
+        return FeatureEncoder(str(path))
+
+    def extends(self, other: FeatureEncoder) -> bool:
+        """Whether data is encoded as by the other encoder, i.e. medians and
+        standardization are the same and its categories only had new ones
+        appended, so codes the other encoder gave are unchanged.
+        """
+        return (
+            self.medians == other.medians
+            and self.standardization == other.standardization
+            and all(
+                self.categories.get(column, [])[: len(categories)] == categories
+                for column, categories in other.categories.items()
+            )
+        )
+
+    def save(self) -> None:
+        """Save the encoder as a new version if it changed since it was loaded."""
+        saved = FeatureEncoder(str(self.path))
+        if saved.path.exists() and saved._content() == self._content():
+            return
+
+        self.version = saved.version + 1
+        content = json.dumps({"version": self.version, **self._content()}, indent=4)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._version_path(self.version).write_text(content)
+
+        # replace encoder at once so a failed write doesn't corrupt it
+        temporary_path = self.path.with_suffix(".tmp")
+        temporary_path.write_text(content)
+        temporary_path.replace(self.path)
+
+    def _version_path(self, version: int) -> Path:
+        return self.path.with_name(f"{self.path.stem}.v{version}{self.path.suffix}")
+
+    def _content(self) -> dict:
+        return {
+            "medians": self.medians,
+            "categories": self.categories,
+            "standardization": self.standardization,
+        }
+
+
+class FeatureTable:
+    """Features of one entity keyed by its id, for point lookups at
+    prediction time. The table is saved as an uncompressed Arrow IPC file
+    sorted by the key, so it is memory-mapped instead of read and the
+    sorted key column serves as its index: a lookup is a binary search
+    reading only the matching rows.
+    """
+
+    def __init__(self, path: str, key: str = "id") -> None:
+        self.path = Path(path)
+        self.key = key
+        self._data: DataFrame | None = None
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def write(self, data: LazyFrame) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        # replace table at once so lookups never see a partial file
+        temporary_path = self.path.with_suffix(".tmp")
+        data.sort(self.key).collect().write_ipc(
+            temporary_path, compression="uncompressed"
+        )
+        temporary_path.replace(self.path)
+        self._data = None
+
+    def lookup(self, keys: list[Any]) -> DataFrame:
+        """Rows of the keys in the order of the keys, missing keys have nulls."""
+        data = self.data
+        keys = pl.Series(self.key, keys, dtype=data.schema[self.key])
+
+        found = data.clear()
+        if not data.is_empty():
+            index = data[self.key].search_sorted(keys)
+            rows = data[index.clip(upper_bound=len(data) - 1)]
+            found = rows.filter(rows[self.key] == keys).unique(self.key)
+
+        return keys.to_frame().join(found, on=self.key, how="left", coalesce=True)
+
+    def scan(self) -> LazyFrame:
+        """Whole table, to be joined to many keys at once."""
+        return self.data.lazy()
+
+    @property
+    def data(self) -> DataFrame:
+        if self._data is None:
+            self._data = pl.read_ipc(self.path, memory_map=True)
+
+        return self._data
+
+
+class DatasetState:
+    """State of an incrementally built dataset: last processed change of the
+    checkouts `ChangeLog` and running count, sum and sum of squares of the
+    standardized columns, used to tell when the encoder's mean and std
+    drifted.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self.changes: int | None = None
+        self.moments: dict[str, dict[str, float]] = {}
+
+        if self.path.exists():
+            state = json.loads(self.path.read_text())
+            # states saved before changes were logged have a watermark only
+            self.changes = state.get("changes")
+            self.moments = state["moments"]
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def reset(self, data: LazyFrame, changes: int | None) -> None:
+        """Compute the state from scratch from rows of a full build."""
+        self.changes = changes
+        self.moments = {
+            column: {"count": 0, "sum": 0.0, "sum_squares": 0.0}
+            for column in STANDARDIZED_COLUMNS
+        }
+        self._accumulate(data)
+
+    def update(self, data: DataFrame, changes: int) -> None:
+        self.changes = changes
+        self._accumulate(data.lazy())
+
+    def remove(self, data: DataFrame) -> None:
+        """Take rows replaced in the dataset out of the moments."""
+        self._accumulate(data.lazy(), sign=-1)
+
+    def drift(self, standardization: dict[str, list[float]]) -> float:
+        """Largest change of running moments against the ones data was
+        standardized with, mean in units of std and std relatively.
+        """
+        drift = 0.0
+        for column, moment in self.moments.items():
+            mean, std = self._running(moment)
+            encoded_mean, encoded_std = standardization[column]
+            if not encoded_std:
+                continue
+
+            drift = max(
+                drift,
+                abs(mean - encoded_mean) / encoded_std,
+                abs(std / encoded_std - 1),
+            )
+
+        return drift
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        # replace state at once so a failed write doesn't corrupt it
+        temporary_path = self.path.with_suffix(".tmp")
+        temporary_path.write_text(
+            json.dumps({"changes": self.changes, "moments": self.moments}, indent=4)
+        )
+        temporary_path.replace(self.path)
+
+    def _accumulate(self, data: LazyFrame, sign: int = 1) -> None:
+        sums = data.select(
+            expression
+            for column in self.moments
+            for expression in (
+                pl.col(column).count().alias(f"{column}_count"),
+                pl.col(column).sum().cast(pl.Float64).alias(f"{column}_sum"),
+                pl.col(column)
+                .cast(pl.Float64)
+                .pow(2)
+                .sum()
+                .alias(f"{column}_sum_squares"),
+            )
+        ).collect()
+
+        for column, moment in self.moments.items():
+            moment["count"] += sign * sums[f"{column}_count"].item()
+            moment["sum"] += sign * sums[f"{column}_sum"].item()
+            moment["sum_squares"] += sign * sums[f"{column}_sum_squares"].item()
+
+    @staticmethod
+    def _running(moment: dict[str, float]) -> tuple[float, float]:
+        count = moment["count"]
+        if count < 2:
+            return moment["sum"] / count if count else 0.0, 0.0
+
+        mean = moment["sum"] / count
+        variance = (moment["sum_squares"] - count * mean**2) / (count - 1)
+
+        return mean, math.sqrt(max(variance, 0.0))
+
 
 class AggregationApp(App):
     @abstractmethod
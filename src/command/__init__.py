@@ -1,6 +1,21 @@
 from src.command.create_dataset import create_dataset
+from src.command.export_model import export_model
 from src.command.ingest import ingest
 from src.command.predict import predict
+from src.command.predict_batch import predict_batch
 from src.command.process_data import process
+from src.command.promote_model import promote_model
+from src.command.serve import serve
+from src.command.tune_layout import tune_layout
 
-__all__ = ["ingest", "process", "create_dataset", "predict"]
+__all__ = [
+    "ingest",
+    "process",
+    "create_dataset",
+    "export_model",
+    "predict",
+    "predict_batch",
+    "promote_model",
+    "serve",
+    "tune_layout",
+]
@@ -4,7 +4,12 @@ from pathlib import Path
 
 import click
 
-from src.command.utils import DEFAULT_CONFIG_PATH, load_app, set_root_data_dir
+from src.command.utils import (
+    DEFAULT_CONFIG_PATH,
+    load_app,
+    set_root_data_dir,
+    set_root_model_dir,
+)
 from src.common import Config
 
 logger = logging.getLogger(__name__)
@@ -19,22 +24,32 @@ logger = logging.getLogger(__name__)
     default=DEFAULT_CONFIG_PATH,
     help="Path to configuration file.",
 )
-def create_dataset(config_path: Path):
+@click.option(
+    "--full",
+    is_flag=True,
+    default=False,
+    help="Rebuild the whole dataset instead of appending new checkouts.",
+)
+def create_dataset(config_path: Path, full: bool = False):
     """Command for creating dataset by applying cleaning techniques and aggregations.
     Saves data in the ready-to-use layer.
 
     Args:
         config_path (Path): Path to configuration file.
+        full (bool, optional): Rebuild the whole dataset. Defaults to False.
     """
 
     logger.info("Creating dataset in the gold layer...")
 
     logger.info("Setting data dir environment variable.")
     set_root_data_dir()
+    set_root_model_dir()
 
     config = Config.load(str(config_path))
 
-    dataset_app = load_app(config, "aggregation.dataset", "src.aggregation.DatasetApp")
+    dataset_app = load_app(
+        config, "aggregation.dataset", "src.aggregation.DatasetApp", {"full": full}
+    )
 
     try:
         dataset_app.run()
@@ -0,0 +1,83 @@
+import logging
+import sys
+
+import click
+
+from src.command.utils import (
+    DEFAULT_CONFIG_PATH,
+    load_config_module,
+    set_root_data_dir,
+    set_root_model_dir,
+)
+from src.common import Config, init_reader
+from src.serving import ModelRegistry, verification_features
+
+logger = logging.getLogger(__name__)
+
+
+@click.command()
+@click.option(
+    "--config-path",
+    "-p",
+    required=True,
+    type=click.types.Path(),
+    default=DEFAULT_CONFIG_PATH,
+    help="Path to configuration file.",
+)
+@click.option(
+    "--version",
+    "-v",
+    type=int,
+    default=None,
+    help="Registered version to export, defaults to the promoted one.",
+)
+def export_model(config_path: str, version: int | None) -> None:
+    """Export a registered model version to the NumPy inference engine
+    `predict` and `serve` use instead of scikit-learn. `promote-model`
+    exports engines of the versions it registers, this exports the ones
+    registered without it. The engine is saved with the version only if its
+    predictions on a sample of the gold dataset are bit-identical to the
+    model's.
+
+    Args:
+        config_path (str): Path to configuration.
+        version (int | None): Registered version to export.
+    """
+
+    set_root_data_dir()
+    set_root_model_dir()
+
+    config = Config.load(str(config_path))
+    config_module = load_config_module(config, "aggregation")
+
+    reader = init_reader(config_module)
+    if not reader:
+        raise ValueError("Can't load reader.")
+
+    registry = ModelRegistry(config.model.registry_path)
+    if version is None:
+        version = registry.current()
+    if version not in registry.versions():
+        logger.error(f"Version isn't registered: {version}")
+        sys.exit(-1)
+
+    metadata = registry.metadata(version)
+    features = verification_features(
+        reader.read(config_module.dataset.output),
+        metadata["columns"],
+        metadata["dtype"],
+    )
+
+    try:
+        exported = registry.export(version, features)
+    except ValueError as error:
+        logger.error(error)
+        sys.exit(-1)
+
+    if not exported:
+        logger.error("Engine predictions differ from the model, it wasn't saved.")
+        sys.exit(-1)
+
+    logger.info(
+        f"Engine of version {version} verified on {len(features)} distinct rows."
+    )
@@ -3,7 +3,7 @@ from pathlib import Path
 
 import click
 
-from src.command.utils import DEFAULT_CONFIG_PATH, load_app, set_root_data_dir
+from src.command.utils import DEFAULT_CONFIG_PATH, run_apps, set_root_data_dir
 from src.common import Config
 
 logger = logging.getLogger(__name__)
@@ -31,29 +31,30 @@ def ingest(config_path: Path) -> None:
 
     config = Config.load(str(config_path))
 
-    ingest_book_app = load_app(
-        config, "ingestion.book", "src.ingestion.IngestionBookApp"
-    )
-    ingest_customer_app = load_app(
-        config, "ingestion.customer", "src.ingestion.IngestionCustomerApp"
-    )
-    ingest_checkout_app = load_app(
-        config, "ingestion.checkout", "src.ingestion.IngestionCheckoutApp"
-    )
-    ingest_library_app = load_app(
-        config, "ingestion.library", "src.ingestion.IngestionLibraryApp"
-    )
-
-    logger.info("Running Book data ingestion...")
-    ingest_book_app.run()
-
-    logger.info("Running Customer data ingestion...")
-    ingest_customer_app.run()
-
-    logger.info("Running Checkout data ingestion...")
-    ingest_checkout_app.run()
-
-    logger.info("Running Library data ingestion...")
-    ingest_library_app.run()
+    apps = {
+        "Book data ingestion": (
+            "ingestion.book",
+            "src.ingestion.IngestionBookApp",
+            None,
+        ),
+        "Customer data ingestion": (
+            "ingestion.customer",
+            "src.ingestion.IngestionCustomerApp",
+            None,
+        ),
+        "Checkout data ingestion": (
+            "ingestion.checkout",
+            "src.ingestion.IngestionCheckoutApp",
+            None,
+        ),
+        "Library data ingestion": (
+            "ingestion.library",
+            "src.ingestion.IngestionLibraryApp",
+            None,
+        ),
+    }
+
+    logger.info(f"Running {', '.join(apps)}...")
+    run_apps(str(config_path), apps, config.get("scheduler"))
 
     logger.info("Finished ingestion process.")
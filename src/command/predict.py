@@ -1,29 +1,18 @@
 import logging
-import pickle
 import sys
 
 import click
-import polars as pl
 
 from src.command.utils import (
     DEFAULT_CONFIG_PATH,
-    load_config_module,
     set_root_data_dir,
     set_root_model_dir,
 )
-from src.common import Config, init_reader
+from src.common import Config
+from src.serving import Predictor
 
 logger = logging.getLogger(__name__)
 
-COLUMNS = (
-    "gender",
-    "education",
-    "occupation",
-    "age_category",
-    "price_standardized",
-    "pages_standardized",
-)
-
 
 @click.command()
 @click.option(
@@ -50,9 +39,9 @@ COLUMNS = (
 )
 def predict(config_path: str, customer_id: str, book_id: str) -> None:
     """This is a mock of the predict function which should return prediction of a late return.
-    We don't have feature store implemented
-    so we don't have a fast way of retrieving customer features and books features separately.
-    Everything will be fetched from gold layer and dataset table.
+    Customer and book features are looked up in the feature tables written
+    with the dataset, so any customer and book can be predicted, not only
+    the ones which met in a checkout.
 
     Args:
         config_path (str): Path to configuration.
@@ -64,29 +53,17 @@ def predict(config_path: str, customer_id: str, book_id: str) -> None:
     set_root_model_dir()
 
     config = Config.load(str(config_path))
-    config_module = load_config_module(config, "aggregation")
-
-    reader = init_reader(config_module)
-    if not reader:
-        raise ValueError("Can't load reader.")
-
-    dataset = reader.read(config_module.dataset.output)
 
-    result = dataset.filter(
-        (pl.col("customer_id") == customer_id) & (pl.col("book_id") == book_id)
-    ).collect()
-
-    feature_vector = result.select(COLUMNS).to_pandas()
-
-    if len(feature_vector) == 0:
-        logger.error("Combination of customer id and book id doesn't exist.")
-        # gracefully shutdown
+    try:
+        predictor = Predictor.load(config)
+    except (FileNotFoundError, ValueError) as error:
+        logger.error(error)
         sys.exit(-1)
 
-    with open(config.model.path, "rb") as model_file:
-        model = pickle.load(model_file)
-
-    prediction = model.predict(feature_vector)
+    prediction = predictor.predict([customer_id], [book_id])[0]
+    if prediction is None:
+        logger.error("Customer or book doesn't exist or has missing attributes.")
+        sys.exit(-1)
 
     logger.info(f"Prediction value: {prediction}.")
 
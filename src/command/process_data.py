@@ -5,7 +5,7 @@ from pathlib import Path
 
 import click
 
-from src.command.utils import DEFAULT_CONFIG_PATH, load_app, set_root_data_dir
+from src.command.utils import DEFAULT_CONFIG_PATH, run_apps, set_root_data_dir
 from src.common import Config
 
 logger = logging.getLogger(__name__)
@@ -34,8 +34,17 @@ logger = logging.getLogger(__name__)
     type=str,
     help="Job reads data to this date. Format: YYYY-MM-DD.",
 )
+@click.option(
+    "--merge",
+    is_flag=True,
+    default=False,
+    help="Upsert only new bronze partitions into silver instead of overwriting it.",
+)
 def process(
-    config_path: Path, start_date: str | None = None, end_date: str | None = None
+    config_path: Path,
+    start_date: str | None = None,
+    end_date: str | None = None,
+    merge: bool = False,
 ) -> None:
     """Command for processing data. Reads raw data by date and saves it to clean zone.
 
@@ -43,6 +52,7 @@ def process(
         config_path (Path): Path to configuration file.
         start_date (str | None, optional): Read starting with this date. Defaults to None.
         end_date (str | None, optional): Read till this date. Defaults to None.
+        merge (bool, optional): Merge new partitions by table keys. Defaults to False.
     """
 
     logger.info("Starting data processing..")
@@ -51,43 +61,31 @@ def process(
 
     config = Config.load(str(config_path))
 
-    transform_book_app = load_app(
-        config,
-        "transformation.book",
-        "src.transformation.TransformationBookApp",
-        {"start_date": start_date, "end_date": end_date},
-    )
-
-    transform_customer_app = load_app(
-        config,
-        "transformation.customer",
-        "src.transformation.TransformationCustomerApp",
-        {"start_date": start_date, "end_date": end_date},
-    )
-
-    transform_checkout_app = load_app(
-        config,
-        "transformation.checkout",
-        "src.transformation.TransformationCheckoutApp",
-        {"start_date": start_date, "end_date": end_date},
-    )
-
-    transform_library_app = load_app(
-        config,
-        "transformation.library",
-        "src.transformation.TransformationLibraryApp",
-        {"start_date": start_date, "end_date": end_date},
-    )
-    logger.info("Running Book data processing...")
-    transform_book_app.run()
-
-    logger.info("Running Customer data processing...")
-    transform_customer_app.run()
-
-    logger.info("Running Checkout data processing...")
-    transform_checkout_app.run()
-
-    logger.info("Running Library data processing...")
-    transform_library_app.run()
+    arguments = {"start_date": start_date, "end_date": end_date, "merge": merge}
+    apps = {
+        "Book data processing": (
+            "transformation.book",
+            "src.transformation.TransformationBookApp",
+            arguments,
+        ),
+        "Customer data processing": (
+            "transformation.customer",
+            "src.transformation.TransformationCustomerApp",
+            arguments,
+        ),
+        "Checkout data processing": (
+            "transformation.checkout",
+            "src.transformation.TransformationCheckoutApp",
+            arguments,
+        ),
+        "Library data processing": (
+            "transformation.library",
+            "src.transformation.TransformationLibraryApp",
+            arguments,
+        ),
+    }
+
+    logger.info(f"Running {', '.join(apps)}...")
+    run_apps(str(config_path), apps, config.get("scheduler"))
 
     logger.info("Finished data processing.")
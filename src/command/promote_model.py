@@ -0,0 +1,95 @@
+import logging
+import sys
+
+import click
+import polars as pl
+
+from src.aggregation.common import FeatureEncoder
+from src.command.utils import (
+    DEFAULT_CONFIG_PATH,
+    load_config_module,
+    set_root_data_dir,
+    set_root_model_dir,
+)
+from src.common import Config, init_reader, load_manifest
+from src.serving import (
+    ModelRegistry,
+    load_model,
+    load_model_metadata,
+    verification_features,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@click.command()
+@click.option(
+    "--config-path",
+    "-p",
+    required=True,
+    type=click.types.Path(),
+    default=DEFAULT_CONFIG_PATH,
+    help="Path to configuration file.",
+)
+@click.option(
+    "--version",
+    "-v",
+    type=int,
+    default=None,
+    help="Promote a registered version instead, e.g. to roll back.",
+)
+def promote_model(config_path: str, version: int | None) -> None:
+    """Register the trained model as a new version of the model registry and
+    promote it. Running `serve` processes switch to the promoted version on
+    their next prediction.
+
+    The version records the feature columns, the encoder version and the
+    fingerprint of the gold dataset the model was trained on. Its NumPy
+    engine is exported and saved if it's bit-identical to the model on a
+    sample of the gold dataset.
+
+    Args:
+        config_path (str): Path to configuration.
+        version (int | None): Registered version to promote.
+    """
+
+    set_root_data_dir()
+    set_root_model_dir()
+
+    config = Config.load(str(config_path))
+    registry = ModelRegistry(
+        config.model.registry_path, encoder_path=config.model.encoder_path
+    )
+
+    if version is None:
+        config_module = load_config_module(config, "aggregation")
+
+        reader = init_reader(config_module)
+        if not reader:
+            raise ValueError("Can't load reader.")
+
+        model = load_model(config)
+        metadata = load_model_metadata(config.model.metadata_path, model)
+        dataset = reader.read(config_module.dataset.output)
+        manifest = load_manifest(config_module.dataset.output)
+
+        metadata["encoder_version"] = FeatureEncoder(config.model.encoder_path).version
+        metadata["training_data"] = {
+            "fingerprint": manifest.fingerprint() if manifest else None,
+            "rows": dataset.select(pl.len()).collect().item(),
+        }
+
+        version = registry.register(
+            model,
+            metadata,
+            verification_features(dataset, metadata["columns"], metadata["dtype"]),
+        )
+        logger.info(f"Model registered as version {version}.")
+
+    try:
+        registry.promote(version)
+    except ValueError as error:
+        logger.error(error)
+        sys.exit(-1)
+
+    logger.info(f"Version {version} promoted in: '{config.model.registry_path}'")
@@ -0,0 +1,73 @@
+import asyncio
+import logging
+import sys
+
+import click
+
+from src.command.utils import (
+    DEFAULT_CONFIG_PATH,
+    set_root_data_dir,
+    set_root_model_dir,
+)
+from src.common import Config
+from src.serving import PredictionServer, Predictor
+
+logger = logging.getLogger(__name__)
+
+
+@click.command()
+@click.option(
+    "--config-path",
+    "-p",
+    required=True,
+    type=click.types.Path(),
+    default=DEFAULT_CONFIG_PATH,
+    help="Path to configuration file.",
+)
+@click.option("--host", type=str, help="Host to serve on, defaults to serve.host.")
+@click.option("--port", type=int, help="Port to serve on, defaults to serve.port.")
+@click.option(
+    "--socket",
+    type=click.types.Path(),
+    help="Serve on this Unix socket instead of host and port.",
+)
+def serve(config_path: str, host: str, port: int, socket: str) -> None:
+    """Serve predictions over HTTP with the model and features loaded once,
+    e.g. `curl "localhost:8080/predict?customer_id=<id>&book_id=<id>"`.
+    Latency percentiles are served on `/metrics`.
+
+    Args:
+        config_path (str): Path to configuration.
+        host (str): Host to serve on.
+        port (int): Port to serve on.
+        socket (str): Unix socket to serve on.
+    """
+
+    set_root_data_dir()
+    set_root_model_dir()
+
+    config = Config.load(str(config_path))
+
+    try:
+        predictor = Predictor.load(config)
+    except (FileNotFoundError, ValueError) as error:
+        logger.error(error)
+        sys.exit(-1)
+
+    server = PredictionServer(
+        predictor,
+        config.serve.percentiles,
+        config.serve.max_body_size,
+        config.serve.refresh_interval,
+    )
+
+    try:
+        asyncio.run(
+            server.serve(
+                host or config.serve.host,
+                port or config.serve.port,
+                socket or config.serve.get("socket"),
+            )
+        )
+    except KeyboardInterrupt:
+        logger.info(f"Stopped serving, latencies: {server.metrics()}")
@@ -0,0 +1,98 @@
+import logging
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+import click
+import polars as pl
+from dynaconf.utils.boxing import DynaBox
+
+from src.command.utils import DEFAULT_CONFIG_PATH, set_root_data_dir
+from src.common import Config, ParquetReader, ParquetWriter, load_config_module
+
+logger = logging.getLogger(__name__)
+
+LAYOUTS = {
+    "snappy": {"compression": "snappy"},
+    "lz4": {"compression": "lz4"},
+    "zstd-3": {"compression": "zstd", "compression_level": 3},
+    "zstd-10": {"compression": "zstd", "compression_level": 10},
+    "zstd-3-small-row-groups": {
+        "compression": "zstd",
+        "compression_level": 3,
+        "row_group_size": 10000,
+    },
+    "zstd-3-no-dictionary": {
+        "compression": "zstd",
+        "compression_level": 3,
+        "use_dictionary": False,
+    },
+}
+
+
+@click.command()
+@click.option(
+    "--config-path",
+    "-p",
+    required=True,
+    type=click.types.Path(),
+    default=DEFAULT_CONFIG_PATH,
+    help="Path to configuration file.",
+)
+@click.option(
+    "--table",
+    "-t",
+    required=True,
+    type=str,
+    help="Configuration module of the table, e.g. 'transformation.checkout'.",
+)
+@click.option(
+    "--sample-rows",
+    "-n",
+    required=False,
+    type=int,
+    default=100_000,
+    help="Number of rows written with each layout.",
+)
+def tune_layout(config_path: Path, table: str, sample_rows: int) -> None:
+    """Command for comparing parquet layouts on a sample of a table.
+    Reports file size, write time and scan time of each layout.
+
+    Args:
+        config_path (Path): Path to configuration file.
+        table (str): Configuration module of the table.
+        sample_rows (int): Number of rows in the sample.
+    """
+
+    set_root_data_dir()
+
+    config = Config.load(str(config_path))
+    config_module = load_config_module(config, table)
+
+    sample = ParquetReader().read(config_module.output).head(sample_rows).collect()
+    logger.info(f"Comparing layouts on {len(sample)} rows of '{table}'.")
+
+    writer = ParquetWriter()
+    with TemporaryDirectory() as directory:
+        for name, layout in LAYOUTS.items():
+            output = DynaBox(
+                {
+                    "path": str(Path(directory) / f"{name}.parquet"),
+                    "partition_by": [],
+                    "layout": layout,
+                }
+            )
+
+            start = perf_counter()
+            writer.write(sample, output)
+            write_time = perf_counter() - start
+
+            start = perf_counter()
+            pl.scan_parquet(output.path).collect()
+            scan_time = perf_counter() - start
+
+            size = Path(output.path).stat().st_size / 1024 / 1024
+
+            logger.info(
+                f"{name:<25} size: {size:8.2f} MB, write: {write_time:6.3f}s, scan: {scan_time:6.3f}s"
+            )
@@ -1,12 +1,20 @@
 from __future__ import annotations
 
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from importlib import import_module
 from os import environ
 from pathlib import Path
+from time import perf_counter
 from typing import Any
 
+import polars as pl
+
 from src.common import App, Config, init_reader, init_writer, load_config_module
 
+logger = logging.getLogger(__name__)
+
 DEFAULT_CONFIG_PATH = (
     Path(__file__).absolute().parent.parent / "config" / "settings.toml"
 )
@@ -47,6 +55,94 @@ def load_app(
     )
 
 
+def run_app(
+    config_path: str,
+    config_module: str,
+    full_app_name: str,
+    arguments: dict[str, Any] | None = None,
+) -> float:
+    """Load and run a single application. Loading happens inside the worker
+    so only plain arguments have to be sent to it.
+
+    Returns:
+        float: Application wall time in seconds.
+    """
+    start = perf_counter()
+
+    config = Config.load(config_path)
+    load_app(config, config_module, full_app_name, arguments).run()
+
+    return perf_counter() - start
+
+
+def run_apps(
+    config_path: str,
+    apps: dict[str, tuple[str, str, dict[str, Any] | None]],
+    scheduler: Config | None = None,
+) -> dict[str, float]:
+    """Run independent applications concurrently. Polars thread pool is
+    split between workers so they don't oversubscribe cores.
+
+    Args:
+        config_path (str): Path to configuration file.
+        apps (dict): Application label mapped to (config module, application name, arguments).
+        scheduler (Config | None, optional): Scheduler configuration. Defaults to None.
+
+    Raises:
+        Exception: First error raised by an application, after all of them finish.
+
+    Returns:
+        dict[str, float]: Application label mapped to its wall time in seconds.
+    """
+    executor_type = scheduler.executor if scheduler else "thread"
+    max_workers = scheduler.max_workers if scheduler else 1
+    workers = max(1, min(max_workers, len(apps)))
+
+    wall_times = {}
+    errors = []
+    polars_threads = environ.get("POLARS_MAX_THREADS")
+
+    with _init_executor(executor_type, workers) as executor:
+        futures = {
+            label: executor.submit(run_app, config_path, *app)
+            for label, app in apps.items()
+        }
+
+        for label, future in futures.items():
+            try:
+                wall_times[label] = future.result()
+                logger.info(f"{label} finished in {wall_times[label]:.2f}s.")
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                logger.error(f"{label} failed: {error}")
+                errors.append(error)
+
+    if polars_threads is None:
+        environ.pop("POLARS_MAX_THREADS", None)
+    else:
+        environ["POLARS_MAX_THREADS"] = polars_threads
+
+    if errors:
+        raise errors[0]
+
+    return wall_times
+
+
+def _init_executor(executor_type: str, workers: int) -> Executor:
+    if executor_type == "process":
+        # spawned workers read the thread limit when importing polars
+        environ["POLARS_MAX_THREADS"] = str(max(1, pl.thread_pool_size() // workers))
+
+        return ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    if executor_type == "thread":
+        # threads share polars thread pool of this process
+        return ThreadPoolExecutor(max_workers=workers)
+
+    raise ValueError(f"Unknown executor type: '{executor_type}'")
+
+
 def set_root_data_dir() -> None:
     root_dir = Path(__file__).absolute().parent.parent.parent
     data_dir = root_dir / "data"
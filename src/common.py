@@ -1,18 +1,43 @@
 from __future__ import annotations
 
+import csv
+import hashlib
+import json
 import logging
+import math
+import os
+import re
+import shutil
+import tempfile
+import threading
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from glob import glob
 from importlib import import_module
-from typing import Any
+from pathlib import Path
+from typing import Any, Callable
+from uuid import uuid4
 
 import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
 from dynaconf import Dynaconf
-from polars import DataFrame, LazyFrame
+from polars import CompatLevel, DataFrame, LazyFrame
 
-from src.exception import MissingClassImplementation, MissingConfigModuleImplementation
+from src.exception import (
+    MissingClassImplementation,
+    MissingConfigModuleImplementation,
+    SchemaDriftError,
+    UnsupportedWriteMode,
+)
 
 logger = logging.getLogger(__name__)
 
+# fixed so tables bucketed separately place equal keys in the same bucket
+BUCKET_SEED = 42
+# message of the error polars raises when a plan can't be sunk by streaming
+STREAMING_UNSUPPORTED = "not yet supported in standard engine"
+
 
 class Config(Dynaconf):
     @classmethod
@@ -51,6 +76,230 @@ def init_writer(config_module: Config | None) -> Writer | None:
         return None
 
 
+def parse_dtype(dtype_name: str) -> pl.DataType:
+    """Parse data type from its string representation, e.g. `List(String)`."""
+    if match := re.fullmatch(r"List\((.*)\)", dtype_name):
+        return pl.List(parse_dtype(match.group(1)))
+
+    return getattr(pl, dtype_name)
+
+
+def load_schema(config: Config, infer: Callable[[], pl.Schema]) -> pl.Schema | None:
+    """Load schema of a source from the schema registry. Schema declared in
+    configuration (`schema`) is used first. Otherwise schema is read from the
+    registry file (`schema_path`) and if the file doesn't exist yet, schema
+    is inferred from the data and saved to it. Columns in `schema_overrides`
+    get the declared types whichever schema is used, e.g. raw columns which
+    are cleaned as strings but could be inferred as numbers from clean data.
+
+    Args:
+        config (Config): Input configuration.
+        infer (Callable[[], pl.Schema]): Infers schema from the source.
+
+    Returns:
+        pl.Schema | None: Source schema or None if registry isn't configured.
+    """
+    overrides = {
+        column: parse_dtype(dtype)
+        for column, dtype in (config.get("schema_overrides") or {}).items()
+    }
+
+    def override(schema: pl.Schema) -> pl.Schema:
+        return pl.Schema(
+            {column: overrides.get(column, dtype) for column, dtype in schema.items()}
+        )
+
+    if declared := config.get("schema"):
+        return override(
+            pl.Schema(
+                {column: parse_dtype(dtype) for column, dtype in declared.items()}
+            )
+        )
+
+    schema_path = config.get("schema_path")
+    if not schema_path:
+        return None
+
+    schema_path = Path(schema_path)
+    if schema_path.exists():
+        columns = json.loads(schema_path.read_text())
+        # schemas captured before overrides were declared are corrected too
+        return override(
+            pl.Schema({column: parse_dtype(dtype) for column, dtype in columns.items()})
+        )
+
+    logger.info(f"Capturing schema to registry: '{schema_path}'")
+    schema = override(infer())
+
+    schema_path.parent.mkdir(parents=True, exist_ok=True)
+    schema_path.write_text(
+        json.dumps({column: str(dtype) for column, dtype in schema.items()}, indent=4)
+    )
+
+    return schema
+
+
+class QuantileSketch:
+    """Approximate quantiles of a numeric or temporal column with a bounded
+    relative error (DDSketch). Values are counted in logarithmic bins, so
+    a quantile is within `relative_error` of the exact one and the sketch
+    grows with the logarithm of the value range instead of the row count.
+    Temporal values are sketched as their physical representation, e.g.
+    days since epoch for dates.
+    """
+
+    def __init__(self, relative_error: float = 0.01) -> None:
+        self.relative_error = relative_error
+        self.gamma = (1 + relative_error) / (1 - relative_error)
+        self.zero = 0
+        self.positive: dict[int, int] = {}
+        self.negative: dict[int, int] = {}
+
+    @classmethod
+    def build(
+        cls, data: LazyFrame, column: str, relative_error: float = 0.01
+    ) -> QuantileSketch:
+        """Sketch a column in a single pass counting values per bin."""
+        sketch = cls(relative_error)
+        value = pl.col(column).to_physical().cast(pl.Float64)
+
+        bins = (
+            data.select(
+                value.sign().alias("sign"),
+                pl.when(value != 0)
+                .then((value.abs().log() / math.log(sketch.gamma)).ceil())
+                .cast(pl.Int64)
+                .alias("index"),
+            )
+            .drop_nulls("sign")
+            .group_by("sign", "index")
+            .len()
+            .collect()
+        )
+
+        for sign, index, count in bins.iter_rows():
+            if sign > 0:
+                sketch.positive[index] = count
+            elif sign < 0:
+                sketch.negative[index] = count
+            else:
+                sketch.zero = count
+
+        return sketch
+
+    def merge(self, other: QuantileSketch, sign: int = 1) -> None:
+        """Add counts of a sketch of other values, or take them out with
+        `sign=-1` once the values are removed. Values fall into the same bins
+        in both sketches, so the result is the sketch of all values.
+        """
+        if other.relative_error != self.relative_error:
+            raise ValueError(
+                f"Can't merge sketches with relative errors: "
+                f"{self.relative_error} and {other.relative_error}"
+            )
+
+        self.zero += sign * other.zero
+        for counts, other_counts in (
+            (self.positive, other.positive),
+            (self.negative, other.negative),
+        ):
+            for index, count in other_counts.items():
+                counts[index] = counts.get(index, 0) + sign * count
+                if not counts[index]:
+                    del counts[index]
+
+    def add(self, value: float) -> None:
+        if value > 0:
+            index = math.ceil(math.log(value) / math.log(self.gamma))
+            self.positive[index] = self.positive.get(index, 0) + 1
+        elif value < 0:
+            index = math.ceil(math.log(-value) / math.log(self.gamma))
+            self.negative[index] = self.negative.get(index, 0) + 1
+        else:
+            self.zero += 1
+
+    @property
+    def count(self) -> int:
+        return self.zero + sum(self.positive.values()) + sum(self.negative.values())
+
+    def quantile(self, quantile: float) -> float | None:
+        if not self.count:
+            return None
+
+        rank = quantile * (self.count - 1)
+        seen = 0
+
+        # bins in value order, most negative first
+        bins = [
+            *((-self._value(index), count) for index, count in self._sorted(True)),
+            (0.0, self.zero),
+            *((self._value(index), count) for index, count in self._sorted(False)),
+        ]
+        for value, count in bins:
+            seen += count
+            if seen > rank:
+                return value
+
+        return bins[-1][0]
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "relative_error": self.relative_error,
+            "zero": self.zero,
+            "positive": {str(index): count for index, count in self.positive.items()},
+            "negative": {str(index): count for index, count in self.negative.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, values: dict[str, Any]) -> QuantileSketch:
+        sketch = cls(values["relative_error"])
+        sketch.zero = values["zero"]
+        sketch.positive = {int(i): count for i, count in values["positive"].items()}
+        sketch.negative = {int(i): count for i, count in values["negative"].items()}
+
+        return sketch
+
+    def _sorted(self, negative: bool) -> list[tuple[int, int]]:
+        counts = self.negative if negative else self.positive
+        return sorted(counts.items(), reverse=negative)
+
+    def _value(self, index: int) -> float:
+        # middle of the bin (gamma^(index-1), gamma^index] in relative terms
+        return 2 * self.gamma**index / (self.gamma + 1)
+
+
+def save_sketches(path: str, sketches: dict[str, QuantileSketch]) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    temporary_path = path.with_suffix(".tmp")
+    temporary_path.write_text(
+        json.dumps(
+            {column: sketch.to_dict() for column, sketch in sketches.items()},
+            indent=4,
+        )
+    )
+    temporary_path.replace(path)
+
+
+def load_sketches(path: str) -> dict[str, QuantileSketch]:
+    """Column sketches saved to the path, empty if they weren't saved yet."""
+    if not Path(path).exists():
+        return {}
+
+    return {
+        column: QuantileSketch.from_dict(values)
+        for column, values in json.loads(Path(path).read_text()).items()
+    }
+
+
+def bucket(column: str, buckets: int) -> pl.Expr:
+    """Bucket of the column value. Hashes are stable only within a polars
+    version, so tables joined bucket-wise have to be written by the same one.
+    """
+    return (pl.col(column).hash(seed=BUCKET_SEED) % buckets).cast(pl.UInt32)
+
+
 class Reader(ABC):
     """Abstract reader class. Subclasses implement read method."""
 
@@ -60,12 +309,23 @@ class Reader(ABC):
 
 
 class Writer(ABC):
-    """Abstract writer class. Subclasses implement write method."""
+    """Abstract writer class. Subclasses implement write method which accepts
+    both eager and lazy data. Writers which can't stream collect lazy data
+    in `sink`, merge is supported only by writers implementing it.
+    """
 
     @abstractmethod
-    def write(self, data: DataFrame, config: Config, *args, **kwargs) -> None:
+    def write(
+        self, data: DataFrame | LazyFrame, config: Config, *args, **kwargs
+    ) -> None:
         pass
 
+    def sink(self, data: LazyFrame, config: Config, *args, **kwargs) -> None:
+        self.write(data.collect(), config, *args, **kwargs)
+
+    def merge(self, data: DataFrame, config: Config, *args, **kwargs) -> None:
+        raise UnsupportedWriteMode(self.__class__.__name__, "merge")
+
 
 class App(ABC):
     """Definition of an application that is deployed and run as a job.
@@ -91,35 +351,1330 @@ class App(ABC):
     def read(self, config: Config, *args, **kwargs) -> LazyFrame:
         return self.reader.read(config, *args, **kwargs)
 
-    def write(self, data: DataFrame, config: Config, *args, **kwargs) -> None:
+    def write(
+        self, data: DataFrame | LazyFrame, config: Config, *args, **kwargs
+    ) -> None:
         self.writer.write(data, config, *args, **kwargs)
 
+    def merge(self, data: DataFrame, config: Config, *args, **kwargs) -> None:
+        self.writer.merge(data, config, *args, **kwargs)
+
+    def sink(self, data: LazyFrame, config: Config, *args, **kwargs) -> None:
+        self.writer.sink(data, config, *args, **kwargs)
+
+
+class DatasetManifest:
+    """Record of files of a multi-file parquet output. Each entry holds path
+    of the file relative to the output directory, its partition values, row
+    count and size, so readers can open files without listing directories.
+    Files of bucketed outputs also hold their bucket. Only files of finished
+    writes are recorded.
+    """
+
+    def __init__(self, path: str, directory: str) -> None:
+        self.path = Path(path)
+        self.directory = Path(directory)
+        self.files: list[dict] = []
+
+        if self.path.exists():
+            self.files = json.loads(self.path.read_text())
+
+    def add(
+        self,
+        file: Path,
+        partition: dict[str, str],
+        rows: int,
+        bucket: int | None = None,
+    ) -> None:
+        self.files.append(
+            {
+                "path": file.relative_to(self.directory).as_posix(),
+                "partition": partition,
+                "bucket": bucket,
+                "rows": rows,
+                "size": file.stat().st_size,
+            }
+        )
+
+    def remove(self, paths: list[Path]) -> None:
+        removed = {str(path) for path in paths}
+        self.files = [
+            file
+            for file in self.files
+            if str(self.directory / file["path"]) not in removed
+        ]
+
+    def paths(self, bucket: int | None = None) -> list[str]:
+        return [
+            str(self.directory / file["path"])
+            for file in self.files
+            if bucket is None or file.get("bucket") == bucket
+        ]
+
+    def partitions(self, column: str) -> list[tuple[str, list[str]]]:
+        """Files grouped by value of the partition column, ordered by value."""
+        partitions: dict[str, list[str]] = {}
+        for file in self.files:
+            value = file["partition"][column]
+            partitions.setdefault(value, []).append(str(self.directory / file["path"]))
+
+        return [(value, sorted(partitions[value])) for value in sorted(partitions)]
+
+    def bytes_per_row(self) -> float | None:
+        """Average size of a written row, used to size the following files."""
+        rows = sum(file["rows"] for file in self.files)
+        if not rows:
+            return None
+
+        return sum(file["size"] for file in self.files) / rows
+
+    def fingerprint(self) -> str:
+        """Hash of the recorded files, changed by every write of the output."""
+        content = json.dumps(self.files, sort_keys=True).encode()
+        return hashlib.sha256(content).hexdigest()
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        # replace manifest at once so readers never see a partial write
+        temporary_path = self.path.with_suffix(".tmp")
+        temporary_path.write_text(json.dumps(self.files, indent=4))
+        temporary_path.replace(self.path)
+
+
+def load_manifest(config: Config) -> DatasetManifest | None:
+    """Manifest of the output files if `manifest` is configured and written."""
+    path = config.get("manifest")
+    if not path or not Path(path).exists():
+        return None
+
+    return DatasetManifest(path, config.path)
+
+
+class KeyIndex:
+    """Sidecar index of an output's `index_by` columns, kept in a directory.
+    Every indexed file has a sorted run: keys of its rows with their row
+    group and row offset in the row group, sorted by key, in an uncompressed
+    Arrow IPC file. Indexed files with their runs are listed in `files.json`.
+    Runs are memory-mapped, so finding keys is a binary search over each run
+    and only the row groups holding them have to be read.
+
+    Runs are never merged: a write adds runs of the files it wrote and
+    drops runs of the removed ones, so updating the index reads and sorts
+    only the new rows.
+    """
+
+    def __init__(self, path: str, columns: list[str]) -> None:
+        self.path = Path(path)
+        self.columns = list(columns)
+        self.files: list[dict] = []
+        self.modified: int | None = None
+        self._runs: dict[str, DataFrame] = {}
+
+        if self._catalog.exists():
+            self.modified = self._catalog.stat().st_mtime_ns
+            self.files = json.loads(self._catalog.read_text())
+
+    @property
+    def _catalog(self) -> Path:
+        return self.path / "files.json"
+
+    def changed(self) -> bool:
+        """Whether the index was saved again since it was loaded."""
+        if not self._catalog.exists():
+            return self.modified is not None
+
+        return self._catalog.stat().st_mtime_ns != self.modified
+
+    def rows(self) -> int:
+        return sum(file["rows"] for file in self.files)
+
+    def update(self, files: list[str]) -> bool:
+        """Add runs of files which aren't indexed yet and drop runs of files
+        which were removed or changed since they were indexed.
+
+        Returns:
+            bool: Whether the index changed.
+        """
+        stats = {file: self._stat(file) for file in files}
+        kept = [
+            file
+            for file in self.files
+            if stats.get(file["path"]) == [file["size"], file["modified"]]
+        ]
+        indexed = {file["path"] for file in kept}
+        new = [file for file in files if file not in indexed]
+
+        if len(kept) == len(self.files) and not new:
+            return False
+
+        if self.path.is_file():
+            # index saved as a single file before it was split into runs
+            self.path.unlink()
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self.files = kept
+        for file in new:
+            run = self._locate(file)
+            name = f"{uuid4().hex}.arrow"
+            run.write_ipc(
+                self.path / name,
+                compression="uncompressed",
+                compat_level=CompatLevel.newest(),
+            )
+
+            size, modified = stats[file]
+            self.files.append(
+                {
+                    "path": file,
+                    "size": size,
+                    "modified": modified,
+                    "run": name,
+                    "rows": len(run),
+                }
+            )
+
+        return True
+
+    def find(self, keys: list[Any]) -> DataFrame:
+        """Locations of rows with the keys. A key is a value of the first
+        index column or a tuple of values of the leading ones.
+        """
+        locations = []
+        for position, file in enumerate(self.files):
+            run = self._run(file["run"])
+
+            for key in keys:
+                start, end = 0, len(run)
+                for column, value in zip(
+                    self.columns, key if isinstance(key, tuple) else (key,)
+                ):
+                    values = run[column].slice(start, end - start)
+                    start, end = (
+                        start + values.search_sorted(value, "left"),
+                        start + values.search_sorted(value, "right"),
+                    )
+
+                if end > start:
+                    locations.append(
+                        run.slice(start, end - start).select(
+                            pl.lit(position, dtype=pl.UInt32).alias("file"),
+                            "row_group",
+                            "row",
+                        )
+                    )
+
+        if not locations:
+            return pl.DataFrame(
+                schema={"file": pl.UInt32, "row_group": pl.UInt32, "row": pl.UInt32}
+            )
+
+        return pl.concat(locations)
+
+    def save(self) -> None:
+        """Save the list of runs, runs of files no longer indexed are removed
+        once it's replaced.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        # replace list at once so lookups never see a partial write
+        temporary_path = self._catalog.with_suffix(".tmp")
+        temporary_path.write_text(json.dumps(self.files, indent=4))
+        temporary_path.replace(self._catalog)
+        self.modified = self._catalog.stat().st_mtime_ns
+
+        runs = {file["run"] for file in self.files}
+        for run in self.path.glob("*.arrow"):
+            if run.name not in runs:
+                run.unlink(missing_ok=True)
+
+    def _run(self, name: str) -> DataFrame:
+        if name not in self._runs:
+            self._runs[name] = pl.read_ipc(self.path / name, memory_map=True)
+
+        return self._runs[name]
+
+    def _locate(self, file: str) -> DataFrame:
+        metadata = pq.read_metadata(file)
+        row_groups = pl.DataFrame(
+            {
+                "row_group": range(metadata.num_row_groups),
+                "rows": [
+                    metadata.row_group(row_group).num_rows
+                    for row_group in range(metadata.num_row_groups)
+                ],
+            },
+            schema={"row_group": pl.UInt32, "rows": pl.UInt32},
+        )
+        rows = (
+            row_groups.filter(pl.col("rows") > 0)
+            .select("row_group", pl.int_ranges(0, "rows", dtype=pl.UInt32).alias("row"))
+            .explode("row")
+        )
+
+        return pl.concat(
+            [pl.read_parquet(file, columns=self.columns), rows], how="horizontal"
+        ).sort(self.columns, nulls_last=True)
+
+    @staticmethod
+    def _stat(file: str) -> list[int] | None:
+        path = Path(file)
+        if not path.exists():
+            return None
+
+        return [path.stat().st_size, path.stat().st_mtime_ns]
+
+
+class ChangeLog:
+    """Log of changes of an output merged by `merge_keys`, kept in a directory.
+    Every merge that changed rows adds a numbered parquet file holding keys
+    of the rows it inserted, changed or deleted, any other write adds a
+    marker that the whole output was rewritten. Consumers keep the number of
+    the last change they processed and read only rows changed since.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+
+    def latest(self) -> int:
+        """Number of the last change, 0 if nothing was logged."""
+        return max((number for number, _ in self._changes()), default=0)
+
+    def append(self, keys: DataFrame | None = None) -> int:
+        """Log keys of changed rows, or a rewrite of the output without keys.
+
+        Returns:
+            int: Number of the change.
+        """
+        number = self.latest() + 1
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        if keys is None:
+            (self.path / f"{number:010}.rewrite").touch()
+            return number
+
+        # change is written aside and renamed, so it only appears complete
+        temporary_path = self.path / f".{number:010}.tmp"
+        keys.write_parquet(temporary_path)
+        temporary_path.rename(self.path / f"{number:010}.parquet")
+
+        return number
+
+    def rewritten(self, after: int) -> bool:
+        """Whether the output was rewritten after the change."""
+        return any(
+            number > after and path.suffix == ".rewrite"
+            for number, path in self._changes()
+        )
+
+    def read(self, after: int) -> LazyFrame | None:
+        """Distinct keys of rows changed after the change, None if no rows
+        changed since.
+        """
+        paths = [
+            str(path)
+            for number, path in self._changes()
+            if number > after and path.suffix == ".parquet"
+        ]
+        if not paths:
+            return None
+
+        return pl.scan_parquet(source=paths).unique()
+
+    def prune(self, through: int) -> None:
+        """Remove changes up to the one all consumers processed. The latest
+        change is kept, so numbers of the following ones keep growing.
+        """
+        latest = self.latest()
+        for number, path in self._changes():
+            if number <= through and number != latest:
+                path.unlink(missing_ok=True)
+
+    def _changes(self) -> list[tuple[int, Path]]:
+        if not self.path.exists():
+            return []
+
+        return [
+            (int(path.stem), path)
+            for path in self.path.iterdir()
+            if path.stem.isdigit() and path.suffix in (".parquet", ".rewrite")
+        ]
+
 
 # Readers
 class CsvReader(Reader):
     def read(self, config: Config, *args, **kwargs) -> LazyFrame:
-        return pl.scan_csv(source=config.path, has_header=True)
+        source = kwargs.get("source", config.path)
+
+        # types are inferred from the whole file only when schema is captured
+        schema = load_schema(
+            config,
+            lambda: pl.scan_csv(
+                source=source, has_header=True, infer_schema_length=None
+            ).collect_schema(),
+        )
+        if schema:
+            self._check_header(source, schema)
+
+        return pl.scan_csv(source=source, has_header=True, schema=schema)
+
+    def _check_header(self, source: str | list[str], schema: pl.Schema) -> None:
+        sources = glob(source) if isinstance(source, str) else source
+        for path in sources:
+            with open(path, newline="", encoding="utf-8") as source_file:
+                header = next(csv.reader(source_file), [])
+
+            if header != schema.names():
+                raise SchemaDriftError(path, schema.names(), header)
 
 
 class ParquetReader(Reader):
+    """Reads parquet files. For partitioned inputs, `start_date`/`end_date`
+    and `partitions` are resolved against partition directories so only
+    matching partitions are opened. Files of inputs with a `manifest` are
+    taken from it instead of listing directories. For bucketed inputs,
+    `bucket` reads files of a single bucket.
+
+    Inputs written with `index_by` can be looked up by key, reading only
+    the row groups holding the keys.
+    """
+
+    def __init__(self) -> None:
+        self._partitions: dict[str, list[tuple[str, list[str]]]] = {}
+        self._indexes: dict[str, KeyIndex] = {}
+        self._files: dict[str, pq.ParquetFile] = {}
+
     def read(self, config: Config, *args, **kwargs) -> LazyFrame:
-        schema = kwargs.get("schema")
+        schema = kwargs.get("schema") or load_schema(
+            config, lambda: pl.scan_parquet(source=config.path).collect_schema()
+        )
+
+        source = config.path
+        start_date = kwargs.get("start_date")
+        end_date = kwargs.get("end_date")
+        partitions = kwargs.get("partitions")
+        if config.get("partition_by") and (
+            (start_date and end_date) or partitions is not None
+        ):
+            source = self._prune_partitions(config, start_date, end_date, partitions)
+        elif (bucket := kwargs.get("bucket")) is not None:
+            source = self._bucket_files(config, bucket)
+        elif manifest := load_manifest(config):
+            source = manifest.paths()
+
+        if isinstance(source, list) and not source:
+            logger.info(f"No matching files on path: '{config.path}'")
+            return pl.LazyFrame(
+                schema=schema or pl.scan_parquet(source=config.path).collect_schema()
+            )
+
         if schema:
-            return pl.scan_parquet(source=config.path, schema=schema)
+            return pl.scan_parquet(source=source, schema=schema)
+
+        return pl.scan_parquet(source=source)
+
+    def lookup(self, config: Config, keys: list[Any]) -> DataFrame:
+        """Rows of the input with the keys, grouped by the row group they were
+        read from. A key is a value of the first `index_by` column or a
+        tuple of values of the leading ones.
+        """
+        index = self._index(config)
+
+        rows = [
+            pl.from_arrow(
+                self._file(index.files[file]["path"])
+                .read_row_group(row_group)
+                .take(locations["row"].to_arrow())
+            )
+            for (file, row_group), locations in index.find(keys).group_by(
+                "file", "row_group", maintain_order=True
+            )
+        ]
+        if not rows:
+            return self.read(config).head(0).collect()
+
+        return pl.concat(rows)
+
+    def partitions(self, config: Config) -> list[str]:
+        """Values of the first partition column present on the input path."""
+        return [value for value, _ in self._list_partitions(config)]
+
+    def partition_files(self, config: Config) -> list[tuple[str, list[str]]]:
+        """Files of the input grouped by value of the first partition column."""
+        return self._list_partitions(config)
+
+    def _index(self, config: Config) -> KeyIndex:
+        """Index of the input, loaded again once the writer saved it."""
+        index = self._indexes.get(config.index_path)
+        if index is None or index.changed():
+            index = KeyIndex(config.index_path, config.index_by)
+            if index.modified is None:
+                raise ValueError(f"Input on path: '{config.path}' isn't indexed.")
+
+            self._indexes[config.index_path] = index
+            # files can be rewritten in place, their footers are read again
+            for file in index.files:
+                self._files.pop(file["path"], None)
+
+        return index
+
+    def _file(self, path: str) -> pq.ParquetFile:
+        if path not in self._files:
+            self._files[path] = pq.ParquetFile(path)
+
+        return self._files[path]
+
+    def _bucket_files(self, config: Config, bucket: int) -> list[str]:
+        if manifest := load_manifest(config):
+            files = manifest.paths(bucket)
+        else:
+            files = sorted(
+                str(file)
+                for file in Path(config.path).glob(f"**/bucket-{bucket:05}-*.parquet")
+            )
+
+        # an input written before bucketing was configured would read as empty
+        if not files and not any(Path(config.path).glob("**/bucket-*.parquet")):
+            raise ValueError(f"Input on path: '{config.path}' isn't bucketed.")
+
+        return files
+
+    def _prune_partitions(
+        self,
+        config: Config,
+        start_date: Any = None,
+        end_date: Any = None,
+        partitions: list[str] | None = None,
+    ) -> list[str]:
+        """Files of partitions in range [start_date, end_date) and/or in the
+        given partitions. Partition values are ISO dates, so they are compared
+        as strings.
+        """
+        files = []
+        for value, partition_files in self._list_partitions(config):
+            if start_date and end_date and not str(start_date) <= value < str(end_date):
+                continue
+            if partitions is not None and value not in partitions:
+                continue
+
+            files.extend(partition_files)
+
+        return files
+
+    def _list_partitions(self, config: Config) -> list[tuple[str, list[str]]]:
+        if config.path not in self._partitions:
+            if manifest := load_manifest(config):
+                self._partitions[config.path] = manifest.partitions(
+                    config.partition_by[0]
+                )
+                return self._partitions[config.path]
+
+            prefix = f"{config.partition_by[0]}="
+            partitions = []
 
-        return pl.scan_parquet(source=config.path)
+            for directory in sorted(Path(config.path).glob(f"{prefix}*")):
+                value = directory.name.removeprefix(prefix)
+                files = sorted(str(file) for file in directory.glob("**/*.parquet"))
+                partitions.append((value, files))
+
+            self._partitions[config.path] = partitions
+
+        return self._partitions[config.path]
 
 
 # Writers
 
 
 class ParquetWriter(Writer):
-    def write(self, data: DataFrame, config: Config, *args, **kwargs) -> None:
+    """Writes parquet files. Partitioned data is written to hive directories
+    and every write adds new uniquely named files, so partitions written
+    earlier are appended to instead of overwritten.
+
+    Outputs with `target_file_size_mb` in their layout are split into files
+    of about that size. Unpartitioned ones are then written to a directory
+    whose files are replaced on every write, unless it's called with
+    `append=True`. Eager writes write files concurrently, sinks one after
+    another as data is streamed. Files are recorded in the output `manifest`
+    if it's configured.
+
+    Data is sorted by the output `sort_by` columns before it's written, so
+    row groups and files cover narrow key ranges and their statistics let
+    readers skip the ones a filter doesn't match.
+
+    Outputs with `bucket_by` are hash-partitioned on that column into
+    `buckets` files, so tables bucketed on the same key can be joined one
+    bucket at a time.
+
+    Outputs with `index_by` get a `KeyIndex` of those columns saved to
+    `index_path` after every write, for `ParquetReader.lookup`. Only files
+    written since the last write are indexed, each in a run of its own.
+
+    Outputs with `changes_path` get a `ChangeLog` there: merges log keys of
+    the rows they changed, other writes log a rewrite of the output.
+
+    Outputs with a `sketch` get a `QuantileSketch` of its `columns` saved to
+    its `path`. Sketches of written files are merged into the saved ones and
+    sketches of replaced files taken out of them, so only files a write
+    touches are read.
+
+    Files passed as `replaces` are removed once the new ones are recorded,
+    e.g. output of a source ingested again in the same partition.
+    """
+
+    def write(
+        self, data: DataFrame | LazyFrame, config: Config, *args, **kwargs
+    ) -> None:
+        append = kwargs.get("append", False)
+        if append and not self._is_multi_file(config):
+            raise ValueError(f"Can't append to a single file output: '{config.path}'")
+
+        if isinstance(data, LazyFrame):
+            data = self._sink_or_collect(data, config, append)
+            if data is None:
+                return
+
+        data = self._sort(data, config)
+
+        if not self._is_multi_file(config):
+            data.write_parquet(file=config.path, **self._options(config))
+            self._update_sketches(config, [Path(config.path)])
+            self._update_index(config)
+            self._log_changes(config)
+            return
+
+        if len(config.partition_by):
+            partitions = data.partition_by(config.partition_by, as_dict=True)
+        else:
+            partitions = {(): data}
+
+        replaced = self._replaced_files(config, append, kwargs.get("replaces"))
+        manifest = self._manifest(config)
+        directory = self._output_directory(config)
+
+        files = [
+            (
+                self._partition_path(config, values, bucket_id, directory),
+                values,
+                bucket_id,
+                chunk,
+            )
+            for values, partition in partitions.items()
+            for bucket_id, data_bucket in self._buckets(partition, config)
+            for chunk in self._split(data_bucket, config, manifest)
+        ]
+
+        self._write_files(config, files)
+        self._record(
+            config,
+            manifest,
+            [
+                (path, values, bucket_id, len(chunk))
+                for path, values, bucket_id, chunk in files
+            ],
+            replaced,
+            append,
+        )
+        self._update_index(config)
+        self._log_changes(config)
+
+    def merge(self, data: DataFrame, config: Config, *args, **kwargs) -> None:
+        """Upsert data into an existing output by `merge_keys`. Rows of the
+        output with the same keys are replaced by the new ones. With `keys`,
+        rows of those keys are replaced and the ones missing from data are
+        deleted.
+
+        Multi-file outputs rewrite only the files which can hold the keys:
+        files of the buckets the keys hash to, whose statistics of the key
+        columns cover some of the keys. Rows of new keys are written with
+        them. Other files and their manifest entries stay as they are.
+        """
+        path = Path(config.path)
+        if not path.exists():
+            self.write(data, config)
+            return
+
+        merge_keys = list(config.merge_keys)
+        keys = kwargs.get("keys")
+        if keys is None:
+            keys = data.select(merge_keys)
+
+        if not self._is_multi_file(config):
+            existing = pl.scan_parquet(source=path)
+            merged = pl.concat(
+                [existing.join(keys.lazy(), on=merge_keys, how="anti"), data.lazy()],
+                how="vertical_relaxed",
+            ).collect()
+            changes = self._changed_keys(config, existing, data, keys)
+
+            # file is read and replaced, write it next to the original first
+            temporary_path = path.with_suffix(".tmp")
+            self._sort(merged, config).write_parquet(
+                file=temporary_path, **self._options(config)
+            )
+            temporary_path.replace(path)
+            self._update_sketches(config, [path])
+            self._update_index(config)
+            self._log_changes(config, changes)
+            return
+
+        buckets = None
+        if config.get("bucket_by"):
+            buckets = set(
+                keys.select(bucket(config.bucket_by, config.buckets)).to_series()
+            )
+
+        affected = [
+            file
+            for file, bucket_id in self._output_files(config)
+            if (buckets is None or bucket_id in buckets)
+            and self._may_hold(file, keys, merge_keys)
+        ]
+
+        frames = [data.lazy()]
+        changes = None
+        if affected:
+            existing = pl.scan_parquet(source=affected)
+            frames.insert(0, existing.join(keys.lazy(), on=merge_keys, how="anti"))
+            changes = self._changed_keys(config, existing, data, keys)
+        elif config.get("changes_path"):
+            changes = keys
+        merged = self._sort(pl.concat(frames, how="vertical_relaxed").collect(), config)
+
+        manifest = self._manifest(config)
+        files = [
+            (self._partition_path(config, (), bucket_id), (), bucket_id, chunk)
+            for bucket_id, data_bucket in self._buckets(merged, config)
+            for chunk in self._split(data_bucket, config, manifest)
+        ]
+        self._write_files(config, files)
+
+        logger.info(f"Merge replaced {len(affected)} file(s) on path: '{config.path}'")
+
+        self._record(
+            config,
+            manifest,
+            [
+                (path, values, bucket_id, len(chunk))
+                for path, values, bucket_id, chunk in files
+            ],
+            affected,
+            append=True,
+        )
+        self._update_index(config)
+        self._log_changes(config, changes)
+
+    def sink(self, data: LazyFrame, config: Config, *args, **kwargs) -> None:
+        """Stream lazy data to parquet without materializing it in memory.
+        Streaming sink can't split data by partition, so partition columns
+        have to hold a single value per run (e.g. `ingestion_date`).
+        Output is placed in the same hive directory `write` would use, split
+        into files of the target size as it's streamed. Rows of bucketed
+        outputs are routed to files of their bucket.
+        """
+        append = kwargs.get("append", False)
+        data = self._sort(data, config)
+        values: tuple = ()
+
+        if len(config.partition_by):
+            partition = data.select(config.partition_by).head(1).collect()
+            if partition.is_empty():
+                logger.warning(f"No data to write on path: '{config.path}'")
+                return
+
+            values = partition.row(0)
+
+        chunk_size = kwargs.get("chunk_size")
+        if not self._is_multi_file(config):
+            options = {
+                "row_group_size": chunk_size,
+                **self._options(config, streaming=True),
+            }
+            with pl.Config(streaming_chunk_size=chunk_size):
+                data.sink_parquet(config.path, **options)
+
+            self._update_sketches(config, [Path(config.path)])
+            self._update_index(config)
+            self._log_changes(config)
+            return
+
+        replaced = self._replaced_files(config, append, kwargs.get("replaces"))
+        manifest = self._manifest(config)
+        directory = self._output_directory(config)
+
+        with pl.Config(streaming_chunk_size=chunk_size):
+            files = self._sink_files(
+                data,
+                config,
+                lambda bucket_id: self._partition_path(
+                    config, values, bucket_id, directory
+                ),
+                self._layout(config).get("row_group_size", chunk_size),
+                manifest and manifest.bytes_per_row(),
+            )
+
+        self._record(
+            config,
+            manifest,
+            [(file, values, bucket_id, rows) for file, bucket_id, rows in files],
+            replaced,
+            append,
+        )
+        self._update_index(config)
+        self._log_changes(config)
+
+    def _write_files(
+        self, config: Config, files: list[tuple[Path, tuple, int | None, DataFrame]]
+    ) -> None:
+        options = self._options(config)
+        with ThreadPoolExecutor(self._layout(config).get("write_threads")) as executor:
+            list(
+                executor.map(
+                    lambda file: file[3].write_parquet(file=file[0], **options), files
+                )
+            )
+
+        logger.info(f"{len(files)} file(s) written to path: '{config.path}'")
+
+    def _output_files(self, config: Config) -> list[tuple[Path, int | None]]:
+        """Files of a multi-file output with their bucket."""
+        if manifest := load_manifest(config):
+            return [
+                (manifest.directory / file["path"], file.get("bucket"))
+                for file in manifest.files
+            ]
+
+        return [
+            (file, self._file_bucket(file))
+            for file in sorted(Path(config.path).glob("**/*.parquet"))
+        ]
+
+    @staticmethod
+    def _file_bucket(file: Path) -> int | None:
+        if not file.name.startswith("bucket-"):
+            return None
+
+        return int(file.name.split("-")[1])
+
+    @staticmethod
+    def _may_hold(file: Path, data: DataFrame, columns: list[str]) -> bool:
+        """Whether min and max statistics of the file's columns cover values
+        of all of the columns in data. Files without statistics may hold any.
+        """
+        metadata = pq.read_metadata(file)
+        names = [metadata.schema.column(i).name for i in range(metadata.num_columns)]
+
+        for column in columns:
+            if column not in names:
+                return True
+
+            statistics = [
+                metadata.row_group(row_group).column(names.index(column)).statistics
+                for row_group in range(metadata.num_row_groups)
+            ]
+            if not statistics or not all(
+                stats is not None and stats.has_min_max for stats in statistics
+            ):
+                return True
+
+            low = min(stats.min for stats in statistics)
+            high = max(stats.max for stats in statistics)
+            if not data[column].is_between(low, high).any():
+                return False
+
+        return True
+
+    def _sink_files(
+        self,
+        data: LazyFrame,
+        config: Config,
+        new_path: Callable[[int | None], Path],
+        row_group_size: int | None = None,
+        bytes_per_row: float | None = None,
+    ) -> list[tuple[Path, int | None, int]]:
+        """Stream data into files of about the target size in a single pass.
+        Polars sinks a plan to a single file only, so it's sunk as Arrow IPC
+        into a pipe and its batches are written to parquet files here, a new
+        file is started once one reaches the target size. Rows of bucketed
+        outputs are routed to a file per bucket. Data is encoded and written
+        once, batches are buffered into row groups of `row_group_size` rows.
+
+        Rows per file are estimated like in `_split` and corrected by the
+        size of every finished file.
+
+        Returns:
+            list[tuple[Path, int | None, int]]: Written files with their bucket
+            and row count.
+        """
+        staging = Path(tempfile.mkdtemp())
+        pipe = staging / "stream.arrow"
+        os.mkfifo(pipe)
+
+        files: list[list] = []
+        errors: list[BaseException] = []
+
+        def write() -> None:
+            try:
+                self._write_stream(
+                    pipe, config, new_path, row_group_size, bytes_per_row, files
+                )
+            except BaseException as error:  # pylint: disable=broad-exception-caught
+                errors.append(error)
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        try:
+            data.sink_ipc(pipe, compression=None)
+        except BaseException:
+            # reader may still wait for the pipe to be opened, release it
+            while thread.is_alive():
+                try:
+                    os.close(os.open(pipe, os.O_WRONLY | os.O_NONBLOCK))
+                except OSError:
+                    pass
+                thread.join(0.01)
+
+            self._remove_files(file for file, _, _ in files)
+            raise
+        finally:
+            thread.join()
+            shutil.rmtree(staging, ignore_errors=True)
+
+        if errors:
+            self._remove_files(file for file, _, _ in files)
+            raise errors[0]
+
+        return [(file, bucket_id, rows) for file, bucket_id, rows in files]
+
+    def _write_stream(
+        self,
+        pipe: Path,
+        config: Config,
+        new_path: Callable[[int | None], Path],
+        row_group_size: int | None,
+        bytes_per_row: float | None,
+        files: list[list],
+    ) -> None:
+        target = self._target_file_size(config)
+        options = self._pyarrow_options(config)
+        # file, its sink, writer and rows not written yet of every bucket
+        writing: dict[
+            int | None, tuple[list, pa.OSFile, pq.ParquetWriter, list[pa.Table]]
+        ] = {}
+
+        def flush(bucket_id: int | None, final: bool = False) -> None:
+            _, _, writer, pending = writing[bucket_id]
+            table = pa.concat_tables(pending) if pending else None
+            if table is None or (
+                not final and row_group_size and table.num_rows < row_group_size
+            ):
+                return
+
+            # whole row groups are written, the rest waits for following batches
+            rows = table.num_rows
+            if not final and row_group_size:
+                rows -= rows % row_group_size
+
+            writer.write_table(table.slice(0, rows), row_group_size=row_group_size)
+            pending[:] = [table.slice(rows)] if rows < table.num_rows else []
+
+        def close(bucket_id: int | None) -> float:
+            flush(bucket_id, final=True)
+            file, sink, writer, _ = writing.pop(bucket_id)
+            writer.close()
+            size = sink.tell()
+            sink.close()
+
+            return size / max(file[2], 1)
+
+        with open(pipe, "rb") as stream:
+            try:
+                # IPC file starts with magic bytes, then an IPC stream follows
+                stream.read(8)
+                reader = pa.ipc.open_stream(stream)
+                for batch in reader:
+                    for bucket_id, part in self._buckets(pl.from_arrow(batch), config):
+                        # polars converts view types pyarrow can't write
+                        table = part.to_arrow()
+                        if target and not bytes_per_row and table.num_rows:
+                            bytes_per_row = table.nbytes / table.num_rows
+
+                        offset = 0
+                        while offset < table.num_rows:
+                            if bucket_id not in writing:
+                                files.append([new_path(bucket_id), bucket_id, 0])
+                                sink = pa.OSFile(str(files[-1][0]), "wb")
+                                writing[bucket_id] = (
+                                    files[-1],
+                                    sink,
+                                    pq.ParquetWriter(sink, table.schema, **options),
+                                    [],
+                                )
+
+                            file, sink, _, pending = writing[bucket_id]
+                            rows = table.num_rows - offset
+                            if target:
+                                rows_per_file = max(int(target / bytes_per_row), 1)
+                                rows = min(rows, max(rows_per_file - file[2], 1))
+
+                            pending.append(table.slice(offset, rows))
+                            flush(bucket_id)
+                            file[2] += rows
+                            offset += rows
+
+                            if target and (
+                                sink.tell() >= target or file[2] >= rows_per_file
+                            ):
+                                bytes_per_row = close(bucket_id)
+
+                if not files:
+                    bucket_id = 0 if config.get("bucket_by") else None
+                    empty = pl.from_arrow(reader.schema.empty_table()).to_arrow()
+                    files.append([new_path(bucket_id), bucket_id, 0])
+                    pq.write_table(empty, str(files[-1][0]), **options)
+            finally:
+                for bucket_id in list(writing):
+                    close(bucket_id)
+
+                # rest of the file or of a failed stream is drained, so the
+                # sink never blocks on a full pipe
+                while stream.read(1024 * 1024):
+                    pass
+
+    @staticmethod
+    def _remove_files(files: Any) -> None:
+        for file in files:
+            Path(file).unlink(missing_ok=True)
+
+    def _sink_or_collect(
+        self, data: LazyFrame, config: Config, append: bool = False
+    ) -> DataFrame | None:
+        """Stream lazy data to the output if the plan can be streamed. Plans with
+        operations the streaming engine doesn't support (e.g. median, std) and
+        partitioned outputs are collected and returned for an eager write.
+        Other errors, e.g. of a failed cast, are raised.
+        """
         if len(config.partition_by):
-            partition_by = config.partition_by
+            logger.info("Collecting data for partitioned write.")
+            return data.collect()
+
+        try:
+            self.sink(data, config, append=append)
+            logger.info(f"Data streamed to path: '{config.path}'")
+            return None
+        except pl.exceptions.InvalidOperationError as error:
+            if STREAMING_UNSUPPORTED not in str(error):
+                raise
+
+            logger.info("Plan can't be streamed, collecting it.")
+            logger.debug(error)
+            return data.collect()
+
+    def _sort(
+        self, data: DataFrame | LazyFrame, config: Config
+    ) -> DataFrame | LazyFrame:
+        if sort_by := config.get("sort_by"):
+            return data.sort(list(sort_by), nulls_last=True)
+
+        return data
+
+    def _layout(self, config: Config) -> dict[str, Any]:
+        return config.get("layout") or {}
+
+    def _options(self, config: Config, streaming: bool = False) -> dict[str, Any]:
+        """Parquet options from the output `layout`: compression, compression_level,
+        row_group_size, data_page_size, statistics and use_dictionary.
+        Dictionary encoding can only be set through pyarrow, so it applies
+        to eager writes only.
+        """
+        layout = self._layout(config)
+        options = {"compression": layout.get("compression", "snappy")}
+
+        for option in (
+            "compression_level",
+            "row_group_size",
+            "data_page_size",
+            "statistics",
+        ):
+            if option in layout:
+                options[option] = layout[option]
+
+        if not streaming and "use_dictionary" in layout:
+            options["use_pyarrow"] = True
+            options["pyarrow_options"] = {"use_dictionary": layout["use_dictionary"]}
+            # pyarrow doesn't support polars "full" statistics
+            if options.get("statistics") == "full":
+                options["statistics"] = True
+
+        return options
+
+    def _pyarrow_options(self, config: Config) -> dict[str, Any]:
+        """Output `layout` as options of pyarrow's parquet writer. Row group size
+        is an option of its writes, it's passed with every write instead.
+        """
+        layout = self._layout(config)
+        options = {"compression": layout.get("compression", "snappy")}
+
+        if "compression_level" in layout:
+            options["compression_level"] = layout["compression_level"]
+        if "data_page_size" in layout:
+            options["data_page_size"] = layout["data_page_size"]
+        if "statistics" in layout:
+            options["write_statistics"] = bool(layout["statistics"])
+        if "use_dictionary" in layout:
+            options["use_dictionary"] = layout["use_dictionary"]
+
+        return options
+
+    def _is_multi_file(self, config: Config) -> bool:
+        return bool(
+            len(config.partition_by)
+            or config.get("bucket_by")
+            or self._layout(config).get("target_file_size_mb")
+        )
+
+    def _target_file_size(self, config: Config) -> int | None:
+        if size := self._layout(config).get("target_file_size_mb"):
+            return int(size * 1024 * 1024)
+
+        return None
+
+    def _manifest(self, config: Config) -> DatasetManifest | None:
+        """Manifest of the output. A new manifest of a multi-file output starts
+        with files written before it was configured, so they stay readable.
+        """
+        if not config.get("manifest"):
+            return None
+
+        manifest = DatasetManifest(config.manifest, config.path)
+        directory = Path(config.path)
+        if not manifest.path.exists() and directory.is_dir():
+            for file in sorted(directory.glob("**/*.parquet")):
+                partition = dict(
+                    part.split("=", 1)
+                    for part in file.relative_to(directory).parent.parts
+                )
+                rows = pq.read_metadata(file).num_rows
+                manifest.add(file, partition, rows, self._file_bucket(file))
+
+        return manifest
+
+    def _buckets(
+        self, data: DataFrame, config: Config
+    ) -> list[tuple[int | None, DataFrame]]:
+        if not config.get("bucket_by"):
+            return [(None, data)]
+
+        buckets = data.with_columns(
+            bucket(config.bucket_by, config.buckets).alias("_bucket")
+        ).partition_by("_bucket", as_dict=True, include_key=False)
+
+        return [(bucket_id, buckets[(bucket_id,)]) for (bucket_id,) in sorted(buckets)]
+
+    def _split(
+        self, data: DataFrame, config: Config, manifest: DatasetManifest | None
+    ) -> list[DataFrame]:
+        """Split data into chunks of about the target file size. Row size is
+        taken from files written before, until there are some the in-memory
+        size is used, which makes the first files smaller than the target.
+        """
+        target = self._target_file_size(config)
+        if not target or data.is_empty():
+            return [data]
+
+        bytes_per_row = (manifest and manifest.bytes_per_row()) or (
+            data.estimated_size() / len(data)
+        )
+        rows = max(int(target / bytes_per_row), 1)
+
+        return [data.slice(offset, rows) for offset in range(0, len(data), rows)]
+
+    def _replaced_files(
+        self, config: Config, append: bool = False, replaces: list[str] | None = None
+    ) -> list[Path]:
+        """Files an unpartitioned multi-file write replaces and the `replaces`
+        ones. Output written before as a single file is replaced by the new
+        directory once it's written.
+        """
+        path = Path(config.path)
+        replaced = [Path(file) for file in replaces or []]
+        if append or len(config.partition_by) or not self._is_multi_file(config):
+            return replaced
+
+        return replaced + list(path.glob("*.parquet"))
+
+    def _output_directory(self, config: Config) -> Path:
+        """Directory new files are written to. A single file output can't be
+        replaced by a directory before the write finishes, so the directory
+        is staged next to it and swapped in when files are recorded.
+        """
+        path = Path(config.path)
+        if path.is_file():
+            return path.with_name(f"{path.name}.staged")
+
+        return path
+
+    def _record(
+        self,
+        config: Config,
+        manifest: DatasetManifest | None,
+        files: list[tuple[Path, tuple, int | None, int]],
+        replaced: list[Path],
+        append: bool = False,
+    ) -> None:
+        """Record written files in the manifest and remove replaced ones. Files
+        are removed after the manifest is saved, so readers using it never
+        see an output without files. Files staged next to a single file
+        output replace it first.
+        """
+        path = Path(config.path)
+        staged = self._output_directory(config)
+        if staged != path:
+            previous = path.with_name(f"{path.name}.replaced")
+            path.rename(previous)
+            staged.rename(path)
+            previous.unlink()
+            files = [
+                (path / file.relative_to(staged), values, bucket_id, rows)
+                for file, values, bucket_id, rows in files
+            ]
+
+        if manifest is not None:
+            if not append and not len(config.partition_by):
+                manifest.files = []
+            manifest.remove(replaced)
+
+            for path, values, bucket_id, rows in files:
+                partition = {
+                    column: str(value)
+                    for column, value in zip(config.partition_by, values)
+                }
+                manifest.add(path, partition, rows, bucket_id)
+
+            manifest.save()
+
+        # replaced files are read for their sketches before they're removed
+        self._update_sketches(
+            config,
+            [path for path, _, _, _ in files],
+            replaced,
+            reset=not append and not len(config.partition_by),
+        )
+
+        for path in replaced:
+            path.unlink(missing_ok=True)
+
+    def _update_sketches(
+        self,
+        config: Config,
+        written: list[Path],
+        replaced: list[Path] | None = None,
+        reset: bool = True,
+    ) -> None:
+        """Merge sketches of written files into the saved sketches of the
+        output and take out sketches of replaced ones. Sketches are built from
+        the written files alone when the write replaced the whole output or
+        none were saved with the same relative error yet.
+        """
+        sketch = config.get("sketch")
+        if not sketch:
+            return
+
+        def build(files: list[Path]) -> dict[str, QuantileSketch]:
+            if not files:
+                return {
+                    column: QuantileSketch(sketch.relative_error)
+                    for column in sketch.columns
+                }
+
+            data = pl.scan_parquet(source=[str(file) for file in files])
+            return {
+                column: QuantileSketch.build(data, column, sketch.relative_error)
+                for column in sketch.columns
+            }
+
+        sketches = load_sketches(sketch.path)
+        if (
+            reset
+            or set(sketches) != set(sketch.columns)
+            or any(
+                saved.relative_error != sketch.relative_error
+                for saved in sketches.values()
+            )
+        ):
+            sketches = build(written)
+        else:
+            for files, sign in ((written, 1), (replaced or [], -1)):
+                for column, delta in build(files).items():
+                    sketches[column].merge(delta, sign)
+
+        save_sketches(sketch.path, sketches)
+        logger.info(f"Saved quantile sketches to: '{sketch.path}'")
+
+    def _update_index(self, config: Config) -> None:
+        """Index the output `index_by` columns once its files are written."""
+        if not config.get("index_by"):
+            return
+
+        if manifest := load_manifest(config):
+            files = manifest.paths()
+        elif Path(config.path).is_dir():
+            files = sorted(str(file) for file in Path(config.path).glob("**/*.parquet"))
         else:
-            partition_by = None
+            files = [config.path]
+
+        index = KeyIndex(config.index_path, config.index_by)
+        if index.update(files):
+            index.save()
+            logger.info(f"Indexed {index.rows()} rows to: '{config.index_path}'")
 
-        data.write_parquet(
-            file=config.path, compression="snappy", partition_by=partition_by
+    @staticmethod
+    def _changed_keys(
+        config: Config, existing: LazyFrame, data: DataFrame, keys: DataFrame
+    ) -> DataFrame | None:
+        """Keys of rows a merge inserts, changes or deletes, rows equal to
+        the existing ones aren't changes. Only computed for outputs with a
+        change log.
+        """
+        if not config.get("changes_path"):
+            return None
+
+        merge_keys = keys.columns
+        existing = existing.select(data.columns).cast(dict(data.schema), strict=False)
+        changed = data.lazy().join(
+            existing, on=data.columns, how="anti", join_nulls=True
+        )
+        deleted = (
+            keys.lazy()
+            .join(data.lazy(), on=merge_keys, how="anti", join_nulls=True)
+            .join(existing, on=merge_keys, how="semi", join_nulls=True)
         )
+
+        return pl.concat([changed.select(merge_keys), deleted]).unique().collect()
+
+    def _log_changes(self, config: Config, keys: DataFrame | None = None) -> None:
+        """Log keys of rows changed by a merge, or a rewrite of the output."""
+        if not config.get("changes_path"):
+            return
+
+        if keys is not None and keys.is_empty():
+            return
+
+        ChangeLog(config.changes_path).append(keys)
+
+    def _partition_path(
+        self,
+        config: Config,
+        values: tuple,
+        bucket_id: int | None = None,
+        directory: Path | None = None,
+    ) -> Path:
+        path = directory or Path(config.path)
+        for column, value in zip(config.partition_by, values):
+            path = path / f"{column}={value}"
+
+        path.mkdir(parents=True, exist_ok=True)
+
+        if bucket_id is not None:
+            return path / f"bucket-{bucket_id:05}-{uuid4().hex}.parquet"
+
+        return path / f"{uuid4().hex}.parquet"
@@ -10,3 +10,31 @@ class MissingClassImplementation(Exception):
         self, class_name: str, message: str = "Missing class implementation"
     ) -> None:
         super().__init__(f"{message} '{class_name}'")
+
+
+class SchemaDriftError(Exception):
+    def __init__(
+        self,
+        source: str,
+        expected: list[str],
+        actual: list[str],
+        message: str = "Schema drift detected",
+    ) -> None:
+        super().__init__(
+            f"{message} for '{source}'. Expected columns: {expected}, found: {actual}"
+        )
+
+
+class UnsupportedWriteMode(Exception):
+    def __init__(
+        self, writer: str, mode: str, message: str = "Unsupported write mode"
+    ) -> None:
+        super().__init__(f"{message} '{mode}' of '{writer}'")
+
+
+class InvalidRequest(Exception):
+    def __init__(
+        self, status: int, reason: str, message: str = "Invalid request"
+    ) -> None:
+        self.status = status
+        super().__init__(f"{message}: {reason}")
@@ -8,13 +8,16 @@ logger = logging.getLogger(__name__)
 class IngestionCheckoutApp(IngestionApp):
     def run(self) -> None:
         try:
-            data = self.read(self.config.input)
-            transformed_data = self.transform(data)
+            sources = self.changed_sources()
+            if not sources:
+                logger.info("No new source files to ingest.")
+                return
 
-            transformed_data = transformed_data.collect()
+            data = self.read(self.config.input, source=sources)
+            transformed_data = self.transform(data)
 
-            logger.info(f"Saving data on path: '{self.config.output.path}'")
-            self.write(transformed_data, self.config.output)
+            self.save(transformed_data, sources)
+            self.update_manifest(sources)
         except Exception as error:
             logger.error(error)
             logger.warning("Shuting down job.")
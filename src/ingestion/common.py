@@ -1,20 +1,267 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
 import re
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
+from glob import glob
+from itertools import islice
+from pathlib import Path
 
+import polars as pl
 from polars import LazyFrame
 
-from src.common import App
+from src.common import App, Config, Reader, Writer
+
+logger = logging.getLogger(__name__)
+
+# rows sampled from the source file to estimate the in-memory row size
+SAMPLE_ROWS = 1000
+# decoded rows take more space than their CSV representation
+MEMORY_OVERHEAD = 2
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class SourceManifest:
+    """Record of source files ingested to the bronze layer. Each entry holds
+    size, modification time and content hash of the file, partitions the
+    file was written to and the files written from it.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self.entries: dict[str, dict] = {}
+        # hashes computed during this run, so files are read once
+        self._hashes: dict[str, str] = {}
+
+        if self.path.exists():
+            self.entries = json.loads(self.path.read_text())
+
+    def is_changed(self, source: Path) -> bool:
+        entry = self.entries.get(str(source))
+        if not entry:
+            return True
+
+        stat = source.stat()
+        if entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            return False
+
+        # file was touched, compare content before ingesting it again
+        if entry["hash"] != self._hash(source):
+            return True
+
+        # content is the same, new modification time spares the next hash
+        entry["size"], entry["mtime"] = stat.st_size, stat.st_mtime
+        return False
+
+    def files(self, source: str, partition: Path) -> list[str]:
+        """Files written from the source to the partition. Entries recorded
+        before files were, hold the partition directory only, so all of its
+        files are taken.
+        """
+        entry = self.entries.get(source)
+        if not entry:
+            return []
+
+        if "files" in entry:
+            return [file for file in entry["files"] if Path(file).parent == partition]
+
+        if str(partition) in entry["partitions"]:
+            return sorted(str(file) for file in partition.glob("*.parquet"))
+
+        return []
+
+    def add(self, source: Path, partitions: list[str], files: list[str]) -> None:
+        stat = source.stat()
+        self.entries[str(source)] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "hash": self._hash(source),
+            "partitions": partitions,
+            "files": files,
+        }
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        # replace manifest at once so a failed write doesn't corrupt it
+        temporary_path = self.path.with_suffix(".tmp")
+        temporary_path.write_text(json.dumps(self.entries, indent=4))
+        temporary_path.replace(self.path)
+
+    def _hash(self, source: Path) -> str:
+        if str(source) not in self._hashes:
+            digest = hashlib.sha256()
+            with open(source, "rb") as source_file:
+                while block := source_file.read(HASH_BLOCK_SIZE):
+                    digest.update(block)
+
+            self._hashes[str(source)] = digest.hexdigest()
+
+        return self._hashes[str(source)]
 
 
 class IngestionApp(App):
+    def __init__(
+        self,
+        config: Config,
+        reader: Reader,
+        writer: Writer,
+        arguments: dict | None = None,
+    ) -> None:
+        super().__init__(config, reader, writer, arguments)
+        self.ingestion_date: date | None = None
+        self.manifest: SourceManifest | None = None
+        # files of earlier ingestions of the same day the new output replaces
+        self.replaced_files: list[str] = []
+        self.written_files: list[str] = []
+
     def transform(self, data: LazyFrame) -> LazyFrame:
         data = self._rename_columns(data)
         data = self._add_ingestion_date_column(data)
 
         return data
 
+    def changed_sources(self) -> list[str]:
+        """Source files matching the input path which weren't ingested before
+        or have changed since. All files are returned if manifest isn't configured.
+
+        A source ingested again on the same day replaces the files written
+        from it earlier in that day's partition. Sources which were written
+        to the same files are ingested again with it, so none of their rows
+        are lost.
+        """
+        sources = sorted(glob(self.config.input.path))
+
+        manifest_path = self.config.get("manifest")
+        if not manifest_path:
+            return sources
+
+        self.manifest = SourceManifest(manifest_path)
+        changed = [
+            source for source in sources if self.manifest.is_changed(Path(source))
+        ]
+
+        logger.info(f"{len(sources) - len(changed)} unchanged source file(s) skipped.")
+
+        self.ingestion_date = datetime.now(timezone.utc).date()
+        if not len(self.config.output.partition_by):
+            return changed
+
+        partition = self._partition()
+        self.replaced_files = []
+        pending = changed
+        while pending:
+            files = {
+                file
+                for source in pending
+                for file in self.manifest.files(source, partition)
+                if file not in self.replaced_files
+            }
+            self.replaced_files.extend(sorted(files))
+            pending = [
+                source
+                for source in sources
+                if source not in changed
+                and files.intersection(self.manifest.files(source, partition))
+            ]
+            changed = sorted(changed + pending)
+
+        if self.replaced_files:
+            logger.info(
+                f"{len(self.replaced_files)} file(s) ingested earlier today replaced."
+            )
+
+        return changed
+
+    def update_manifest(self, sources: list[str]) -> None:
+        manifest_path = self.config.get("manifest")
+        if not manifest_path:
+            return
+
+        if len(self.config.output.partition_by):
+            partitions = [str(self._partition())]
+        else:
+            partitions = [self.config.output.path]
+
+        manifest = self.manifest or SourceManifest(manifest_path)
+        for source in sources:
+            manifest.add(Path(source), partitions, self.written_files)
+
+        manifest.save()
+
+    def save(self, data: LazyFrame, sources: list[str]) -> None:
+        """Write transformed data to the output. If streaming is enabled data is
+        sunk to parquet in chunks, otherwise it's collected and written at once.
+        Files of the same sources ingested earlier in the day are replaced.
+
+        Args:
+            data (LazyFrame): Transformed data.
+            sources (list[str]): Source files data is read from.
+        """
+        streaming = self.config.get("streaming")
+        directory = (
+            self._partition()
+            if len(self.config.output.partition_by)
+            else Path(self.config.output.path)
+        )
+        existing = set(directory.glob("*.parquet"))
+
+        logger.info(f"Saving data on path: '{self.config.output.path}'")
+
+        if streaming and streaming.enabled:
+            chunk_size = self._streaming_chunk_size(
+                sources, streaming.chunk_size, streaming.memory_limit_mb
+            )
+            logger.info(f"Streaming data in chunks of {chunk_size} rows.")
+            self.sink(
+                data,
+                self.config.output,
+                chunk_size=chunk_size,
+                replaces=self.replaced_files,
+            )
+        else:
+            self.write(data.collect(), self.config.output, replaces=self.replaced_files)
+
+        self.written_files = sorted(
+            str(file) for file in set(directory.glob("*.parquet")) - existing
+        )
+
+    def _streaming_chunk_size(
+        self, sources: list[str], chunk_size: int, memory_limit_mb: int
+    ) -> int:
+        """Cap the configured chunk size so that chunks processed by all
+        threads at once stay under the memory limit. Chunks are sized by the
+        source with the widest rows.
+        """
+        row_size = max(self._estimate_row_size(source) for source in sources)
+        memory_limit = memory_limit_mb * 1024 * 1024
+        rows_in_limit = memory_limit // (
+            pl.thread_pool_size() * row_size * MEMORY_OVERHEAD
+        )
+
+        return max(1, min(chunk_size, rows_in_limit))
+
+    def _estimate_row_size(self, path: str) -> int:
+        with open(path, "rb") as source:
+            # skip header
+            source.readline()
+            sample = list(islice(source, SAMPLE_ROWS))
+
+        if not sample:
+            return 1
+
+        return max(1, sum(len(line) for line in sample) // len(sample))
+
+    def _partition(self) -> Path:
+        return Path(self.config.output.path) / f"ingestion_date={self.ingestion_date}"
+
     def _add_ingestion_date_column(self, data: LazyFrame) -> LazyFrame:
-        data = data.with_columns(ingestion_date=datetime.now(timezone.utc).date())
+        # date is fixed once per run, files it replaces were chosen by it
+        if self.ingestion_date is None:
+            self.ingestion_date = datetime.now(timezone.utc).date()
+        data = data.with_columns(ingestion_date=self.ingestion_date)
 
         return data
 
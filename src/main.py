@@ -4,7 +4,17 @@ import typing as t
 import click
 from click import Command
 
-from src.command import create_dataset, ingest, predict, process
+from src.command import (
+    create_dataset,
+    export_model,
+    ingest,
+    predict,
+    predict_batch,
+    process,
+    promote_model,
+    serve,
+    tune_layout,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -78,7 +88,12 @@ def main():
 main.add_command(ingest, mutually_exclusive=True)
 main.add_command(process, mutually_exclusive=True)
 main.add_command(create_dataset, mutually_exclusive=True)
+main.add_command(export_model, mutually_exclusive=True)
 main.add_command(predict, mutually_exclusive=True)
+main.add_command(predict_batch, mutually_exclusive=True)
+main.add_command(promote_model, mutually_exclusive=True)
+main.add_command(serve, mutually_exclusive=True)
+main.add_command(tune_layout, mutually_exclusive=True)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,27 @@
+from src.serving.common import (
+    FEATURE_COLUMNS,
+    Predictor,
+    feature_matrix,
+    load_model,
+    load_model_metadata,
+    save_model,
+    training_data,
+    verification_features,
+)
+from src.serving.engine import InferenceEngine
+from src.serving.registry import ModelRegistry
+from src.serving.server import PredictionServer
+
+__all__ = [
+    "FEATURE_COLUMNS",
+    "InferenceEngine",
+    "ModelRegistry",
+    "Predictor",
+    "PredictionServer",
+    "feature_matrix",
+    "load_model",
+    "load_model_metadata",
+    "save_model",
+    "training_data",
+    "verification_features",
+]
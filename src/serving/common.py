@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import json
+import logging
+import math
+import pickle
+from pathlib import Path
+from typing import Any, Sequence
+
+import numpy as np
+import polars as pl
+import pyarrow.parquet as pq
+from polars import DataFrame, LazyFrame, Series
+
+from src.aggregation.common import BOOK_FEATURES, CUSTOMER_FEATURES, FeatureTable
+from src.common import Config, load_config_module
+from src.serving.engine import model_features
+from src.serving.registry import ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+# column order of models saved without metadata
+FEATURE_COLUMNS = (*CUSTOMER_FEATURES, *BOOK_FEATURES)
+
+# about as many dataset rows are sampled to verify exported engines on
+VERIFICATION_ROWS = 1_000_000
+
+
+def feature_matrix(
+    data: DataFrame, columns: Sequence[str], dtype: Any = np.float64
+) -> np.ndarray:
+    """Features as a C-contiguous matrix in the column order. Columns are
+    read as views of their Arrow buffers and copied once, straight into the
+    matrix, which is the single copy turning columns into rows. Data must
+    not hold nulls.
+    """
+    matrix = np.empty((len(data), len(columns)), dtype=dtype)
+    for position, column in enumerate(columns):
+        matrix[:, position] = data[column].to_numpy()
+
+    return matrix
+
+
+def training_data(
+    dataset: LazyFrame,
+    columns: Sequence[str] = FEATURE_COLUMNS,
+    label: str = "label",
+    dtype: Any = np.float64,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Features and labels of complete dataset rows to train a model with.
+    Columns are moved into a Fortran-ordered matrix one at a time and
+    released once copied, so the rows are never held twice. Trees are fitted
+    on Fortran-ordered features anyway.
+    """
+    data = dataset.select(*columns, label).drop_nulls().collect()
+    labels = data.drop_in_place(label).to_numpy()
+
+    matrix = np.empty((len(data), len(columns)), dtype=dtype, order="F")
+    for position, column in enumerate(columns):
+        matrix[:, position] = data.drop_in_place(column).to_numpy()
+
+    return matrix, labels
+
+
+def verification_features(
+    dataset: LazyFrame,
+    columns: Sequence[str] = FEATURE_COLUMNS,
+    dtype: Any = np.float64,
+    rows: int = VERIFICATION_ROWS,
+) -> np.ndarray:
+    """Distinct feature rows of a sample of complete dataset rows, to verify
+    an engine against its model on. Predictions only depend on features, so
+    distinct rows stand for all of them. Rows are sampled by the hash of
+    their features, equal rows are kept or dropped together, and the sample
+    is streamed, so only about `rows` rows are held in memory.
+    """
+    features = dataset.select(columns).drop_nulls()
+
+    total = features.select(pl.len()).collect().item()
+    if total > rows:
+        features = features.filter(
+            pl.struct(columns).hash(seed=0) % math.ceil(total / rows) == 0
+        )
+
+    return feature_matrix(features.unique().collect(streaming=True), columns, dtype)
+
+
+def save_model(
+    model: Any, path: str, metadata_path: str, columns: Sequence[str] = FEATURE_COLUMNS
+) -> None:
+    """Pickle the model with the columns it was trained with in their order.
+    Tree models compute in float32, so features are built in it for them and
+    the model doesn't have to convert them again.
+    """
+    is_tree = hasattr(model, "estimators_") or hasattr(model, "tree_")
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as model_file:
+        pickle.dump(model, model_file)
+
+    Path(metadata_path).write_text(
+        json.dumps(
+            {"columns": list(columns), "dtype": "float32" if is_tree else "float64"},
+            indent=4,
+        )
+    )
+
+
+def load_model_metadata(path: str, model: Any = None) -> dict[str, Any]:
+    """Columns and dtype recorded with the model. Models saved before they
+    were recorded use the feature names they were fitted with, or the
+    default column order.
+    """
+    columns = getattr(model, "feature_names_in_", FEATURE_COLUMNS)
+    metadata = {"columns": list(columns), "dtype": "float64"}
+    if Path(path).exists():
+        metadata.update(json.loads(Path(path).read_text()))
+
+    return metadata
+
+
+def load_model(config: Config) -> Any:
+    """Trained model saved at `model.path`. Engines exported from models are
+    kept with their versions in the registry.
+    """
+    with open(config.model.path, "rb") as model_file:
+        return pickle.load(model_file)
+
+
+class Predictor:
+    """Model and feature tables loaded once, predicting late returns of
+    customer and book pairs from two feature lookups. Features are handed to
+    the model as a NumPy matrix in the `columns` order recorded with it.
+
+    With a `registry`, the promoted version is used instead of `model` as
+    soon as there is one and replaced whenever another one is promoted.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        customers: FeatureTable,
+        books: FeatureTable,
+        columns: Sequence[str] = FEATURE_COLUMNS,
+        dtype: Any = np.float64,
+        registry: ModelRegistry | None = None,
+    ) -> None:
+        self.model = model
+        self.customers = customers
+        self.books = books
+        self.columns = list(columns)
+        self.dtype = np.dtype(dtype)
+        self.registry = registry
+
+    @classmethod
+    def load(cls, config: Config, engine: bool = True) -> Predictor:
+        features = load_config_module(config, "aggregation").dataset.features
+        customers = FeatureTable(features.customer.path)
+        books = FeatureTable(features.book.path)
+        if not (customers.exists() and books.exists()):
+            raise FileNotFoundError(
+                "Features don't exist, dataset has to be created first."
+            )
+
+        registry = None
+        if config.model.get("registry_path"):
+            registry = ModelRegistry(
+                config.model.registry_path, engine, config.model.encoder_path
+            )
+            if registry.model() is not None:
+                return cls(None, customers, books, registry=registry)
+
+        model = load_model(config)
+        metadata = load_model_metadata(config.model.metadata_path, model)
+
+        return cls(
+            model,
+            customers,
+            books,
+            metadata["columns"],
+            metadata["dtype"],
+            registry,
+        )
+
+    @property
+    def version(self) -> int | None:
+        """Registry version predicted with, None for the model loaded with
+        the predictor.
+        """
+        promoted = self.registry.model() if self.registry is not None else None
+        return promoted[1]["version"] if promoted is not None else None
+
+    def current(self) -> tuple[Any, list[str], np.dtype]:
+        """Model to predict with and the columns and dtype of its features."""
+        promoted = self.registry.model() if self.registry is not None else None
+        if promoted is None:
+            return self.model, self.columns, self.dtype
+
+        model, metadata = promoted
+        return model, metadata["columns"], np.dtype(metadata["dtype"])
+
+    def features(self, customer_ids: list[str], book_ids: list[str]) -> DataFrame:
+        """Feature vectors of the pairs, with nulls for unknown customers and
+        books or their missing attributes.
+        """
+        return pl.concat(
+            [
+                self.customers.lookup(customer_ids).select(CUSTOMER_FEATURES),
+                self.books.lookup(book_ids).select(BOOK_FEATURES),
+            ],
+            how="horizontal",
+        )
+
+    def join_features(self, pairs: LazyFrame) -> LazyFrame:
+        """Add features to `customer_id` and `book_id` pairs in a single join
+        of each feature table, for scoring many pairs at once.
+        """
+        return pairs.join(
+            self.customers.scan().rename({"id": "customer_id"}),
+            on="customer_id",
+            how="left",
+        ).join(self.books.scan().rename({"id": "book_id"}), on="book_id", how="left")
+
+    def predict(self, customer_ids: list[str], book_ids: list[str]) -> list[Any]:
+        """Predictions of the pairs, None for pairs without complete features."""
+        return self.score(self.features(customer_ids, book_ids)).to_list()
+
+    def score(self, features: DataFrame) -> Series:
+        """Predict rows of features in one model call. Rows with missing
+        features are predicted as null.
+        """
+        model, columns, dtype = self.current()
+        features = features.select(columns)
+        complete = features.select(~pl.any_horizontal(pl.all().is_null())).to_series()
+
+        predictions = pl.Series("prediction", [None] * len(features), pl.Int8)
+        if complete.any():
+            values = model.predict(
+                model_features(
+                    model,
+                    feature_matrix(features.filter(complete), columns, dtype),
+                    columns,
+                )
+            )
+            predictions = predictions.scatter(
+                complete.arg_true(), pl.Series(values).cast(pl.Int8)
+            )
+
+        return predictions
+
+    def predict_batch(
+        self,
+        pairs: LazyFrame,
+        path: str,
+        chunk_size: int = 100_000,
+        compression: str = "zstd",
+    ) -> int:
+        """Predict `customer_id` and `book_id` pairs with features joined at
+        once, scoring `chunk_size` rows at a time and streaming them to a
+        parquet file one row group per chunk. Pair columns are kept next to
+        the `prediction`.
+
+        Returns:
+            int: Number of predicted rows.
+        """
+        columns = pairs.collect_schema().names()
+        data = self.join_features(pairs).collect()
+
+        # model is fixed for the whole batch, a promotion while it runs
+        # doesn't mix versions in its predictions
+        model, model_columns, dtype = self.current()
+        predictor = Predictor(model, self.customers, self.books, model_columns, dtype)
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = path.with_suffix(".tmp")
+
+        if data.is_empty():
+            data.select(columns).with_columns(
+                prediction=pl.lit(None, pl.Int8)
+            ).write_parquet(temporary_path, compression=compression)
+        else:
+            writer = None
+            try:
+                for chunk in data.iter_slices(chunk_size):
+                    table = (
+                        chunk.select(columns)
+                        .with_columns(predictor.score(chunk))
+                        .to_arrow()
+                    )
+                    if writer is None:
+                        writer = pq.ParquetWriter(
+                            temporary_path, table.schema, compression=compression
+                        )
+                    writer.write_table(table)
+            finally:
+                if writer is not None:
+                    writer.close()
+
+        # replace predictions at once so readers never see a partial file
+        temporary_path.replace(path)
+
+        return len(data)
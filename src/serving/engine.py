@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import json
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Sequence
+
+import numpy as np
+import polars as pl
+from polars import DataFrame
+
+
+def model_features(
+    model: Any, features: np.ndarray, columns: Sequence[str] | None = None
+) -> np.ndarray | DataFrame:
+    """Features as a scikit-learn model takes them. Models fitted with feature
+    names get a frame named by the columns, so the model checks them against
+    the names it was fitted with, other models the matrix.
+    """
+    names = getattr(model, "feature_names_in_", None)
+    if names is None:
+        return features
+
+    return pl.from_numpy(
+        features, schema=list(columns if columns is not None else names), orient="row"
+    )
+
+
+class InferenceEngine(ABC):
+    """Fitted classifier exported to plain arrays and evaluated with NumPy
+    only, so serving doesn't import or call into scikit-learn. Engines repeat
+    the floating point operations of the model they were exported from in
+    the same order, so their predictions are bit-identical to it.
+
+    Arrays are saved as `.npy` files in a directory and memory-mapped when
+    loaded.
+    """
+
+    kind: str
+    # model method returning the engine's decision scores
+    decision_method: str
+
+    def __init__(self, arrays: dict[str, np.ndarray]) -> None:
+        self.arrays = arrays
+        self.classes = arrays["classes"]
+
+    @staticmethod
+    def export(model: Any) -> InferenceEngine:
+        """Export a fitted random forest, decision tree or linear classifier."""
+        if hasattr(model, "estimators_") or hasattr(model, "tree_"):
+            return TreeEngine.export(model)
+        if hasattr(model, "coef_") and hasattr(model, "intercept_"):
+            return LinearEngine.export(model)
+
+        raise ValueError(f"Can't export model: '{type(model).__name__}'")
+
+    @staticmethod
+    def load(path: str) -> InferenceEngine:
+        directory = Path(path)
+        kind = json.loads((directory / "engine.json").read_text())["kind"]
+        engine = {engine.kind: engine for engine in (TreeEngine, LinearEngine)}[kind]
+
+        return engine(
+            {
+                file.stem: np.load(file, mmap_mode="r")
+                for file in directory.glob("*.npy")
+            }
+        )
+
+    def save(self, path: str) -> None:
+        directory = Path(path)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        for name, array in self.arrays.items():
+            np.save(directory / f"{name}.npy", array)
+        (directory / "engine.json").write_text(json.dumps({"kind": self.kind}))
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Classes of a matrix of rows or of a single row vector."""
+        scores = self.decision(np.atleast_2d(features))
+        return self.classes[self._indices(scores)]
+
+    def matches(
+        self, model: Any, features: np.ndarray, columns: Sequence[str] | None = None
+    ) -> bool:
+        """Whether scores and predictions of the engine are bit-identical to
+        the ones of the model it was exported from, on features in the order
+        of the columns.
+        """
+        named = model_features(model, features, columns)
+        scores = getattr(model, self.decision_method)(named)
+
+        return np.array_equal(self.decision(features), scores) and np.array_equal(
+            self.predict(features), model.predict(named)
+        )
+
+    @abstractmethod
+    def decision(self, features: np.ndarray) -> np.ndarray:
+        """Scores classes are predicted from, equal to the model's
+        `predict_proba` for trees and `decision_function` for linear models.
+        """
+
+    @abstractmethod
+    def _indices(self, scores: np.ndarray) -> np.ndarray:
+        pass
+
+
+class TreeEngine(InferenceEngine):
+    """Trees flattened into node arrays: split feature and threshold, global
+    indices of child nodes (-1 for leaves) and class probabilities of
+    leaves. All rows descend all trees at once, a level per step.
+
+    Per-call overhead is a fraction of scikit-learn's, which suits single
+    rows. Large batches of deep forests are faster in scikit-learn's
+    compiled traversal.
+    """
+
+    kind = "tree"
+    decision_method = "predict_proba"
+
+    @classmethod
+    def export(cls, model: Any) -> TreeEngine:
+        trees = [
+            estimator.tree_ for estimator in getattr(model, "estimators_", [model])
+        ]
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+
+        def children(name: str) -> np.ndarray:
+            # child indices of the flattened trees, leaves stay -1
+            return np.concatenate(
+                [
+                    np.where(getattr(tree, name) >= 0, getattr(tree, name) + offset, -1)
+                    for tree, offset in zip(trees, offsets)
+                ]
+            ).astype(np.int64)
+
+        return cls(
+            {
+                "classes": model.classes_,
+                "roots": offsets[:-1].astype(np.int64),
+                # right and left child, indexed by whether a row goes left
+                "children": np.stack(
+                    [children("children_right"), children("children_left")], axis=1
+                ),
+                "feature": np.concatenate([tree.feature for tree in trees]).astype(
+                    np.int64
+                ),
+                "threshold": np.concatenate([tree.threshold for tree in trees]),
+                "value": np.concatenate(
+                    [tree.value[:, 0, : len(model.classes_)] for tree in trees]
+                ),
+            }
+        )
+
+    def decision(self, features: np.ndarray) -> np.ndarray:
+        # trees compare features as float32, like scikit-learn converts them
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        roots, children = self.arrays["roots"], self.arrays["children"]
+        feature, threshold = self.arrays["feature"], self.arrays["threshold"]
+
+        # node of every row and tree pair and offset of its row in the flat
+        # features, descended until all are in leaves, pairs already in
+        # leaves are dropped after each level
+        nodes = np.tile(roots, len(features))
+        offsets = np.repeat(np.arange(len(features)) * features.shape[1], len(roots))
+        active = np.flatnonzero(children[nodes, 1] >= 0)
+
+        values = features.reshape(-1)
+        while active.size:
+            current = nodes[active]
+            goes_left = values[offsets[active] + feature[current]] <= threshold[current]
+            nodes[active] = children[current, goes_left.view(np.int8)]
+            active = active[children[nodes[active], 1] >= 0]
+
+        nodes = nodes.reshape(len(features), -1)
+
+        # leaf probabilities are summed tree by tree like in the forest,
+        # cumulative sum adds them in the same order
+        probabilities = np.cumsum(self.arrays["value"][nodes], axis=1)[:, -1]
+
+        if len(roots) > 1:
+            probabilities /= len(roots)
+
+        return probabilities
+
+    def _indices(self, scores: np.ndarray) -> np.ndarray:
+        return np.argmax(scores, axis=1)
+
+
+class LinearEngine(InferenceEngine):
+    """Coefficients and intercepts of a linear classifier."""
+
+    kind = "linear"
+    decision_method = "decision_function"
+
+    @classmethod
+    def export(cls, model: Any) -> LinearEngine:
+        return cls(
+            {
+                "classes": model.classes_,
+                "coef": model.coef_,
+                "intercept": np.asarray(model.intercept_),
+            }
+        )
+
+    def decision(self, features: np.ndarray) -> np.ndarray:
+        scores = features @ self.arrays["coef"].T + self.arrays["intercept"]
+        return scores.reshape(-1) if scores.shape[1] == 1 else scores
+
+    def _indices(self, scores: np.ndarray) -> np.ndarray:
+        if scores.ndim == 1:
+            return (scores > 0).astype(np.int64)
+
+        return np.argmax(scores, axis=1)
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import json
+import logging
+import pickle
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from src.aggregation.common import FeatureEncoder
+from src.serving.engine import InferenceEngine
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """Versioned models in a directory. Every registered version is a `v{N}`
+    directory holding the pickled model, the NumPy engine exported from it
+    and `metadata.json` with the feature columns and dtype, the encoder
+    version and the fingerprint of the training data. `current.json` points
+    to the promoted version.
+
+    Versions are loaded once and kept in memory, engines are memory-mapped.
+    `model` checks the pointer on every call, which is a single `stat`, so
+    a running process switches to a newly promoted version on its next
+    prediction without a restart. With `auto_refresh` off, `model` returns
+    the version loaded last and `refresh` loads a new one, e.g. in a thread
+    so a server's event loop isn't blocked by loading.
+
+    With `encoder_path`, versions trained on features of an encoder version
+    the encoder at the path doesn't extend are refused, as the features they
+    would predict on are encoded differently. Versions which only gained
+    categories since encode the features the model knows the same way.
+    """
+
+    def __init__(
+        self, path: str, engine: bool = True, encoder_path: str | None = None
+    ) -> None:
+        self.path = Path(path)
+        # load the engine of versions instead of the pickled model
+        self.engine = engine
+        self.encoder_path = encoder_path
+        self.auto_refresh = True
+        self._models: dict[int, tuple[Any, dict[str, Any]]] = {}
+        self._promoted: tuple[Any, dict[str, Any]] | None = None
+        self._pointer_key: tuple[int, int] | None = None
+
+    @property
+    def _pointer(self) -> Path:
+        return self.path / "current.json"
+
+    def versions(self) -> list[int]:
+        return sorted(
+            int(directory.name[1:])
+            for directory in self.path.glob("v*")
+            if directory.is_dir() and directory.name[1:].isdigit()
+        )
+
+    def current(self) -> int | None:
+        """Promoted version, None if no version was promoted yet."""
+        if not self._pointer.exists():
+            return None
+
+        return json.loads(self._pointer.read_text())["version"]
+
+    def metadata(self, version: int) -> dict[str, Any]:
+        return json.loads((self.path / f"v{version}" / "metadata.json").read_text())
+
+    def register(
+        self,
+        model: Any,
+        metadata: dict[str, Any],
+        features: np.ndarray | None = None,
+    ) -> int:
+        """Save the model as a new version. Its engine is saved too if the
+        model can be exported and the engine's predictions on `features` are
+        bit-identical to the model's.
+
+        Returns:
+            int: Registered version.
+        """
+        version = max(self.versions(), default=0) + 1
+
+        # version is written aside and renamed, so it only appears complete
+        temporary_path = self.path / f".v{version}.tmp"
+        shutil.rmtree(temporary_path, ignore_errors=True)
+        temporary_path.mkdir(parents=True)
+
+        with open(temporary_path / "model.pkl", "wb") as model_file:
+            pickle.dump(model, model_file)
+
+        exported = False
+        try:
+            if features is not None:
+                exported = self._export(
+                    model, temporary_path, features, metadata.get("columns")
+                )
+            if not exported:
+                logger.warning("Engine wasn't verified, version uses the model.")
+        except ValueError as error:
+            logger.warning(error)
+
+        (temporary_path / "metadata.json").write_text(
+            json.dumps(
+                {
+                    **metadata,
+                    "version": version,
+                    "engine": exported,
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                },
+                indent=4,
+            )
+        )
+        temporary_path.rename(self.path / f"v{version}")
+
+        return version
+
+    def export(self, version: int, features: np.ndarray) -> bool:
+        """Export the engine of a version registered without one, if its
+        predictions on `features` are bit-identical to the model's.
+
+        Raises:
+            ValueError: Model of the version can't be exported.
+
+        Returns:
+            bool: Whether the engine was verified and saved.
+        """
+        directory = self.path / f"v{version}"
+        metadata = self.metadata(version)
+        if metadata.get("engine"):
+            return True
+
+        with open(directory / "model.pkl", "rb") as model_file:
+            model = pickle.load(model_file)
+
+        if not self._export(model, directory, features, metadata.get("columns")):
+            return False
+
+        # replace metadata at once so readers never see a partial write
+        temporary_path = directory / "metadata.tmp"
+        temporary_path.write_text(json.dumps({**metadata, "engine": True}, indent=4))
+        temporary_path.replace(directory / "metadata.json")
+
+        # version is loaded again with its engine
+        self._models.pop(version, None)
+        self._pointer_key = None
+
+        return True
+
+    def promote(self, version: int) -> None:
+        if version not in self.versions():
+            raise ValueError(f"Version isn't registered: {version}")
+
+        self._check_encoder(version, self.metadata(version))
+
+        # replace pointer at once so readers never see a partial write
+        temporary_path = self._pointer.with_suffix(".tmp")
+        temporary_path.write_text(json.dumps({"version": version}))
+        temporary_path.replace(self._pointer)
+
+    def load(self, version: int) -> tuple[Any, dict[str, Any]]:
+        """Model of the version and its metadata, loaded once."""
+        if version not in self._models:
+            directory = self.path / f"v{version}"
+            metadata = self.metadata(version)
+            self._check_encoder(version, metadata)
+
+            if self.engine and metadata.get("engine"):
+                model = InferenceEngine.load(str(directory / "engine"))
+            else:
+                with open(directory / "model.pkl", "rb") as model_file:
+                    model = pickle.load(model_file)
+
+            self._models[version] = (model, metadata)
+
+        return self._models[version]
+
+    @staticmethod
+    def _export(
+        model: Any,
+        directory: Path,
+        features: np.ndarray,
+        columns: list[str] | None = None,
+    ) -> bool:
+        engine = InferenceEngine.export(model)
+        if not engine.matches(model, features, columns):
+            return False
+
+        # engine is saved aside and renamed, so it only appears complete
+        shutil.rmtree(directory / "engine.tmp", ignore_errors=True)
+        engine.save(str(directory / "engine.tmp"))
+        (directory / "engine.tmp").rename(directory / "engine")
+
+        return True
+
+    def model(self) -> tuple[Any, dict[str, Any]] | None:
+        """Promoted model and its metadata, None if no version was promoted.
+        A promotion swaps both at once, predictions never pair a model with
+        columns of another version.
+        """
+        if self.auto_refresh:
+            self.refresh()
+
+        return self._promoted
+
+    def refresh(self) -> None:
+        """Load the promoted version if another one was promoted since the
+        last call. A version which fails to load isn't tried again until the
+        next promotion, the previous one is kept meanwhile.
+        """
+        try:
+            stat = self._pointer.stat()
+        except FileNotFoundError:
+            self._promoted, self._pointer_key = None, None
+            return
+
+        # pointer is replaced on promotion, which changes its inode and mtime
+        key = (stat.st_ino, stat.st_mtime_ns)
+        if key == self._pointer_key:
+            return
+
+        self._pointer_key = key
+        version = self.current()
+        promoted = self.load(version)
+        # versions no longer promoted are released
+        self._models = {version: promoted}
+        self._promoted = promoted
+
+        logger.info(f"Model version {version} promoted.")
+
+    def _check_encoder(self, version: int, metadata: dict[str, Any]) -> None:
+        if self.encoder_path is None:
+            return
+
+        trained = metadata.get("encoder_version")
+        current = FeatureEncoder(self.encoder_path)
+        if trained is None or trained == current.version:
+            return
+
+        encoder = current.load_version(trained)
+        if encoder is None or not current.extends(encoder):
+            raise ValueError(
+                f"Version {version} was trained on features of encoder version "
+                f"{trained}, features are encoded with incompatible version "
+                f"{current.version}."
+            )
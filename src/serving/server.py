@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from http import HTTPStatus
+from time import perf_counter
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+from src.common import QuantileSketch
+from src.exception import InvalidRequest
+from src.serving.common import Predictor
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionServer:
+    """Minimal asyncio HTTP/1.1 server keeping the `Predictor` in memory.
+    Served on a host and port or on a Unix socket, with endpoints:
+
+    - `GET /predict?customer_id=<id>&book_id=<id>`: late return prediction
+    - `GET /metrics`: model version, request count and latency percentiles
+      in milliseconds
+    - `GET /health`
+
+    Connections are kept alive between requests. Latencies are kept in a
+    `QuantileSketch`, so percentiles take constant memory however long the
+    server runs.
+
+    Malformed requests get a 400 and bodies over `max_body_size` bytes a 413,
+    after which the connection is closed.
+
+    A model registry is checked for a newly promoted version every
+    `refresh_interval` seconds, the version is loaded in a thread while
+    predictions are served by the previous one.
+    """
+
+    def __init__(
+        self,
+        predictor: Predictor,
+        percentiles: list[float] | None = None,
+        max_body_size: int = 64 * 1024,
+        refresh_interval: float = 1.0,
+    ) -> None:
+        self.predictor = predictor
+        self.percentiles = percentiles or [0.5, 0.9, 0.99]
+        self.max_body_size = max_body_size
+        self.refresh_interval = refresh_interval
+        self.latency = QuantileSketch(0.01)
+        self._refresh: asyncio.Task | None = None
+
+    async def start(
+        self,
+        host: str | None = None,
+        port: int | None = None,
+        socket: str | None = None,
+    ) -> asyncio.Server:
+        if socket:
+            server = await asyncio.start_unix_server(self._handle, path=socket)
+            logger.info(f"Serving predictions on socket: '{socket}'")
+        else:
+            server = await asyncio.start_server(self._handle, host=host, port=port)
+            logger.info(f"Serving predictions on: http://{host}:{port}")
+
+        if self.predictor.registry is not None and self._refresh is None:
+            # promoted versions are loaded off the loop instead of in `score`
+            self.predictor.registry.auto_refresh = False
+            self._refresh = asyncio.create_task(self._refresh_registry())
+
+        return server
+
+    async def serve(
+        self,
+        host: str | None = None,
+        port: int | None = None,
+        socket: str | None = None,
+    ) -> None:
+        server = await self.start(host, port, socket)
+        async with server:
+            await server.serve_forever()
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "model_version": self.predictor.version,
+            "requests": self.latency.count,
+            "latency_ms": {
+                f"p{percentile * 100:g}": self.latency.quantile(percentile)
+                for percentile in self.percentiles
+            },
+        }
+
+    def route(self, method: str, target: str) -> tuple[HTTPStatus, dict[str, Any]]:
+        url = urlsplit(target)
+        if method != "GET":
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": f"Method: {method}"}
+
+        if url.path == "/health":
+            return HTTPStatus.OK, {"status": "ok"}
+
+        if url.path == "/metrics":
+            return HTTPStatus.OK, self.metrics()
+
+        if url.path != "/predict":
+            return HTTPStatus.NOT_FOUND, {"error": f"Path: {url.path}"}
+
+        query = parse_qs(url.query)
+        if not ("customer_id" in query and "book_id" in query):
+            return HTTPStatus.BAD_REQUEST, {
+                "error": "Both customer_id and book_id are required."
+            }
+
+        customer_id, book_id = query["customer_id"][0], query["book_id"][0]
+        prediction = self.predictor.predict([customer_id], [book_id])[0]
+        if prediction is None:
+            return HTTPStatus.NOT_FOUND, {
+                "error": "Customer or book doesn't exist or has missing attributes."
+            }
+
+        return HTTPStatus.OK, {
+            "customer_id": customer_id,
+            "book_id": book_id,
+            "prediction": prediction,
+        }
+
+    async def _refresh_registry(self) -> None:
+        registry = self.predictor.registry
+        while True:
+            try:
+                await asyncio.to_thread(registry.refresh)
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                logger.exception(error)
+
+            await asyncio.sleep(self.refresh_interval)
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while request_line := await reader.readline():
+                start = perf_counter()
+                try:
+                    method, target, headers = await self._read_request(
+                        reader, request_line
+                    )
+                except InvalidRequest as error:
+                    # rest of the request can't be told apart from the next one
+                    logger.debug(error)
+                    self._respond(
+                        writer, HTTPStatus(error.status), {"error": str(error)}, True
+                    )
+                    await writer.drain()
+                    break
+
+                try:
+                    status, body = self.route(method, target)
+                except Exception as error:
+                    logger.exception(error)
+                    status, body = HTTPStatus.INTERNAL_SERVER_ERROR, {
+                        "error": str(error)
+                    }
+
+                close = headers.get("connection", "").lower() == "close"
+                self._respond(writer, status, body, close)
+                await writer.drain()
+
+                if target.startswith("/predict"):
+                    self.latency.add((perf_counter() - start) * 1000)
+                if close:
+                    break
+        except (ValueError, ConnectionError, asyncio.IncompleteReadError) as error:
+            logger.debug(f"Connection closed: {error}")
+        finally:
+            writer.close()
+
+    async def _read_request(
+        self, reader: asyncio.StreamReader, request_line: bytes
+    ) -> tuple[str, str, dict[str, str]]:
+        """Method, target and headers of a request, its body is drained.
+
+        Raises:
+            InvalidRequest: Request is malformed or its body is too large.
+        """
+        try:
+            method, target, _ = request_line.decode().split(" ", 2)
+
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode().partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            size = int(headers.get("content-length", 0))
+        except ValueError as error:
+            # also raised for lines over the reader limit
+            raise InvalidRequest(HTTPStatus.BAD_REQUEST, str(error)) from error
+
+        if size < 0:
+            raise InvalidRequest(HTTPStatus.BAD_REQUEST, f"Content-Length: {size}")
+        if size > self.max_body_size:
+            raise InvalidRequest(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Content-Length: {size}"
+            )
+
+        # request bodies aren't used, but have to be drained
+        await reader.readexactly(size)
+
+        return method, target, headers
+
+    def _respond(
+        self,
+        writer: asyncio.StreamWriter,
+        status: HTTPStatus,
+        body: dict[str, Any],
+        close: bool = False,
+    ) -> None:
+        content = json.dumps(body).encode()
+        writer.write(
+            (
+                f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(content)}\r\n"
+                f"Connection: {'close' if close else 'keep-alive'}\r\n"
+                "\r\n"
+            ).encode()
+            + content
+        )
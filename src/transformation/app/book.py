@@ -4,25 +4,70 @@ import logging
 from datetime import datetime
 
 import polars as pl
-from polars import LazyFrame
+from polars import Expr, LazyFrame
 
-from src.transformation.common import TransformationApp
+from src.transformation.common import TransformationApp, non_negative_number, tiered
 
 logger = logging.getLogger(__name__)
 
 
+def published_year(column: Expr) -> Expr:
+    return (
+        column.str.strip_chars()
+        .str.replace_all("[^0-9 -]", "")
+        .str.extract("(\\w{4})")
+        .str.to_date(format="%Y", strict=True)
+        .dt.year()
+    )
+
+
+clean_prices = tiered(
+    fast=lambda column: non_negative_number(column, pl.Float32).ceil(),
+    slow=lambda column: (
+        column.str.strip_chars().str.replace_all("[^0-9 .]", "").cast(pl.Float32).ceil()
+    ),
+    return_dtype=pl.Float32,
+)
+
+clean_pages = tiered(
+    fast=lambda column: non_negative_number(column, pl.Int32),
+    slow=lambda column: (
+        column.str.strip_chars().str.replace_all("[^0-9]", "").cast(pl.Int32)
+    ),
+    return_dtype=pl.Int32,
+)
+
+
 class TransformationBookApp(TransformationApp):
+    cleaning_steps = {
+        **TransformationApp.cleaning_steps,
+        "published_year": published_year,
+        "clean_prices": clean_prices,
+        "clean_pages": clean_pages,
+    }
+
     def run(self) -> None:
+        start_date, end_date = None, None
         if self.arguments:
             start_date = self.arguments.get("start_date")
             end_date = self.arguments.get("end_date")
 
         if start_date and end_date:
-            start_date = datetime.strftime(start_date, "%Y-%m-%d")
-            end_date = datetime.strftime(end_date, "%Y-%m-%d")
+            start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+            end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
 
         logger.info("Reading book data from the bronze layer.")
-        data = self.read(self.config.input)
+        partitions = self.pending_partitions(start_date, end_date)
+        if partitions == []:
+            logger.info("No new partitions to merge.")
+            return
+
+        data = self.read(
+            self.config.input,
+            start_date=start_date,
+            end_date=end_date,
+            partitions=partitions,
+        )
 
         if start_date and end_date:
             data = self.filter(data, start_date, end_date, "ingestion_date")
@@ -33,20 +78,16 @@ class TransformationBookApp(TransformationApp):
 
         logger.info(f"Writing book data to path: '{self.config.output.path}'")
 
-        data_to_write = data.collect()
-        self.write(data_to_write, self.config.output)
+        self.save(data, partitions)
 
     def transform(self, data: LazyFrame) -> LazyFrame:
-        # drop duplicates
-        data = data.unique(pl.col("id"))
+        # drop duplicates, rows of the latest ingestion are kept
+        data = data.sort("ingestion_date").unique(
+            pl.col("id"), keep="last", maintain_order=True
+        )
 
-        data = self.clean_and_titlecase(data, "title")
-        data = self.extract_from_list(data, "authors")
-        data = self.clean_and_titlecase(data, "publisher")
-        data = self.extract_from_list(data, "categories")
-        data = self._add_published_year(data)
-        data = self._clean_prices(data)
-        data = self._clean_pages(data)
+        # clean data by configured rules
+        data = self.clean(data)
 
         data = data.drop(pl.col("ingestion_date"))
 
@@ -68,41 +109,3 @@ class TransformationBookApp(TransformationApp):
         data = data.cast(dtypes=book_schema)
 
         return data
-
-    def extract_from_list(self, data: LazyFrame, column_name: str) -> LazyFrame:
-        return data.with_columns(
-            pl.col(column_name)
-            .str.extract("'([^,]*)'")
-            .cast(pl.List(pl.String))
-            .alias(column_name)
-        )
-
-    def _add_published_year(self, data: LazyFrame) -> LazyFrame:
-        return data.with_columns(
-            pl.col("published_date")
-            .str.strip_chars()
-            .str.replace_all("[^0-9 -]", "")
-            .str.extract("(\\w{4})")
-            .str.to_date(format="%Y", strict=True)
-            .dt.year()
-            .alias("published_year")
-        )
-
-    def _clean_prices(self, data: LazyFrame) -> LazyFrame:
-        return data.with_columns(
-            pl.col("price")
-            .str.strip_chars()
-            .str.replace_all("[^0-9 .]", "")
-            .cast(pl.Float32)
-            .ceil()
-            .alias("price")
-        )
-
-    def _clean_pages(self, data: LazyFrame) -> LazyFrame:
-        return data.with_columns(
-            pl.col("pages")
-            .str.strip_chars()
-            .str.replace_all("[^0-9]", "")
-            .cast(pl.Int32)
-            .alias("pages")
-        )
@@ -13,16 +13,27 @@ logger = logging.getLogger(__name__)
 
 class TransformationCheckoutApp(TransformationApp):
     def run(self) -> None:
+        start_date, end_date = None, None
         if self.arguments:
             start_date = self.arguments.get("start_date")
             end_date = self.arguments.get("end_date")
 
         if start_date and end_date:
-            start_date = datetime.strftime(start_date, "%Y-%m-%d")
-            end_date = datetime.strftime(end_date, "%Y-%m-%d")
+            start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+            end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
 
         logger.info("Reading checkouts data from the bronze layer.")
-        data = self.read(self.config.input)
+        partitions = self.pending_partitions(start_date, end_date)
+        if partitions == []:
+            logger.info("No new partitions to merge.")
+            return
+
+        data = self.read(
+            self.config.input,
+            start_date=start_date,
+            end_date=end_date,
+            partitions=partitions,
+        )
 
         if start_date and end_date:
             data = self.filter(data, start_date, end_date, "ingestion_date")
@@ -33,18 +44,18 @@ class TransformationCheckoutApp(TransformationApp):
 
         logger.info(f"Writing checkouts data to path: '{self.config.output.path}'")
 
-        data_to_write = data.collect()
-        self.write(data_to_write, self.config.output)
+        self.save(data, partitions)
 
     def transform(self, data: LazyFrame) -> LazyFrame:
-        # drop duplicates
-        data = data.unique(
-            subset=[pl.col("id"), pl.col("patron_id"), pl.col("library_id")]
+        # drop duplicates, rows of the latest ingestion are kept
+        data = data.sort("ingestion_date").unique(
+            subset=[pl.col("id"), pl.col("patron_id"), pl.col("library_id")],
+            keep="last",
+            maintain_order=True,
         )
 
-        # clean date values
-        data = self.clean_dates(data, "date_checkout")
-        data = self.clean_dates(data, "date_returned")
+        # clean data by configured rules
+        data = self.clean(data)
 
         data = data.drop(pl.col("ingestion_date"))
 
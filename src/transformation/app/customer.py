@@ -6,23 +6,51 @@ from datetime import datetime
 import polars as pl
 from polars import LazyFrame
 
-from src.transformation.common import TransformationApp
+from src.transformation.common import TransformationApp, non_negative_number, tiered
 
 logger = logging.getLogger(__name__)
 
 
+clean_zipcode = tiered(
+    fast=lambda column: non_negative_number(column, pl.Float32).cast(pl.Int32),
+    slow=lambda column: (
+        column.str.strip_chars()
+        .str.replace_all("[^0-9 .]", "")
+        .cast(pl.Float32)
+        .cast(pl.Int32)
+    ),
+    return_dtype=pl.Int32,
+)
+
+
 class TransformationCustomerApp(TransformationApp):
+    cleaning_steps = {
+        **TransformationApp.cleaning_steps,
+        "clean_zipcode": clean_zipcode,
+    }
+
     def run(self) -> None:
+        start_date, end_date = None, None
         if self.arguments:
             start_date = self.arguments.get("start_date")
             end_date = self.arguments.get("end_date")
 
         if start_date and end_date:
-            start_date = datetime.strftime(start_date, "%Y-%m-%d")
-            end_date = datetime.strftime(end_date, "%Y-%m-%d")
+            start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+            end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
 
         logger.info("Reading customer data from the bronze layer.")
-        data = self.read(self.config.input)
+        partitions = self.pending_partitions(start_date, end_date)
+        if partitions == []:
+            logger.info("No new partitions to merge.")
+            return
+
+        data = self.read(
+            self.config.input,
+            start_date=start_date,
+            end_date=end_date,
+            partitions=partitions,
+        )
 
         if start_date and end_date:
             data = self.filter(data, start_date, end_date, "ingestion_date")
@@ -33,23 +61,16 @@ class TransformationCustomerApp(TransformationApp):
 
         logger.info(f"Writing customer data to path: '{self.config.output.path}'")
 
-        data_to_write = data.collect()
-        self.write(data_to_write, self.config.output)
+        self.save(data, partitions)
 
     def transform(self, data: LazyFrame) -> LazyFrame:
-        # drop duplicates
-        data = data.unique(pl.col("id"))
-
-        # clean data
-        data = self.clean_and_titlecase(data, "name")
-        data = self.clean_and_titlecase(data, "street_address")
-        data = self.titlecase(data, "city")
-        data = self.titlecase(data, "state")
-        data = self._clean_zipcode(data)
-        data = self.clean_dates(data, "birth_date")
-        data = self._clean_gender(data)
-        data = self.clean_and_titlecase(data, "education")
-        data = self.clean_and_titlecase(data, "occupation")
+        # drop duplicates, rows of the latest ingestion are kept
+        data = data.sort("ingestion_date").unique(
+            pl.col("id"), keep="last", maintain_order=True
+        )
+
+        # clean data by configured rules
+        data = self.clean(data)
 
         # drop ingestion column
         data = data.drop(pl.col("ingestion_date"))
@@ -72,18 +93,3 @@ class TransformationCustomerApp(TransformationApp):
         data = data.cast(dtypes=customer_schema)
 
         return data
-
-    def _clean_zipcode(self, data: LazyFrame) -> LazyFrame:
-        return data.with_columns(
-            pl.col("zipcode")
-            .str.strip_chars()
-            .str.replace_all("[^0-9 .]", "")
-            .cast(pl.Float32)
-            .cast(pl.Int32)
-            .alias("zipcode")
-        )
-
-    def _clean_gender(self, data: LazyFrame) -> LazyFrame:
-        return data.with_columns(
-            pl.col("gender").str.strip_chars().str.to_lowercase().alias("gender")
-        )
@@ -4,25 +4,45 @@ import logging
 from datetime import datetime
 
 import polars as pl
-from polars import LazyFrame
+from polars import Expr, LazyFrame
 
 from src.transformation.common import TransformationApp
 
 logger = logging.getLogger(__name__)
 
 
+def clean_postal_code(column: Expr) -> Expr:
+    return column.str.strip_chars().str.replace_all("[^A-Za-z0-9]", "")
+
+
 class TransformationLibraryApp(TransformationApp):
+    cleaning_steps = {
+        **TransformationApp.cleaning_steps,
+        "clean_postal_code": clean_postal_code,
+    }
+
     def run(self) -> None:
+        start_date, end_date = None, None
         if self.arguments:
             start_date = self.arguments.get("start_date")
             end_date = self.arguments.get("end_date")
 
         if start_date and end_date:
-            start_date = datetime.strftime(start_date, "%Y-%m-%d")
-            end_date = datetime.strftime(end_date, "%Y-%m-%d")
+            start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+            end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
 
         logger.info("Reading library data from the bronze layer.")
-        data = self.read(self.config.input)
+        partitions = self.pending_partitions(start_date, end_date)
+        if partitions == []:
+            logger.info("No new partitions to merge.")
+            return
+
+        data = self.read(
+            self.config.input,
+            start_date=start_date,
+            end_date=end_date,
+            partitions=partitions,
+        )
 
         if start_date and end_date:
             data = self.filter(data, start_date, end_date, "ingestion_date")
@@ -33,19 +53,16 @@ class TransformationLibraryApp(TransformationApp):
 
         logger.info(f"Writing library data to path: '{self.config.output.path}'")
 
-        data_to_write = data.collect()
-        self.write(data_to_write, self.config.output)
+        self.save(data, partitions)
 
     def transform(self, data: LazyFrame) -> LazyFrame:
-        # drop duplicates
-        data = data.unique(pl.col("id"))
+        # drop duplicates, rows of the latest ingestion are kept
+        data = data.sort("ingestion_date").unique(
+            pl.col("id"), keep="last", maintain_order=True
+        )
 
-        # clean data
-        data = self.clean_and_titlecase(data, "name")
-        data = self.clean_and_titlecase(data, "street_address")
-        data = self.titlecase(data, "city")
-        data = self.uppercase(data, "region")
-        data = self._clean_postal_code(data)
+        # clean data by configured rules
+        data = self.clean(data)
 
         # drop ingestion column
         data = data.drop(pl.col("ingestion_date"))
@@ -65,8 +82,3 @@ class TransformationLibraryApp(TransformationApp):
         data = data.cast(dtypes=library_schema)
 
         return data
-
-    def _clean_postal_code(self, data: LazyFrame) -> LazyFrame:
-        return data.with_columns(
-            pl.col("postal_code").str.strip_chars().str.replace_all("[^A-Za-z0-9]", "")
-        )
@@ -1,13 +1,120 @@
+from __future__ import annotations
+
+import json
+import logging
 from abc import abstractmethod
-from datetime import datetime
+from datetime import date
+from pathlib import Path
+from typing import Any, Callable
 
 import polars as pl
-from polars import LazyFrame
+from polars import DataFrame, Expr, LazyFrame, Series
 
 from src.common import App
 
+logger = logging.getLogger(__name__)
+
+
+# Cleaning steps. Cleaning rules are lists of steps applied to a column in order.
+
+
+def strip(column: Expr) -> Expr:
+    return column.str.strip_chars()
+
+
+def lowercase(column: Expr) -> Expr:
+    return column.str.to_lowercase()
+
+
+def uppercase(column: Expr) -> Expr:
+    return column.str.to_uppercase()
+
+
+def titlecase(column: Expr) -> Expr:
+    # titlecase lowercases the rest of the word so no lowercase step is needed
+    return column.str.to_titlecase()
+
+
+def collapse_spaces(column: Expr) -> Expr:
+    # whitespace runs containing a space collapse to a single space, which is
+    # what splitting by space and stripping the words did, without list columns
+    return column.str.replace_all(r"\s* \s*", " ")
+
+
+def tiered(
+    fast: Callable[[Expr], Expr],
+    slow: Callable[[Expr], Expr],
+    return_dtype: pl.DataType,
+) -> Callable[[Expr], Expr]:
+    """Build a parsing step which parses values with a cheap fast path first and
+    runs the slow path only on values the fast path returned null for.
+    Fast path has to return null for every value slow path would parse differently.
+    """
+
+    def parse(values: Series) -> Series:
+        parsed = values.to_frame().select(fast(pl.col(values.name))).to_series()
+
+        failed = (parsed.is_null() & values.is_not_null()).arg_true()
+        if len(failed):
+            slow_values = (
+                values.gather(failed).to_frame().select(slow(pl.col(values.name)))
+            )
+            parsed = parsed.scatter(failed, slow_values.to_series())
+
+        logger.info(
+            f"{len(failed)} of {len(values)} '{values.name}' values parsed by the slow path."
+        )
+
+        return parsed
+
+    def step(column: Expr) -> Expr:
+        return column.map_batches(parse, return_dtype=return_dtype, is_elementwise=True)
+
+    return step
+
+
+def non_negative_number(column: Expr, dtype: pl.DataType) -> Expr:
+    """Cast values which are plain non-negative numbers, other values are null."""
+    number = column.cast(dtype, strict=False)
+
+    return pl.when(
+        number.is_finite()
+        & (number >= 0)
+        & ~column.str.contains("e", literal=True)
+        & ~column.str.contains("E", literal=True)
+    ).then(number)
+
+
+clean_dates = tiered(
+    fast=lambda column: column.str.to_date(format="%Y-%m-%d", strict=False),
+    slow=lambda column: (
+        column.str.strip_chars()
+        .str.replace_all("[^0-9 -]", "")
+        .str.to_date(format="%Y-%m-%d", strict=False)
+    ),
+    return_dtype=pl.Date,
+)
+
+
+def extract_from_list(column: Expr) -> Expr:
+    return column.str.extract("'([^,]*)'").cast(pl.List(pl.String))
+
+
+CLEANING_STEPS: dict[str, Callable[[Expr], Expr]] = {
+    "strip": strip,
+    "lowercase": lowercase,
+    "uppercase": uppercase,
+    "titlecase": titlecase,
+    "collapse_spaces": collapse_spaces,
+    "clean_dates": clean_dates,
+    "extract_from_list": extract_from_list,
+}
+
 
 class TransformationApp(App):
+    # steps usable in cleaning rules, apps add their own steps
+    cleaning_steps: dict[str, Callable[[Expr], Expr]] = CLEANING_STEPS
+
     @abstractmethod
     def transform(self, data: LazyFrame) -> LazyFrame:
         pass
@@ -16,53 +123,181 @@ class TransformationApp(App):
     def set_schema(self, data: LazyFrame) -> LazyFrame:
         pass
 
+    @property
+    def merge_mode(self) -> bool:
+        return bool(self.arguments and self.arguments.get("merge"))
+
+    def pending_partitions(
+        self, start_date: date | None = None, end_date: date | None = None
+    ) -> list[str] | None:
+        """Input partitions in the date range holding files which aren't merged
+        into the output yet, so partitions a same-day ingestion wrote new files
+        to are merged again. Returns None when the app doesn't run in merge
+        mode, meaning all partitions are read.
+        """
+        if not self.merge_mode:
+            return None
+
+        merged = self._load_merged_files()
+        pending = [
+            partition
+            for partition, files in self.reader.partition_files(self.config.input)
+            if any(merged.get(file) != self._file_state(file) for file in files)
+            and (
+                not (start_date and end_date)
+                or str(start_date) <= partition < str(end_date)
+            )
+        ]
+
+        logger.info(f"{len(pending)} new partition(s) to merge.")
+
+        return pending
+
+    def save(self, data: LazyFrame, partitions: list[str] | None = None) -> None:
+        """Write transformed data to the output. In merge mode data is upserted
+        by output `merge_keys` and files of merged partitions are recorded with
+        their size and modification time.
+
+        Args:
+            data (LazyFrame): Transformed data.
+            partitions (list[str] | None, optional): Input partitions data was read from. Defaults to None.
+        """
+        if not self.merge_mode:
+            self.write(data, self.config.output)
+            return
+
+        self.merge(data.collect(), self.config.output)
+
+        # files replaced by later ingestions are forgotten
+        merged = {
+            file: state
+            for file, state in self._load_merged_files().items()
+            if Path(file).exists()
+        }
+        for partition, files in self.reader.partition_files(self.config.input):
+            if partition in (partitions or []):
+                merged.update({file: self._file_state(file) for file in files})
+
+        state_path = Path(self.config.output.state_path)
+        state_path.parent.mkdir(parents=True, exist_ok=True)
+        state_path.write_text(json.dumps({"files": merged}, indent=4, sort_keys=True))
+
+    def _load_merged_files(self) -> dict[str, list[int]]:
+        state_path = Path(self.config.output.state_path)
+        if not state_path.exists():
+            return {}
+
+        state = json.loads(state_path.read_text())
+        # state recorded merged partition names only, they are merged again
+        if isinstance(state, list):
+            return {}
+
+        return state["files"]
+
+    @staticmethod
+    def _file_state(file: str) -> list[int] | None:
+        try:
+            stat = Path(file).stat()
+        except FileNotFoundError:
+            return None
+
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def clean(self, data: LazyFrame, rules: dict[str, Any] | None = None) -> LazyFrame:
+        """Compile cleaning rules into a single projection. Rule maps an output
+        column to a list of cleaning steps applied to it, or to a table with
+        `source` column and `steps`, e.g. `city = ["strip", "titlecase"]`.
+        Columns listed in `dictionary_columns` are cleaned once per distinct
+        value, joined back to the data in the same plan.
+
+        Args:
+            data (LazyFrame): Data to clean.
+            rules (dict[str, Any] | None, optional): Cleaning rules. Defaults to `rules` from configuration.
+
+        Returns:
+            LazyFrame: Cleaned data.
+        """
+        if rules is None:
+            rules = self.config.get("rules", {})
+
+        dictionary_columns = (
+            self.config.get("dictionary_columns", []) if self.config else []
+        )
+
+        expressions = []
+        cleaned_columns = []
+        for column_name, rule in rules.items():
+            if isinstance(rule, dict):
+                source, steps = rule["source"], list(rule["steps"])
+            else:
+                source, steps = column_name, list(rule)
+
+            clean = self._compile_steps(steps)
+
+            if column_name in dictionary_columns:
+                cleaned_column = f"__cleaned_{column_name}"
+                data = self._clean_distinct(data, source, cleaned_column, clean)
+                expression = pl.col(cleaned_column)
+                cleaned_columns.append(cleaned_column)
+            else:
+                expression = clean(pl.col(source))
+
+            expressions.append(expression.alias(column_name))
+
+        return data.with_columns(expressions).drop(cleaned_columns)
+
+    def _compile_steps(self, steps: list[str]) -> Callable[[Expr], Expr]:
+        for step in steps:
+            if step not in self.cleaning_steps:
+                raise ValueError(f"Unknown cleaning step: '{step}'")
+
+        def clean(column: Expr) -> Expr:
+            for step in steps:
+                column = self.cleaning_steps[step](column)
+
+            return column
+
+        return clean
+
+    def _clean_distinct(
+        self,
+        data: LazyFrame | DataFrame,
+        column_name: str,
+        cleaned_column: str,
+        clean: Callable[[Expr], Expr],
+    ) -> LazyFrame | DataFrame:
+        """Clean distinct values of a column and join them back to the data
+        as `cleaned_column`. Both sides read the same input, which the query
+        optimizer scans once.
+        """
+        dictionary = (
+            data.select(pl.col(column_name).unique())
+            .drop_nulls()
+            .with_columns(clean(pl.col(column_name)).alias(cleaned_column))
+        )
+
+        return data.join(dictionary, on=column_name, how="left")
+
     def filter(
-        self, data: LazyFrame, start_date: datetime, end_date: datetime, column: str
+        self, data: LazyFrame, start_date: date, end_date: date, column: str
     ) -> LazyFrame:
         data = data.filter((pl.col(column) >= start_date) & (pl.col(column) < end_date))
 
         return data
 
     def clean_and_titlecase(self, data: LazyFrame, column_name: str) -> LazyFrame:
-        return data.with_columns(
-            pl.col(column_name)
-            .str.strip_chars()
-            .str.split(" ")
-            .list.eval(pl.element().str.strip_chars())
-            .list.eval(pl.element().filter(pl.element() != ""))
-            .list.eval(pl.element().str.to_lowercase())
-            .list.eval(pl.element().str.to_titlecase())
-            .list.join(" ")
-            .alias(column_name)
+        return self.clean(
+            data, {column_name: ["strip", "collapse_spaces", "titlecase"]}
         )
 
     def titlecase(self, data: LazyFrame, column_name: str) -> LazyFrame:
-        return data.with_columns(
-            pl.col(column_name)
-            .str.to_lowercase()
-            .str.strip_chars()
-            .str.to_titlecase()
-            .alias(column_name)
-        )
+        return self.clean(data, {column_name: ["strip", "titlecase"]})
 
     def uppercase(self, data: LazyFrame, column_name: str) -> LazyFrame:
-        return data.with_columns(
-            pl.col(column_name).str.strip_chars().str.to_uppercase().alias(column_name)
-        )
+        return self.clean(data, {column_name: ["strip", "uppercase"]})
 
     def clean_dates(self, data: LazyFrame, column_name: str) -> LazyFrame:
-        return data.with_columns(
-            pl.col(column_name)
-            .str.strip_chars()
-            .str.replace_all("[^0-9 -]", "")
-            .str.to_date(format="%Y-%m-%d", strict=False)
-            .alias(column_name)
-        )
+        return self.clean(data, {column_name: ["clean_dates"]})
 
     def extract_from_list(self, data: LazyFrame, column_name: str) -> LazyFrame:
-        return data.with_columns(
-            pl.col(column_name)
-            .str.extract("'([^,]*)'")
-            .cast(pl.List(pl.String))
-            .alias(column_name)
-        )
+        return self.clean(data, {column_name: ["extract_from_list"]})
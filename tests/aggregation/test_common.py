@@ -0,0 +1,84 @@
+from pathlib import Path
+
+import polars as pl
+import pytest
+from polars import testing
+
+from src.aggregation.common import DatasetState, FeatureEncoder, FeatureTable
+
+
+class TestFeatureEncoder:
+    def test_codes_are_stable(self, tmp_path: Path) -> None:
+        data = pl.DataFrame(
+            {
+                "gender": ["male", "female"],
+                "occupation": ["Tech", "Sales"],
+                "education": ["College", None],
+                "age_category": ["Adult", "Old"],
+                "price": [1.0, 3.0],
+                "pages": [100, 300],
+            }
+        )
+
+        encoder = FeatureEncoder(str(tmp_path / "encoder.json"))
+        encoder.fit(data.lazy(), {"price": 2.0, "age": 40})
+        encoder.save()
+
+        encoder = FeatureEncoder(str(tmp_path / "encoder.json"))
+        assert encoder.version == 1
+
+        # unseen values are added to the end, codes of known ones don't change
+        encoder.extend(pl.DataFrame({column: ["Aaa"] for column in data.columns}))
+        encoder.save()
+
+        assert encoder.version == 2
+        assert (tmp_path / "encoder.v1.json").exists()
+
+        actual = encoder.encode(data.lazy()).collect()
+        expected = data.with_columns(
+            gender=pl.Series([1, 0], dtype=pl.UInt32),
+            occupation=pl.Series([1, 0], dtype=pl.UInt32),
+            education=pl.Series([0, None], dtype=pl.UInt32),
+            age_category=pl.Series([0, 1], dtype=pl.UInt32),
+            price_standardized=pl.Series([-1.0, 1.0]) / 2**0.5,
+            pages_standardized=pl.Series([-1.0, 1.0]) / 2**0.5,
+        )
+        testing.assert_frame_equal(actual, expected)
+
+
+class TestFeatureTable:
+    def test_lookup(self, tmp_path: Path) -> None:
+        table = FeatureTable(str(tmp_path / "customers.arrow"))
+        table.write(pl.LazyFrame({"id": ["c", "a", "b"], "gender": [2, 0, 1]}))
+
+        actual = table.lookup(["b", "missing", "c"])
+        expected = pl.DataFrame({"id": ["b", "missing", "c"], "gender": [1, None, 2]})
+
+        testing.assert_frame_equal(actual, expected)
+
+
+class TestDatasetState:
+    def test_drift(self, tmp_path: Path) -> None:
+        data = pl.DataFrame({"price": [1.0, 3.0], "pages": [1, 3]})
+        standardization = {
+            "price": [data["price"].mean(), data["price"].std()],
+            "pages": [data["pages"].mean(), data["pages"].std()],
+        }
+
+        state = DatasetState(str(tmp_path / "state.json"))
+        state.reset(data.lazy(), 1)
+        state.save()
+
+        state = DatasetState(str(tmp_path / "state.json"))
+        assert state.drift(standardization) == pytest.approx(0)
+
+        new_data = pl.DataFrame({"price": [2.0, 2.0], "pages": [2, 2]})
+        state.update(new_data, 2)
+
+        assert state.changes == 2
+        assert state.drift(standardization) == pytest.approx(
+            abs(pl.concat([data, new_data])["price"].std() / data["price"].std() - 1)
+        )
+
+        state.remove(new_data)
+        assert state.drift(standardization) == pytest.approx(0)
@@ -0,0 +1,80 @@
+# pylint: disable=redefined-outer-name
+
+from os import environ
+from pathlib import Path
+
+import pytest
+from dynaconf.utils.boxing import DynaBox
+
+from src.command.utils import _init_executor, run_apps
+from src.common import App
+
+
+class ArgumentsApp(App):
+    """Writes its label to the output directory, or fails if asked to."""
+
+    def run(self) -> None:
+        if self.arguments.get("fail"):
+            raise ValueError(f"{self.arguments['label']} failed")
+
+        Path(self.config.path, self.arguments["label"]).touch()
+
+
+APP_NAME = f"{__name__}.ArgumentsApp"
+
+
+@pytest.fixture
+def config_path(tmp_path: Path) -> str:
+    path = tmp_path / "settings.toml"
+    path.write_text(
+        f'[test]\nreader = "ParquetReader"\nwriter = "ParquetWriter"\n'
+        f'path = "{tmp_path}"\n'
+    )
+
+    return str(path)
+
+
+def test_run_apps_thread(tmp_path: Path, config_path: str) -> None:
+    apps = {
+        label: ("test", APP_NAME, {"label": label}) for label in ("books", "customers")
+    }
+
+    wall_times = run_apps(
+        config_path, apps, DynaBox({"executor": "thread", "max_workers": 2})
+    )
+
+    assert list(wall_times) == ["books", "customers"]
+    assert (tmp_path / "books").exists() and (tmp_path / "customers").exists()
+
+
+def test_run_apps_raises_error(tmp_path: Path, config_path: str) -> None:
+    apps = {
+        "books": ("test", APP_NAME, {"label": "books", "fail": True}),
+        "customers": ("test", APP_NAME, {"label": "customers"}),
+    }
+
+    with pytest.raises(ValueError, match="books failed"):
+        run_apps(config_path, apps, DynaBox({"executor": "thread", "max_workers": 2}))
+
+    # other applications still run to the end
+    assert (tmp_path / "customers").exists()
+
+
+def test_init_executor_unknown_type() -> None:
+    with pytest.raises(ValueError, match="Unknown executor type"):
+        _init_executor("cluster", 2)
+
+
+@pytest.mark.parametrize("polars_threads", [None, "3"])
+def test_run_apps_restores_polars_threads(
+    monkeypatch: pytest.MonkeyPatch, config_path: str, polars_threads: str | None
+) -> None:
+    if polars_threads is None:
+        monkeypatch.delenv("POLARS_MAX_THREADS", raising=False)
+    else:
+        monkeypatch.setenv("POLARS_MAX_THREADS", polars_threads)
+
+    apps = {"books": ("test", APP_NAME, {"label": "books"})}
+    run_apps(config_path, apps, DynaBox({"executor": "process", "max_workers": 2}))
+
+    assert environ.get("POLARS_MAX_THREADS") == polars_threads
@@ -1,11 +1,15 @@
+import json
+import os
 from pathlib import Path
 
 import polars as pl
 import pytest
+from dynaconf.utils.boxing import DynaBox
 from polars import testing
 
 from src.common import Config, CsvReader, ParquetWriter
-from src.ingestion.common import IngestionApp
+from src.ingestion.app.book import IngestionBookApp
+from src.ingestion.common import IngestionApp, SourceManifest
 
 
 class TestIngestionApp:
@@ -52,3 +56,81 @@ class TestIngestionApp:
             check_column_order=False,
             check_row_order=False,
         )
+
+
+class TestSourceManifest:
+    def test_is_changed(self, tmp_path: Path) -> None:
+        source = tmp_path / "books.csv"
+        source.write_text("id,title\n1,Example\n")
+
+        manifest = SourceManifest(str(tmp_path / "manifest.json"))
+        assert manifest.is_changed(source)
+
+        manifest.add(source, ["books/ingestion_date=2024-01-01"], [])
+        manifest.save()
+
+        manifest = SourceManifest(str(tmp_path / "manifest.json"))
+        assert not manifest.is_changed(source)
+
+        source.write_text("id,title\n1,Example\n2,Test\n")
+        assert manifest.is_changed(source)
+
+    def test_touched_source_is_refreshed(self, tmp_path: Path) -> None:
+        source = tmp_path / "books.csv"
+        source.write_text("id,title\n1,Example\n")
+
+        manifest = SourceManifest(str(tmp_path / "manifest.json"))
+        manifest.add(source, ["books/ingestion_date=2024-01-01"], [])
+
+        os.utime(source, (0, 1_000_000))
+        assert not manifest.is_changed(source)
+        assert manifest.entries[str(source)]["mtime"] == 1_000_000
+
+
+def test_ingesting_again_replaces_same_day_output(
+    tmp_path: Path, csv_reader: CsvReader, parquet_writer: ParquetWriter
+) -> None:
+    source = tmp_path / "books.csv"
+    config = DynaBox(
+        {
+            "manifest": str(tmp_path / "_manifest.json"),
+            "input": {"path": str(source)},
+            "output": {
+                "path": str(tmp_path / "books"),
+                "manifest": str(tmp_path / "_files.json"),
+                "partition_by": ["ingestion_date"],
+            },
+        }
+    )
+
+    for content in ("id,title\n1,Example\n", "id,title\n1,Example\n2,Test\n"):
+        source.write_text(content)
+        IngestionBookApp(config, csv_reader, parquet_writer).run()
+
+    data = pl.read_parquet(tmp_path / "books")
+    assert data["id"].sort().to_list() == [1, 2]
+
+    files = [
+        file["path"] for file in json.loads((tmp_path / "_files.json").read_text())
+    ]
+    assert len(files) == 1
+    assert SourceManifest(config.manifest).entries[str(source)]["files"] == [
+        str(tmp_path / "books" / files[0])
+    ]
+
+
+def test_streaming_chunk_size_uses_widest_source(
+    tmp_path: Path, csv_reader: CsvReader, parquet_writer: ParquetWriter
+) -> None:
+    narrow, wide = tmp_path / "narrow.csv", tmp_path / "wide.csv"
+    narrow.write_text("id\n" + "1\n" * 10)
+    wide.write_text("id\n" + f"{'1' * 99}\n" * 10)
+
+    IngestionApp.__abstractmethods__ = set()
+    app = IngestionApp(DynaBox({}), csv_reader, parquet_writer)
+    memory_limit = pl.thread_pool_size() * 100 * 2 * 1000 / 1024 / 1024
+    assert app._streaming_chunk_size([narrow, wide], 10**6, memory_limit) == 1000
+
+    # state of a run isn't shared with other apps
+    app.replaced_files.append("file")
+    assert IngestionApp(DynaBox({}), csv_reader, parquet_writer).replaced_files == []
@@ -0,0 +1,37 @@
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from src.aggregation.common import FeatureTable
+from src.serving import Predictor
+
+
+@pytest.fixture
+def predictor(tmp_path: Path) -> Predictor:
+    customers = FeatureTable(str(tmp_path / "customers.arrow"))
+    customers.write(
+        pl.LazyFrame(
+            {
+                "id": ["c1", "c2"],
+                "gender": [0, 1],
+                "education": [1, None],
+                "occupation": [0, 0],
+                "age_category": [2, 1],
+            }
+        )
+    )
+    books = FeatureTable(str(tmp_path / "books.arrow"))
+    books.write(
+        pl.LazyFrame(
+            {"id": ["b1"], "price_standardized": [0.5], "pages_standardized": [-1.0]}
+        )
+    )
+
+    # predicts late returns of customers with gender 1
+    features = np.array([[gender, 1, 0, 2, 0.5, -1.0] for gender in (0, 1) * 5])
+    model = LogisticRegression().fit(features, features[:, 0])
+
+    return Predictor(model, customers, books)
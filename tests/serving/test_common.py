@@ -0,0 +1,124 @@
+import json
+import warnings
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+import pyarrow.parquet as pq
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from src.serving import (
+    FEATURE_COLUMNS,
+    Predictor,
+    feature_matrix,
+    load_model_metadata,
+    save_model,
+    training_data,
+    verification_features,
+)
+
+
+def test_predictor_features(predictor: Predictor) -> None:
+    features = predictor.features(["c2", "c1", "unknown"], ["b1", "b1", "b1"])
+
+    assert features.columns == [
+        "gender",
+        "education",
+        "occupation",
+        "age_category",
+        "price_standardized",
+        "pages_standardized",
+    ]
+    assert features.row(1) == (0, 1, 0, 2, 0.5, -1.0)
+    assert features.null_count().row(0) == (1, 2, 1, 1, 0, 0)
+
+    # incomplete features aren't predicted
+    assert predictor.predict(["c2", "c1"], ["b1", "b1"]) == [None, 0]
+
+
+def test_feature_matrix() -> None:
+    data = pl.DataFrame(
+        {"b": pl.Series([1, 2], dtype=pl.UInt32), "a": [0.5, 1.5], "c": ["x", "y"]}
+    )
+
+    matrix = feature_matrix(data, ["a", "b"], np.float32)
+
+    assert matrix.dtype == np.float32
+    assert matrix.flags["C_CONTIGUOUS"]
+    np.testing.assert_array_equal(matrix, [[0.5, 1], [1.5, 2]])
+
+
+def test_training_data() -> None:
+    dataset = pl.LazyFrame(
+        {"a": [0.5, None, 1.5], "b": [1, 2, 3], "label": [0, 1, 1]},
+        schema_overrides={"b": pl.UInt32},
+    )
+
+    features, labels = training_data(dataset, ["b", "a"], dtype=np.float32)
+
+    assert features.dtype == np.float32
+    np.testing.assert_array_equal(features, [[1, 0.5], [3, 1.5]])
+    np.testing.assert_array_equal(labels, [0, 1])
+
+
+def test_verification_features() -> None:
+    dataset = pl.LazyFrame(
+        {"a": [i % 10 for i in range(1000)], "b": [None] + [1.0] * 999}
+    )
+
+    features = verification_features(dataset, ["a", "b"], rows=500)
+
+    # equal rows are sampled together, so sampled rows stay distinct
+    assert 0 < len(features) < 10
+    assert len(np.unique(features, axis=0)) == len(features)
+    assert len(verification_features(dataset, ["a", "b"])) == 10
+
+
+def test_model_fitted_with_feature_names(tmp_path: Path, predictor: Predictor) -> None:
+    columns = list(FEATURE_COLUMNS)
+    features = predictor.features(["c1", "c1"], ["b1", "b1"]).with_columns(
+        gender=pl.Series([0, 1], dtype=pl.Int64)
+    )
+    model = LogisticRegression().fit(features.cast(pl.Float64), [0, 1])
+
+    # column order comes from the names when metadata wasn't saved
+    metadata = load_model_metadata(str(tmp_path / "missing.json"), model)
+    assert metadata["columns"] == columns
+
+    predictor = Predictor(model, predictor.customers, predictor.books, columns)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert predictor.predict(["c1"], ["b1"]) == [0]
+
+    # columns in another order than the model was fitted with are refused
+    predictor.columns = list(reversed(columns))
+    with pytest.raises(ValueError, match="feature names"):
+        predictor.predict(["c1"], ["b1"])
+
+
+def test_save_model(tmp_path: Path, predictor: Predictor) -> None:
+    columns = list(reversed(FEATURE_COLUMNS))
+    save_model(
+        predictor.model,
+        str(tmp_path / "model.pkl"),
+        str(tmp_path / "model.json"),
+        columns,
+    )
+
+    metadata = json.loads((tmp_path / "model.json").read_text())
+    assert metadata == {"columns": columns, "dtype": "float64"}
+
+
+def test_predict_batch(tmp_path: Path, predictor: Predictor) -> None:
+    pairs = pl.LazyFrame(
+        {"customer_id": ["c1", "unknown"] * 5, "book_id": ["b1"] * 10, "library": 1}
+    )
+    path = tmp_path / "predictions.parquet"
+
+    assert predictor.predict_batch(pairs, str(path), chunk_size=4) == 10
+
+    predictions = pl.read_parquet(path)
+    assert predictions.columns == ["customer_id", "book_id", "library", "prediction"]
+    assert predictions["prediction"].to_list() == [0, None] * 5
+    assert pq.ParquetFile(path).metadata.num_row_groups == 3
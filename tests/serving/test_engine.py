@@ -0,0 +1,36 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.tree import DecisionTreeClassifier
+
+from src.serving import InferenceEngine
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        RandomForestClassifier(n_estimators=20, random_state=0),
+        DecisionTreeClassifier(max_depth=5, random_state=0),
+        LogisticRegression(),
+    ],
+)
+def test_engine_is_bit_identical(tmp_path: Path, model) -> None:
+    generator = np.random.default_rng(0)
+    features = generator.normal(size=(500, 6))
+    labels = (features[:, 0] + generator.normal(size=500) > 0).astype(int)
+    model.fit(features, labels)
+
+    InferenceEngine.export(model).save(str(tmp_path / "engine"))
+    engine = InferenceEngine.load(str(tmp_path / "engine"))
+
+    test_features = generator.normal(size=(200, 6))
+    assert engine.matches(model, test_features)
+    assert engine.predict(test_features[0]) == model.predict(test_features[:1])
+
+
+def test_engine_unsupported_model() -> None:
+    with pytest.raises(ValueError):
+        InferenceEngine.export(object())
@@ -0,0 +1,92 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from src.aggregation.common import FeatureEncoder
+from src.serving import FEATURE_COLUMNS, InferenceEngine, ModelRegistry, Predictor
+
+
+def test_model_registry(tmp_path: Path, predictor: Predictor) -> None:
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    predictor.registry = registry
+    assert registry.model() is None
+    assert predictor.predict(["c1"], ["b1"]) == [0]
+
+    # second version predicts late returns of customers with gender 0
+    features = np.array([[gender, 1, 0, 2, 0.5, -1.0] for gender in (0, 1) * 5])
+    metadata = {"columns": list(FEATURE_COLUMNS), "dtype": "float64"}
+    first = registry.register(predictor.model, metadata, features)
+    second = registry.register(
+        LogisticRegression().fit(features, 1 - features[:, 0]), metadata
+    )
+    assert registry.versions() == [first, second]
+    assert registry.metadata(first)["engine"]
+    assert not registry.metadata(second)["engine"]
+
+    registry.promote(first)
+    model, _ = registry.model()
+    assert isinstance(model, InferenceEngine)
+    assert registry.model()[0] is model
+    assert predictor.predict(["c1"], ["b1"]) == [0]
+
+    registry.promote(second)
+    assert predictor.version == second
+    assert predictor.predict(["c1"], ["b1"]) == [1]
+    assert list(registry._models) == [second]
+
+
+def test_model_registry_export(tmp_path: Path, predictor: Predictor) -> None:
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    features = np.array([[gender, 1, 0, 2, 0.5, -1.0] for gender in (0, 1)])
+    metadata = {"columns": list(FEATURE_COLUMNS), "dtype": "float64"}
+    version = registry.register(predictor.model, metadata)
+    registry.promote(version)
+    assert not isinstance(registry.model()[0], InferenceEngine)
+
+    assert registry.export(version, features)
+    assert registry.metadata(version)["engine"]
+    assert isinstance(registry.model()[0], InferenceEngine)
+
+
+def test_model_registry_encoder_version(tmp_path: Path, predictor: Predictor) -> None:
+    encoder = FeatureEncoder(str(tmp_path / "encoder.json"))
+    encoder.categories = {"occupation": ["Sales"]}
+    encoder.save()
+    registry = ModelRegistry(str(tmp_path / "registry"), encoder_path=str(encoder.path))
+    metadata = {"columns": list(FEATURE_COLUMNS), "dtype": "float64"}
+    trained = registry.register(predictor.model, {**metadata, "encoder_version": 1})
+    unknown = registry.register(predictor.model, {**metadata, "encoder_version": 0})
+
+    # appended categories keep the codes the model was trained on
+    encoder.categories["occupation"].append("Tech")
+    encoder.save()
+    registry.promote(trained)
+    with pytest.raises(ValueError, match="encoder version 0"):
+        registry.promote(unknown)
+
+    encoder.medians = {"price": 2.0}
+    encoder.save()
+    with pytest.raises(ValueError, match="incompatible version 3"):
+        registry.load(trained)
+    assert registry.current() == trained
+
+
+def test_model_registry_refresh(tmp_path: Path, predictor: Predictor) -> None:
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    registry.auto_refresh = False
+    metadata = {"columns": list(FEATURE_COLUMNS), "dtype": "float64"}
+    first = registry.register(predictor.model, metadata)
+    second = registry.register(predictor.model, metadata)
+
+    registry.promote(first)
+    assert registry.model() is None
+    registry.refresh()
+    assert registry.model()[1]["version"] == first
+
+    # promoted version is only loaded by `refresh`
+    registry.promote(second)
+    assert registry.model()[1]["version"] == first
+    registry.refresh()
+    assert registry.model()[1]["version"] == second
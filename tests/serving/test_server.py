@@ -0,0 +1,102 @@
+import asyncio
+import json
+from pathlib import Path
+
+from src.serving import FEATURE_COLUMNS, ModelRegistry, PredictionServer, Predictor
+
+
+def test_prediction_server(tmp_path: Path, predictor: Predictor) -> None:
+    socket = str(tmp_path / "serve.sock")
+    server = PredictionServer(predictor)
+
+    async def request(targets: list[str]) -> list[tuple[int, dict]]:
+        reader, writer = await asyncio.open_unix_connection(socket)
+        responses = []
+        for target in targets:
+            writer.write(f"GET {target} HTTP/1.1\r\nHost: test\r\n\r\n".encode())
+            status = int((await reader.readline()).split()[1])
+            headers = {}
+            while (line := await reader.readline()) != b"\r\n":
+                name, _, value = line.decode().partition(":")
+                headers[name.lower()] = value.strip()
+            body = await reader.readexactly(int(headers["content-length"]))
+            responses.append((status, json.loads(body)))
+
+        writer.close()
+        return responses
+
+    async def run() -> list[tuple[int, dict]]:
+        async with await server.start(socket=socket):
+            return await request(
+                [
+                    "/health",
+                    "/predict?customer_id=c2&book_id=b1",
+                    "/predict?customer_id=c1",
+                    "/metrics",
+                ]
+            )
+
+    health, missing, invalid, metrics = asyncio.run(run())
+
+    assert health == (200, {"status": "ok"})
+    assert missing[0] == 404
+    assert invalid[0] == 400
+    assert metrics[0] == 200
+    assert metrics[1]["requests"] == 2
+    assert list(metrics[1]["latency_ms"]) == ["p50", "p90", "p99"]
+
+
+def test_prediction_server_invalid_requests(
+    tmp_path: Path, predictor: Predictor
+) -> None:
+    socket = str(tmp_path / "serve.sock")
+    server = PredictionServer(predictor, max_body_size=10)
+
+    async def request(data: bytes) -> tuple[int, bytes]:
+        reader, writer = await asyncio.open_unix_connection(socket)
+        writer.write(data)
+        status = int((await reader.readline()).split()[1])
+        # connection is closed after the response
+        rest = await reader.read()
+
+        writer.close()
+        return status, rest
+
+    async def run() -> list[tuple[int, bytes]]:
+        async with await server.start(socket=socket):
+            return [
+                await request(data)
+                for data in (
+                    b"GET\r\n\r\n",
+                    b"GET /health HTTP/1.1\r\nContent-Length: x\r\n\r\n",
+                    b"GET /health HTTP/1.1\r\nContent-Length: -1\r\n\r\n",
+                    b"POST /health HTTP/1.1\r\nContent-Length: 11\r\n\r\n",
+                )
+            ]
+
+    statuses = [status for status, _ in asyncio.run(run())]
+
+    assert statuses == [400, 400, 400, 413]
+
+
+def test_prediction_server_refreshes_registry(
+    tmp_path: Path, predictor: Predictor
+) -> None:
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    predictor.registry = registry
+    metadata = {"columns": list(FEATURE_COLUMNS), "dtype": "float64"}
+    version = registry.register(predictor.model, metadata)
+    server = PredictionServer(predictor, refresh_interval=0.01)
+
+    async def run() -> int | None:
+        async with await server.start(socket=str(tmp_path / "serve.sock")):
+            registry.promote(version)
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                if registry.model() is not None:
+                    break
+
+            return predictor.version
+
+    assert asyncio.run(run()) == version
+    assert not registry.auto_refresh
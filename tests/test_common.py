@@ -1,17 +1,38 @@
 # pylint: disable=redefined-outer-name
 
+from datetime import date
+from pathlib import Path
+
+import polars as pl
+import pyarrow.parquet as pq
 import pytest
+from dynaconf.utils.boxing import DynaBox
+from polars import testing
 
 from src.common import (
+    ChangeLog,
     Config,
     CsvReader,
+    DatasetManifest,
+    ParquetReader,
     ParquetWriter,
+    QuantileSketch,
+    Writer,
     get_class,
     init_reader,
     init_writer,
     load_config_module,
+    load_schema,
+    load_sketches,
+    parse_dtype,
+    save_sketches,
+)
+from src.exception import (
+    MissingClassImplementation,
+    MissingConfigModuleImplementation,
+    SchemaDriftError,
+    UnsupportedWriteMode,
 )
-from src.exception import MissingClassImplementation, MissingConfigModuleImplementation
 
 
 @pytest.fixture(scope="module")
@@ -81,3 +102,615 @@ def test_init_writer(config: Config) -> None:
     writer = init_writer(config_module)
 
     assert isinstance(writer, ParquetWriter)
+
+
+def test_writer_defaults() -> None:
+    class ListWriter(Writer):
+        def __init__(self) -> None:
+            self.written: list[pl.DataFrame] = []
+
+        def write(self, data, config, *args, **kwargs) -> None:
+            self.written.append(data)
+
+    writer = ListWriter()
+    data = pl.DataFrame({"id": ["a", "b"]})
+
+    writer.sink(data.lazy(), DynaBox({}))
+    testing.assert_frame_equal(writer.written[0], data)
+
+    with pytest.raises(UnsupportedWriteMode):
+        writer.merge(data, DynaBox({}))
+
+
+def test_parquet_writer_sink(tmp_path: Path, parquet_writer: ParquetWriter) -> None:
+    data = pl.DataFrame(
+        {"id": ["a", "b", "c"], "ingestion_date": [date(2024, 1, 1)] * 3}
+    )
+    output = DynaBox(
+        {"path": str(tmp_path / "books"), "partition_by": ["ingestion_date"]}
+    )
+
+    parquet_writer.sink(data.lazy(), output, chunk_size=2)
+
+    partition = tmp_path / "books" / "ingestion_date=2024-01-01"
+    assert [file.suffix for file in partition.iterdir()] == [".parquet"]
+
+    actual = pl.read_parquet(tmp_path / "books")
+    testing.assert_frame_equal(actual, data, check_row_order=False)
+
+
+def test_parquet_writer_sink_row_groups(
+    tmp_path: Path, parquet_writer: ParquetWriter
+) -> None:
+    data = pl.DataFrame({"id": range(100_000)})
+    output = DynaBox(
+        {
+            "path": str(tmp_path / "books.parquet"),
+            "partition_by": [],
+            "layout": {"row_group_size": 20_000, "target_file_size_mb": 128},
+        }
+    )
+
+    # streamed batches are buffered into row groups of the layout
+    parquet_writer.sink(data.lazy(), output, chunk_size=7_000)
+
+    (file,) = (tmp_path / "books.parquet").iterdir()
+    metadata = pq.ParquetFile(file).metadata
+    assert metadata.num_row_groups == 5
+    assert {metadata.row_group(row_group).num_rows for row_group in range(5)} == {
+        20_000
+    }
+
+
+def test_parquet_writer_appends_partitions(
+    tmp_path: Path, parquet_writer: ParquetWriter
+) -> None:
+    first = pl.DataFrame({"id": ["a"], "ingestion_date": [date(2024, 1, 1)]})
+    second = pl.DataFrame(
+        {"id": ["b", "c"], "ingestion_date": [date(2024, 1, 1), date(2024, 1, 2)]}
+    )
+    output = DynaBox(
+        {"path": str(tmp_path / "books"), "partition_by": ["ingestion_date"]}
+    )
+
+    parquet_writer.write(first, output)
+    parquet_writer.write(second, output)
+
+    actual = pl.read_parquet(tmp_path / "books")
+    testing.assert_frame_equal(
+        actual, pl.concat([first, second]), check_row_order=False
+    )
+
+
+def test_parse_dtype() -> None:
+    assert parse_dtype("Int32") == pl.Int32
+    assert parse_dtype("List(String)") == pl.List(pl.String)
+
+
+def test_load_schema_captures_schema(tmp_path: Path) -> None:
+    input_config = DynaBox({"schema_path": str(tmp_path / "schema.json")})
+    expected = pl.Schema({"id": pl.String, "pages": pl.Int32})
+
+    assert load_schema(input_config, lambda: expected) == expected
+    # captured schema is reused instead of inferred again
+    assert load_schema(input_config, lambda: pl.Schema()) == expected
+
+
+def test_load_schema_overrides_dirty_columns(
+    tmp_path: Path, csv_reader: CsvReader
+) -> None:
+    source = tmp_path / "books.csv"
+    input_config = DynaBox(
+        {
+            "path": str(source),
+            "schema_path": str(tmp_path / "schema.json"),
+            "schema_overrides": {"price": "String", "pages": "String"},
+        }
+    )
+
+    # schema is captured from clean values which would be inferred as numbers
+    source.write_text("id,price,pages\nb1,1.5,100\n")
+    schema = load_schema(
+        input_config,
+        lambda: pl.scan_csv(source, infer_schema_length=None).collect_schema(),
+    )
+    assert schema == pl.Schema(
+        {"id": pl.String, "price": pl.String, "pages": pl.String}
+    )
+
+    source.write_text("id,price,pages\nb1,$1.5,100 pages\n")
+    actual = (
+        csv_reader.read(input_config)
+        .select(pl.col("price", "pages").str.strip_chars())
+        .collect()
+    )
+    assert actual.row(0) == ("$1.5", "100 pages")
+
+
+def test_csv_reader_schema_drift(tmp_path: Path, csv_reader: CsvReader) -> None:
+    source = tmp_path / "books.csv"
+    source.write_text("id,pages\n1,100\n")
+    input_config = DynaBox(
+        {"path": str(source), "schema": {"id": "String", "price": "String"}}
+    )
+
+    with pytest.raises(SchemaDriftError):
+        csv_reader.read(input_config)
+
+
+def test_parquet_reader_prunes_partitions(
+    tmp_path: Path, parquet_reader: ParquetReader, parquet_writer: ParquetWriter
+) -> None:
+    data = pl.DataFrame(
+        {
+            "id": ["a", "b", "c"],
+            "ingestion_date": [date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 3)],
+        }
+    )
+    output = DynaBox(
+        {"path": str(tmp_path / "books"), "partition_by": ["ingestion_date"]}
+    )
+    parquet_writer.write(data, output)
+
+    files = parquet_reader._prune_partitions(output, "2024-01-02", "2024-01-03")
+    assert len(files) == 1
+    assert "ingestion_date=2024-01-02" in files[0]
+
+    actual = parquet_reader.read(
+        output, start_date=date(2024, 1, 2), end_date=date(2024, 1, 3)
+    )
+    testing.assert_frame_equal(actual.collect(), data[1:2])
+
+
+def test_parquet_writer_merge(tmp_path: Path, parquet_writer: ParquetWriter) -> None:
+    output = DynaBox(
+        {
+            "path": str(tmp_path / "books.parquet"),
+            "partition_by": [],
+            "merge_keys": ["id"],
+        }
+    )
+    parquet_writer.write(pl.DataFrame({"id": ["a", "b"], "pages": [1, 2]}), output)
+
+    parquet_writer.merge(pl.DataFrame({"id": ["b", "c"], "pages": [20, 30]}), output)
+
+    expected = pl.DataFrame({"id": ["a", "b", "c"], "pages": [1, 20, 30]})
+    actual = pl.read_parquet(output.path)
+    testing.assert_frame_equal(actual, expected, check_row_order=False)
+
+
+def test_parquet_writer_merge_rewrites_affected_files(
+    tmp_path: Path, parquet_writer: ParquetWriter, parquet_reader: ParquetReader
+) -> None:
+    output = DynaBox(
+        {
+            "path": str(tmp_path / "customers.parquet"),
+            "manifest": str(tmp_path / "_files" / "customers.json"),
+            "partition_by": [],
+            "merge_keys": ["id"],
+            "bucket_by": "id",
+            "buckets": 4,
+            "sort_by": ["id"],
+        }
+    )
+    data = pl.DataFrame({"id": [f"{i:03}" for i in range(100)], "pages": range(100)})
+    parquet_writer.write(data, output)
+    files = set(DatasetManifest(output.manifest, output.path).paths())
+
+    update = pl.DataFrame({"id": ["005", "new"], "pages": [-1, -2]})
+    parquet_writer.merge(update, output)
+
+    # only the file holding "005" is rewritten, "new" is out of every key range
+    merged = set(DatasetManifest(output.manifest, output.path).paths())
+    assert len(files - merged) == 1
+    assert len(merged - files) == 2
+    assert all(Path(file).exists() for file in merged)
+
+    expected = pl.concat([data.filter(pl.col("id") != "005"), update])
+    actual = parquet_reader.read(output).collect()
+    testing.assert_frame_equal(actual, expected, check_row_order=False)
+
+
+def test_parquet_writer_merge_logs_changes(
+    tmp_path: Path, parquet_writer: ParquetWriter, parquet_reader: ParquetReader
+) -> None:
+    output = DynaBox(
+        {
+            "path": str(tmp_path / "checkouts.parquet"),
+            "manifest": str(tmp_path / "_files" / "checkouts.json"),
+            "partition_by": [],
+            "merge_keys": ["id"],
+            "changes_path": str(tmp_path / "_changes" / "checkouts"),
+            "layout": {"target_file_size_mb": 1},
+        }
+    )
+    changes = ChangeLog(output.changes_path)
+    data = pl.DataFrame({"id": ["a", "b", "c"], "date_returned": [1, None, 3]})
+    parquet_writer.write(data, output)
+
+    assert changes.rewritten(0)
+    assert changes.read(0) is None
+
+    # "a" is merged unchanged, "b" is returned and "d" is new
+    update = pl.DataFrame({"id": ["a", "b", "d"], "date_returned": [1, 2, None]})
+    parquet_writer.merge(update, output)
+
+    assert not changes.rewritten(1)
+    assert sorted(changes.read(1).collect()["id"]) == ["b", "d"]
+
+    # rows of keys missing from the data are deleted
+    parquet_writer.merge(update.clear(), output, keys=pl.DataFrame({"id": ["c"]}))
+
+    assert changes.latest() == 3
+    assert sorted(changes.read(2).collect()["id"]) == ["c"]
+    assert sorted(parquet_reader.read(output).collect()["id"]) == ["a", "b", "d"]
+
+    changes.prune(3)
+    assert changes.read(2) is not None
+    assert changes.latest() == 3
+
+
+def test_parquet_writer_merges_sketches(
+    tmp_path: Path, parquet_writer: ParquetWriter, parquet_reader: ParquetReader
+) -> None:
+    output = DynaBox(
+        {
+            "path": str(tmp_path / "books.parquet"),
+            "manifest": str(tmp_path / "_files" / "books.json"),
+            "partition_by": [],
+            "merge_keys": ["id"],
+            "sort_by": ["id"],
+            "layout": {"target_file_size_mb": 1},
+            "sketch": {
+                "path": str(tmp_path / "_sketch" / "books.json"),
+                "columns": ["price"],
+                "relative_error": 0.01,
+            },
+        }
+    )
+    data = pl.DataFrame({"id": [f"{i:03}" for i in range(100)], "price": range(100)})
+    parquet_writer.write(data, output)
+    parquet_writer.merge(
+        pl.DataFrame({"id": ["005", "new"], "price": [1000, 2000]}), output
+    )
+
+    expected = QuantileSketch.build(parquet_reader.read(output), "price", 0.01)
+    actual = load_sketches(output.sketch.path)["price"]
+    assert actual.to_dict() == expected.to_dict()
+
+
+def test_parquet_writer_lazy(tmp_path: Path, parquet_writer: ParquetWriter) -> None:
+    data = pl.DataFrame({"id": ["a", "b", "c"], "pages": [1, 2, None]})
+    output = DynaBox({"path": str(tmp_path / "books.parquet"), "partition_by": []})
+
+    # median can't be streamed so the plan is collected instead
+    for plan in (
+        data.lazy(),
+        data.lazy().with_columns(pl.col("pages").fill_null(pl.col("pages").median())),
+    ):
+        parquet_writer.write(plan, output)
+
+        testing.assert_frame_equal(pl.read_parquet(output.path), plan.collect())
+
+
+def test_parquet_writer_lazy_error(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, parquet_writer: ParquetWriter
+) -> None:
+    data = pl.LazyFrame({"id": ["a", "b"]}).select(pl.col("id").cast(pl.Int8))
+    output = DynaBox({"path": str(tmp_path / "books.parquet"), "partition_by": []})
+
+    def collect(*args, **kwargs):
+        raise AssertionError("Failed plan was collected again.")
+
+    # errors of a streamable plan are raised instead of collecting it
+    monkeypatch.setattr(pl.LazyFrame, "collect", collect)
+    with pytest.raises(pl.exceptions.InvalidOperationError, match="conversion"):
+        parquet_writer.write(data, output)
+
+
+def test_parquet_writer_layout(tmp_path: Path, parquet_writer: ParquetWriter) -> None:
+    output = DynaBox(
+        {
+            "path": str(tmp_path / "data.parquet"),
+            "partition_by": [],
+            "layout": {"compression": "zstd", "row_group_size": 100},
+        }
+    )
+    parquet_writer.write(pl.DataFrame({"a": range(1000)}), output)
+
+    metadata = pq.ParquetFile(output.path).metadata
+    assert metadata.num_row_groups == 10
+    assert metadata.row_group(0).column(0).compression == "ZSTD"
+
+
+def test_parquet_writer_splits_files(
+    tmp_path: Path, parquet_writer: ParquetWriter, parquet_reader: ParquetReader
+) -> None:
+    data = pl.DataFrame({"id": [str(i) for i in range(1000)], "pages": range(1000)})
+    output = DynaBox(
+        {
+            "path": str(tmp_path / "books.parquet"),
+            "manifest": str(tmp_path / "_files" / "books.json"),
+            "partition_by": [],
+            "layout": {"target_file_size_mb": 0.002},
+        }
+    )
+
+    # second write replaces files of the first one
+    for plan in (data, data.lazy()):
+        parquet_writer.write(plan, output)
+
+        manifest = DatasetManifest(output.manifest, output.path)
+        assert len(manifest.files) > 1
+        assert sum(file["rows"] for file in manifest.files) == len(data)
+        assert sorted(manifest.paths()) == sorted(
+            str(file) for file in Path(output.path).iterdir()
+        )
+
+        actual = parquet_reader.read(output).collect()
+        testing.assert_frame_equal(actual, data, check_row_order=False)
+
+
+def test_parquet_writer_replaces_single_file(
+    tmp_path: Path, parquet_writer: ParquetWriter, parquet_reader: ParquetReader
+) -> None:
+    data = pl.DataFrame({"id": [str(i) for i in range(1000)]})
+    output = DynaBox({"path": str(tmp_path / "books.parquet"), "partition_by": []})
+    parquet_writer.write(data, output)
+
+    output.layout = {"target_file_size_mb": 0.002}
+    output.manifest = str(tmp_path / "_files" / "books.json")
+
+    # failed write leaves the single file output as it was
+    for failing in (
+        data.lazy().select(pl.col("id").cast(pl.Int8)),
+        # median can't be streamed, sink fails before it opens the output
+        data.lazy().select(pl.col("id").str.len_chars().median()),
+    ):
+        with pytest.raises(pl.exceptions.InvalidOperationError):
+            parquet_writer.sink(failing, output)
+    testing.assert_frame_equal(pl.read_parquet(output.path), data)
+
+    parquet_writer.sink(data.lazy(), output)
+
+    assert Path(output.path).is_dir()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["_files", "books.parquet"]
+    testing.assert_frame_equal(parquet_reader.read(output).collect(), data)
+
+
+def test_parquet_writer_records_partitions(
+    tmp_path: Path, parquet_writer: ParquetWriter, parquet_reader: ParquetReader
+) -> None:
+    data = pl.DataFrame(
+        {
+            "id": ["a", "b", "c"],
+            "ingestion_date": [date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 3)],
+        }
+    )
+    output = DynaBox(
+        {
+            "path": str(tmp_path / "books"),
+            "manifest": str(tmp_path / "_files" / "books.json"),
+            "partition_by": ["ingestion_date"],
+        }
+    )
+
+    parquet_writer.write(data, output)
+
+    # files not recorded in the manifest aren't read
+    stray = tmp_path / "books" / "ingestion_date=2024-01-04"
+    stray.mkdir()
+    data.write_parquet(stray / "stray.parquet")
+
+    assert parquet_reader.partitions(output) == [
+        "2024-01-01",
+        "2024-01-02",
+        "2024-01-03",
+    ]
+
+    actual = parquet_reader.read(output, partitions=["2024-01-02"]).collect()
+    testing.assert_frame_equal(actual, data.slice(1, 1))
+
+
+def test_parquet_writer_sorts_output(
+    tmp_path: Path, parquet_writer: ParquetWriter
+) -> None:
+    data = pl.DataFrame({"id": [f"{i:04}" for i in range(1000)]}).sample(
+        fraction=1.0, shuffle=True, seed=0
+    )
+    output = DynaBox(
+        {
+            "path": str(tmp_path / "books.parquet"),
+            "partition_by": [],
+            "merge_keys": ["id"],
+            "sort_by": ["id"],
+            "layout": {"row_group_size": 100, "statistics": "full"},
+        }
+    )
+
+    parquet_writer.write(data.head(500), output)
+    parquet_writer.merge(data.tail(500), output)
+
+    # row groups hold disjoint id ranges, so a filter on id reads one of them
+    metadata = pq.ParquetFile(output.path).metadata
+    ranges = [
+        (
+            metadata.row_group(group).column(0).statistics.min,
+            metadata.row_group(group).column(0).statistics.max,
+        )
+        for group in range(metadata.num_row_groups)
+    ]
+    assert metadata.num_row_groups == 10
+    assert ranges == sorted(ranges)
+    assert all(
+        previous[1] < current[0] for previous, current in zip(ranges, ranges[1:])
+    )
+
+
+def test_parquet_writer_buckets(
+    tmp_path: Path, parquet_writer: ParquetWriter, parquet_reader: ParquetReader
+) -> None:
+    customers = pl.DataFrame({"id": [str(i) for i in range(100)]})
+    checkouts = pl.DataFrame({"patron_id": [str(i % 100) for i in range(300)]})
+    outputs = [
+        DynaBox(
+            {
+                "path": str(tmp_path / f"{name}.parquet"),
+                "manifest": str(tmp_path / "_files" / f"{name}.json"),
+                "partition_by": [],
+                "bucket_by": key,
+                "buckets": 4,
+            }
+        )
+        for name, key in (("customers", "id"), ("checkouts", "patron_id"))
+    ]
+
+    parquet_writer.write(customers, outputs[0])
+    parquet_writer.write(checkouts.lazy(), outputs[1])
+
+    # equal keys of both tables land in the same bucket
+    joined = [
+        parquet_reader.read(outputs[0], bucket=bucket)
+        .join(
+            parquet_reader.read(outputs[1], bucket=bucket),
+            left_on="id",
+            right_on="patron_id",
+        )
+        .collect()
+        for bucket in range(4)
+    ]
+    assert all(len(bucket) for bucket in joined)
+    assert sum(len(bucket) for bucket in joined) == len(checkouts)
+
+
+def test_parquet_writer_sinks_buckets(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    parquet_writer: ParquetWriter,
+    parquet_reader: ParquetReader,
+) -> None:
+    checkouts = pl.DataFrame({"patron_id": [str(i % 100) for i in range(300)]})
+    output = DynaBox(
+        {
+            "path": str(tmp_path / "checkouts.parquet"),
+            "manifest": str(tmp_path / "_files" / "checkouts.json"),
+            "partition_by": [],
+            "bucket_by": "patron_id",
+            "buckets": 4,
+        }
+    )
+
+    def write(*args, **kwargs):
+        raise AssertionError("Bucketed output was collected.")
+
+    # output is streamed, never handed to the eager write
+    monkeypatch.setattr(ParquetWriter, "write", write)
+    parquet_writer.sink(checkouts.lazy(), output, chunk_size=50)
+    monkeypatch.undo()
+
+    files = sorted(
+        file.name[:12] for file in (tmp_path / "checkouts.parquet").iterdir()
+    )
+    assert files == [f"bucket-{bucket:05d}" for bucket in range(4)]
+
+    actual = pl.concat(
+        parquet_reader.read(output, bucket=bucket).collect() for bucket in range(4)
+    )
+    testing.assert_frame_equal(actual, checkouts, check_row_order=False)
+
+
+def test_parquet_reader_not_bucketed(
+    tmp_path: Path, parquet_reader: ParquetReader
+) -> None:
+    path = tmp_path / "customers.parquet"
+    path.mkdir()
+    pl.DataFrame({"id": ["a"]}).write_parquet(path / "customers.parquet")
+
+    with pytest.raises(ValueError):
+        parquet_reader.read(DynaBox({"path": str(path)}), bucket=0)
+
+
+def test_parquet_writer_append(
+    tmp_path: Path, parquet_writer: ParquetWriter, parquet_reader: ParquetReader
+) -> None:
+    data = pl.DataFrame({"id": ["a", "b", "c"]})
+    output = DynaBox(
+        {
+            "path": str(tmp_path / "dataset.parquet"),
+            "manifest": str(tmp_path / "_files" / "dataset.json"),
+            "partition_by": [],
+            "layout": {"target_file_size_mb": 128},
+        }
+    )
+
+    parquet_writer.write(data.head(1), output)
+    parquet_writer.write(data.tail(2).lazy(), output, append=True)
+
+    actual = parquet_reader.read(output).collect()
+    testing.assert_frame_equal(actual, data, check_row_order=False)
+
+    with pytest.raises(ValueError):
+        parquet_writer.write(
+            data,
+            DynaBox({"path": str(tmp_path / "a.parquet"), "partition_by": []}),
+            append=True,
+        )
+
+
+def test_quantile_sketch(tmp_path: Path) -> None:
+    values = pl.Series("price", [float(x) for x in range(-500, 2000)] + [None])
+    sketch = QuantileSketch.build(values.to_frame().lazy(), "price", 0.01)
+
+    for quantile in (0.1, 0.5, 0.9):
+        expected = values.quantile(quantile, "lower")
+        assert sketch.quantile(quantile) == pytest.approx(expected, rel=0.01)
+
+    save_sketches(str(tmp_path / "sketch.json"), {"price": sketch})
+    loaded = load_sketches(str(tmp_path / "sketch.json"))["price"]
+
+    assert loaded.quantile(0.5) == sketch.quantile(0.5)
+    assert load_sketches(str(tmp_path / "missing.json")) == {}
+
+
+def test_parquet_reader_lookup(
+    tmp_path: Path, parquet_writer: ParquetWriter, parquet_reader: ParquetReader
+) -> None:
+    data = pl.DataFrame(
+        {
+            "customer_id": [f"c{i % 50:02}" for i in range(1000)],
+            "book_id": [f"b{i:04}" for i in range(1000)],
+            "label": range(1000),
+        }
+    )
+    output = DynaBox(
+        {
+            "path": str(tmp_path / "dataset.parquet"),
+            "manifest": str(tmp_path / "_files" / "dataset.json"),
+            "partition_by": [],
+            "index_by": ["customer_id", "book_id"],
+            "index_path": str(tmp_path / "_index" / "dataset"),
+            "layout": {"row_group_size": 100, "target_file_size_mb": 128},
+        }
+    )
+
+    parquet_writer.write(data.head(500), output)
+    parquet_writer.write(data.tail(500), output, append=True)
+
+    actual = parquet_reader.lookup(output, [("c07", "b0957"), "c01", ("c01", "x")])
+    expected = data.filter(
+        ((pl.col("customer_id") == "c07") & (pl.col("book_id") == "b0957"))
+        | (pl.col("customer_id") == "c01")
+    )
+    testing.assert_frame_equal(actual, expected, check_row_order=False)
+
+    # appended file gets a run of its own, runs of other files are kept
+    runs = {run.name for run in Path(output.index_path).glob("*.arrow")}
+    parquet_writer.write(data.head(1), output, append=True)
+    assert runs < {run.name for run in Path(output.index_path).glob("*.arrow")}
+    assert len(parquet_reader.lookup(output, [("c00", "b0000")])) == 2
+
+    # rewritten output is indexed again
+    parquet_writer.write(data.head(10), output)
+    assert len(list(Path(output.index_path).glob("*.arrow"))) == 1
+    assert len(parquet_reader.lookup(output, ["c07"])) == 1
+    assert parquet_reader.lookup(output, ["c49"]).is_empty()
@@ -1,13 +1,17 @@
 # pylint: disable=redefined-outer-name
 
+from datetime import date
 from pathlib import Path
 
 import polars as pl
 import pytest
+from dynaconf.utils.boxing import DynaBox
 from polars import DataFrame, testing
 
-from src.common import Config, ParquetReader, ParquetWriter
-from src.transformation.common import TransformationApp
+from src.common import Config, CsvReader, ParquetReader, ParquetWriter
+from src.ingestion.app.library import IngestionLibraryApp
+from src.transformation.app.library import TransformationLibraryApp
+from src.transformation.common import TransformationApp, non_negative_number, tiered
 
 
 @pytest.fixture(scope="module")
@@ -185,3 +189,162 @@ class TestTransformationApp:
         data = transformation_app.extract_from_list(data, "author")
 
         testing.assert_frame_equal(data, expected_data)
+
+    def test_clean_and_titlecase_whitespace(
+        self, transformation_app: TransformationApp
+    ) -> None:
+        data = pl.DataFrame(
+            {
+                "name": [
+                    "  john   DOE ",
+                    "a \tb",
+                    "a\tb",
+                    "x\n y",
+                    "o'neil mc-donald",
+                    "   ",
+                    None,
+                ]
+            }
+        )
+        expected_data = pl.DataFrame(
+            {
+                "name": [
+                    "John Doe",
+                    "A B",
+                    "A\tB",
+                    "X Y",
+                    "O'Neil Mc-Donald",
+                    "",
+                    None,
+                ]
+            }
+        )
+
+        data = transformation_app.clean_and_titlecase(data, "name")
+
+        testing.assert_frame_equal(data, expected_data)
+
+    def test_titlecase_distinct_values(
+        self,
+        data: DataFrame,
+        parquet_reader: ParquetReader,
+        parquet_writer: ParquetWriter,
+    ) -> None:
+        config = DynaBox({"dictionary_columns": ["city"]})
+        transformation_app = TransformationApp(config, parquet_reader, parquet_writer)
+
+        actual = transformation_app.titlecase(data.lazy(), "city")
+
+        # distinct values are cleaned in the same plan, nothing runs eagerly
+        assert "LEFT JOIN" in actual.explain()
+
+        actual = actual.collect()
+        expected = pl.Series("city", ["Portland", "San Francisco", "New York"])
+
+        testing.assert_series_equal(actual["city"], expected)
+        assert actual.columns == data.columns
+
+    def test_clean_rules(
+        self, data: DataFrame, transformation_app: TransformationApp
+    ) -> None:
+        rules = {
+            "title": ["strip", "collapse_spaces", "titlecase"],
+            "city": ["strip", "uppercase"],
+            "published": {"source": "published_date", "steps": ["clean_dates"]},
+        }
+
+        actual = transformation_app.clean(data.lazy(), rules)
+
+        # all rules are compiled into a single projection
+        assert actual.explain(optimized=False).count("WITH_COLUMNS") == 1
+
+        actual = actual.collect()
+        assert actual["title"].to_list() == ["Example Title", "Test", "Example"]
+        assert actual["city"].to_list() == ["PORTLAND", "SAN FRANCISCO", "NEW YORK"]
+        assert actual["published"].dtype == pl.Date
+
+    def test_clean_unknown_step(
+        self, data: DataFrame, transformation_app: TransformationApp
+    ) -> None:
+        with pytest.raises(ValueError):
+            transformation_app.clean(data.lazy(), {"city": ["unknown"]})
+
+
+def test_tiered_parsing() -> None:
+    def slow(column: pl.Expr) -> pl.Expr:
+        return column.str.strip_chars().str.replace_all("[^0-9 .]", "").cast(pl.Float32)
+
+    data = pl.DataFrame(
+        {"price": ["12.5", " 3", "$4.5", "-7", "1e3", "1E2", None, "0"]}
+    )
+    clean_prices = tiered(
+        fast=lambda column: non_negative_number(column, pl.Float32),
+        slow=slow,
+        return_dtype=pl.Float32,
+    )
+
+    actual = data.lazy().select(clean_prices(pl.col("price"))).collect()
+    expected = data.select(slow(pl.col("price")))
+
+    testing.assert_frame_equal(actual, expected)
+
+
+def test_merge_after_same_day_ingestion(
+    tmp_path: Path, csv_reader: CsvReader, parquet_writer: ParquetWriter
+) -> None:
+    source = tmp_path / "libraries.csv"
+    bronze = {
+        "path": str(tmp_path / "bronze"),
+        "manifest": str(tmp_path / "_files" / "bronze.json"),
+        "partition_by": ["ingestion_date"],
+    }
+    ingestion_config = DynaBox(
+        {
+            "manifest": str(tmp_path / "_manifest.json"),
+            "input": {"path": str(source)},
+            "output": bronze,
+        }
+    )
+    transformation_config = DynaBox(
+        {
+            "input": bronze,
+            "output": {
+                "path": str(tmp_path / "silver.parquet"),
+                "partition_by": [],
+                "merge_keys": ["id"],
+                "state_path": str(tmp_path / "_state.json"),
+            },
+        }
+    )
+
+    header = "id,name,street_address,city,region,postal_code\n"
+    for rows in ("l1,A,S,C,R,1\n", "l1,A,S,C,R,1\nl77,B,S,C,R,2\n"):
+        source.write_text(header + rows)
+        IngestionLibraryApp(ingestion_config, csv_reader, parquet_writer).run()
+        TransformationLibraryApp(
+            transformation_config, ParquetReader(), parquet_writer, {"merge": True}
+        ).run()
+
+    silver = pl.read_parquet(tmp_path / "silver.parquet")
+    assert silver["id"].sort().to_list() == ["l1", "l77"]
+
+    # nothing is merged again once the replaced files are
+    app = TransformationLibraryApp(
+        transformation_config, ParquetReader(), parquet_writer, {"merge": True}
+    )
+    assert app.pending_partitions() == []
+
+
+def test_transform_keeps_latest_ingestion() -> None:
+    data = pl.DataFrame(
+        {
+            "id": ["l1", "l1", "l2"],
+            "name": ["New", "Old", "Other"],
+            "ingestion_date": [date(2024, 1, 2), date(2024, 1, 1), date(2024, 1, 1)],
+        }
+    )
+    app = TransformationLibraryApp(DynaBox({}), ParquetReader(), ParquetWriter())
+
+    for _ in range(10):
+        actual = app.transform(data.lazy()).collect().sort("id")
+        assert actual["name"].to_list() == ["New", "Other"]